@@ -0,0 +1,384 @@
+# Local LLM Server
+# Objective: An offline stand-in for Hyperbolic, OpenRouter and OpenAI so the pipeline can be load-tested on a
+# laptop. Implements the OpenAI-compatible shapes the engines use (/v1/chat/completions, /v1/completions with
+# optional streaming or first-token logprobs, /v1/embeddings) with configurable latency, error injection and canned or templated outputs.
+
+# Inputs:
+# Latency distributions, error rate, optional canned responses file
+
+# Outputs:
+# OpenAI-compatible JSON / server-sent event responses, request counters at GET /stats
+
+# Usage (from agent/):
+# python -m benchmarks.local_llm_server --port 8100 --latency lognormal:400:0.5 --latency embeddings=fixed:30
+# then set LLM_BASE_URL=http://127.0.0.1:8100/v1 (Config.llm_base_url) to point every engine at it
+
+# Canned responses file (JSON): a list of {"match": regex, "response": template}, checked in order against the
+# prompt (completions) or the concatenated messages (chat). Templates may use {score} (random 1-10),
+# {tweet} (a random example tweet) and {ids_json} (scores for the tweet ids found in the prompt).
+
+import argparse
+import base64
+import json
+import math
+import random
+import re
+import threading
+import time
+import uuid
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+
+from engines.memory.embedding_backends import HashingEmbeddingBackend
+from engines.prompts.prompts import get_example_tweets
+
+ENDPOINTS = ("chat", "completions", "embeddings")
+
+
+class LatencyModel:
+    """
+    Response latency distribution, parsed from a spec string:
+    fixed:MS, uniform:MIN_MS:MAX_MS or lognormal:MEDIAN_MS:SIGMA.
+    """
+
+    def __init__(self, spec: str = "fixed:0"):
+        kind, *values = spec.split(":")
+        try:
+            values = [float(value) for value in values]
+        except ValueError:
+            raise ValueError(f"Invalid latency spec {spec!r}")
+        if kind not in ("fixed", "uniform", "lognormal") or len(values) != {"fixed": 1, "uniform": 2, "lognormal": 2}[kind]:
+            raise ValueError(f"Invalid latency spec {spec!r}, expected fixed:MS, uniform:MIN:MAX or lognormal:MEDIAN:SIGMA")
+        self.spec = spec
+        self.kind = kind
+        self.values = values
+
+    def sample(self) -> float:
+        """One latency in seconds."""
+        if self.kind == "fixed":
+            ms = self.values[0]
+        elif self.kind == "uniform":
+            ms = random.uniform(*self.values)
+        else:
+            median, sigma = self.values
+            ms = random.lognormvariate(np.log(max(median, 1e-3)), sigma)
+        return max(ms, 0.0) / 1000
+
+
+class StandInResponder:
+    """Produces plausible outputs for each kind of request the engines send."""
+
+    def __init__(self, canned: Optional[List[Dict]] = None, embedding_dim: int = 1536):
+        self.canned = [(re.compile(item["match"], re.S), item["response"]) for item in canned or []]
+        self.embedding_backends: Dict[int, HashingEmbeddingBackend] = {}
+        self.embedding_dim = embedding_dim
+        self.tweets = [tweet.strip() for tweet in get_example_tweets().split("\n--\n") if tweet.strip()]
+
+    def _ids_json(self, prompt: str) -> str:
+        # Only ids of tweets being rated, not the ones in the prompt's example response
+        ids = re.findall(r'"id":\s*"([^"]+)",\s*"tweet"', prompt)
+        return json.dumps([{"id": tweet_id, "score": random.randint(1, 10)} for tweet_id in dict.fromkeys(ids)])
+
+    def _render(self, template: str, prompt: str) -> str:
+        values = {"score": random.randint(1, 10), "tweet": random.choice(self.tweets)}
+        if "{ids_json}" in template:
+            values["ids_json"] = self._ids_json(prompt)
+        return template.format(**values)
+
+    def chat(self, messages: List[Dict]) -> str:
+        prompt = "\n".join(str(message.get("content", "")) for message in messages)
+        for pattern, template in self.canned:
+            if pattern.search(prompt):
+                return self._render(template, prompt)
+
+        system = str(messages[0].get("content", "")) if messages else ""
+        if "JSON array with one object per tweet" in prompt:
+            return self._ids_json(prompt)
+        if "tweet formatter" in system:
+            # Echo the base-model output back as the formatted tweet
+            return str(messages[-1].get("content", "")).strip()[:280] or random.choice(self.tweets)
+        if "score" in prompt.lower() and "JSON" not in prompt:
+            return str(random.randint(1, 10))
+        if "JSON" in prompt:
+            return "[]"
+        return f"internal monologue: {random.choice(self.tweets)}"
+
+    def completion(self, prompt: str) -> str:
+        for pattern, template in self.canned:
+            if pattern.search(prompt):
+                return self._render(template, prompt)
+        # A tweet followed by more text, like the base model rambling past the first candidate
+        return f" {random.choice(self.tweets)}\n{random.choice(self.tweets)}\n{random.choice(self.tweets)}"
+
+    def first_token_logprobs(self, top_n: int) -> Dict[str, float]:
+        """Scoring distribution for a max_tokens=1 logprobs request: digits 0-10 peaked around a random score."""
+        peak = random.randint(1, 10)
+        weights = {str(score): math.exp(-((score - peak) ** 2) / 2.0) for score in range(11)}
+        weights["The"] = 0.01
+        total = sum(weights.values())
+        ranked = sorted(weights.items(), key=lambda item: item[1], reverse=True)[:max(1, top_n)]
+        return {token: math.log(weight / total) for token, weight in ranked}
+
+    def embeddings(self, texts: List[str], dimensions: Optional[int] = None) -> List[List[float]]:
+        dim = dimensions or self.embedding_dim
+        backend = self.embedding_backends.get(dim)
+        if backend is None:
+            backend = self.embedding_backends[dim] = HashingEmbeddingBackend(dim=dim)
+        return backend.embed(texts)
+
+
+class LocalLLMServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(
+        self,
+        address: Tuple[str, int],
+        responder: StandInResponder,
+        latency: Dict[str, LatencyModel],
+        error_rate: float = 0.0,
+        error_statuses: Tuple[int, ...] = (429, 500, 503),
+        token_delay: float = 0.02
+    ):
+        """
+        Args:
+            address (Tuple[str, int]): Host and port to listen on
+            responder (StandInResponder): Output generator
+            latency (Dict[str, LatencyModel]): Latency per endpoint ("chat", "completions", "embeddings")
+            error_rate (float): Fraction of requests answered with an injected error
+            error_statuses (Tuple[int, ...]): Status codes injected errors are drawn from
+            token_delay (float): Seconds between streamed chunks
+        """
+        super().__init__(address, LocalLLMRequestHandler)
+        self.responder = responder
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error_statuses = error_statuses
+        self.token_delay = token_delay
+        self.counters: Counter = Counter()
+        self.counters_lock = threading.Lock()
+
+    def count(self, key: str) -> None:
+        with self.counters_lock:
+            self.counters[key] += 1
+
+
+class LocalLLMRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: LocalLLMServer
+
+    def log_message(self, format, *args) -> None:
+        pass
+
+    def _send_json(self, status: int, body: Dict, headers: Optional[Dict[str, str]] = None) -> None:
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _write_chunk(self, data: bytes) -> None:
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+    def do_GET(self) -> None:
+        if self.path.rstrip("/") == "/stats":
+            with self.server.counters_lock:
+                self._send_json(200, dict(self.server.counters))
+        else:
+            self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+
+    def do_POST(self) -> None:
+        path = self.path.split("?")[0].rstrip("/")
+        endpoint = {
+            "/v1/chat/completions": "chat",
+            "/v1/completions": "completions",
+            "/v1/embeddings": "embeddings",
+        }.get(path)
+        try:
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        except ValueError:
+            self._send_json(400, {"error": {"message": "Invalid JSON body"}})
+            return
+        if endpoint is None:
+            self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+            return
+
+        server = self.server
+        server.count(f"{endpoint}_requests")
+        time.sleep(server.latency[endpoint].sample())
+
+        if random.random() < server.error_rate:
+            status = random.choice(server.error_statuses)
+            server.count(f"{endpoint}_injected_{status}")
+            headers = {"Retry-After": "1"} if status == 429 else None
+            self._send_json(status, {"error": {"message": "Injected error", "type": "stand_in"}}, headers)
+            return
+
+        model = body.get("model", "stand-in")
+        if endpoint == "embeddings":
+            self._embeddings(body, model)
+        elif endpoint == "chat":
+            text = server.responder.chat(body.get("messages", []))
+            self._send_json(200, {
+                "id": f"chatcmpl-{uuid.uuid4().hex}",
+                "object": "chat.completion",
+                "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+                "usage": self._usage(json.dumps(body.get("messages", [])), text),
+            })
+        elif body.get("logprobs") and body.get("max_tokens") == 1:
+            top_logprobs = server.responder.first_token_logprobs(int(body["logprobs"]))
+            token = next(iter(top_logprobs))
+            self._send_json(200, {
+                "id": f"cmpl-{uuid.uuid4().hex}",
+                "object": "text_completion",
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "text": token,
+                    "logprobs": {
+                        "tokens": [token],
+                        "token_logprobs": [top_logprobs[token]],
+                        "top_logprobs": [top_logprobs],
+                        "text_offset": [0],
+                    },
+                    "finish_reason": "length",
+                }],
+                "usage": self._usage(body.get("prompt", ""), token),
+            })
+        else:
+            text = self._apply_stop(server.responder.completion(body.get("prompt", "")), body.get("stop"))
+            if body.get("stream"):
+                self._stream_completion(text, model)
+            else:
+                self._send_json(200, {
+                    "id": f"cmpl-{uuid.uuid4().hex}",
+                    "object": "text_completion",
+                    "model": model,
+                    "choices": [{"index": 0, "text": text, "finish_reason": "stop"}],
+                    "usage": self._usage(body.get("prompt", ""), text),
+                })
+
+    @staticmethod
+    def _usage(prompt: str, completion: str) -> Dict[str, int]:
+        # ~4 characters per token
+        prompt_tokens, completion_tokens = len(prompt) // 4 + 1, len(completion) // 4 + 1
+        return {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens, "total_tokens": prompt_tokens + completion_tokens}
+
+    @staticmethod
+    def _apply_stop(text: str, stop) -> str:
+        for sequence in [stop] if isinstance(stop, str) else stop or []:
+            if sequence and sequence in text:
+                text = text[:text.index(sequence)]
+        return text
+
+    def _stream_completion(self, text: str, model: str) -> None:
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        completion_id = f"cmpl-{uuid.uuid4().hex}"
+        try:
+            for token in re.findall(r"\s*\S+|\s+", text):
+                chunk = {"id": completion_id, "object": "text_completion", "model": model,
+                         "choices": [{"index": 0, "text": token, "finish_reason": None}]}
+                self._write_chunk(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+                self.server.count("completions_streamed_tokens")
+                time.sleep(self.server.token_delay)
+            self._write_chunk(b"data: [DONE]\n\n")
+            self._write_chunk(b"")
+        except (BrokenPipeError, ConnectionResetError):
+            # The client stopped reading early, which is what streaming callers are meant to do
+            self.server.count("completions_streams_cancelled")
+            self.close_connection = True
+
+    def _embeddings(self, body: Dict, model: str) -> None:
+        texts = body.get("input", [])
+        texts = [texts] if isinstance(texts, str) else texts
+        vectors = self.server.responder.embeddings([str(text) for text in texts], body.get("dimensions"))
+        if body.get("encoding_format") == "base64":
+            data = [base64.b64encode(np.asarray(vector, dtype=np.float32).tobytes()).decode("ascii") for vector in vectors]
+        else:
+            data = vectors
+        self._send_json(200, {
+            "object": "list",
+            "model": model,
+            "data": [{"object": "embedding", "index": i, "embedding": embedding} for i, embedding in enumerate(data)],
+            "usage": {"prompt_tokens": sum(len(text) // 4 + 1 for text in texts), "total_tokens": sum(len(text) // 4 + 1 for text in texts)},
+        })
+
+
+def parse_latency_args(specs: List[str]) -> Dict[str, LatencyModel]:
+    """["lognormal:400:0.5", "embeddings=fixed:30"] -> latency per endpoint; unprefixed specs apply to all."""
+    latency = {endpoint: LatencyModel() for endpoint in ENDPOINTS}
+    for spec in specs:
+        endpoint, _, model_spec = spec.rpartition("=")
+        if endpoint and endpoint not in ENDPOINTS:
+            raise ValueError(f"Unknown endpoint {endpoint!r} in latency spec, expected one of {ENDPOINTS}")
+        for name in [endpoint] if endpoint else ENDPOINTS:
+            latency[name] = LatencyModel(model_spec)
+    return latency
+
+
+def start_server(
+    host: str = "127.0.0.1",
+    port: int = 0,
+    latency: Optional[Dict[str, LatencyModel]] = None,
+    error_rate: float = 0.0,
+    canned: Optional[List[Dict]] = None,
+    token_delay: float = 0.02
+) -> LocalLLMServer:
+    """
+    Start the stand-in server on a background thread (port 0 picks a free port).
+
+    Returns:
+        LocalLLMServer: The running server; its base URL is http://{host}:{server.server_port}/v1
+    """
+    server = LocalLLMServer(
+        (host, port),
+        StandInResponder(canned),
+        latency or {endpoint: LatencyModel() for endpoint in ENDPOINTS},
+        error_rate=error_rate,
+        token_delay=token_delay
+    )
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a local OpenAI-compatible stand-in for the LLM and embedding APIs.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument(
+        "--latency", action="append", default=[],
+        help="[ENDPOINT=]fixed:MS | uniform:MIN:MAX | lognormal:MEDIAN_MS:SIGMA, repeatable (endpoints: chat, completions, embeddings)"
+    )
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 429/500/503")
+    parser.add_argument("--error-statuses", default="429,500,503")
+    parser.add_argument("--token-delay-ms", type=float, default=20.0, help="Delay between streamed completion chunks")
+    parser.add_argument("--responses", help="JSON file of canned {match, response} templates")
+    args = parser.parse_args()
+
+    canned = None
+    if args.responses:
+        with open(args.responses) as f:
+            canned = json.load(f)
+
+    server = LocalLLMServer(
+        (args.host, args.port),
+        StandInResponder(canned),
+        parse_latency_args(args.latency),
+        error_rate=args.error_rate,
+        error_statuses=tuple(int(status) for status in args.error_statuses.split(",")),
+        token_delay=args.token_delay_ms / 1000
+    )
+    print(f"Local LLM stand-in listening on http://{args.host}:{server.server_port}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,343 @@
+# Long Term Memory Benchmark
+# Objective: Measure how long-term memory load, retrieval and insertion scale with the size of the memory table,
+# so regressions show up before an agent has run for weeks. Every scale runs in a fresh process against a
+# temporary SQLite database filled with synthetic memories and random unit embeddings. Fully offline: the
+# embedding backend is replaced by a local random-vector backend.
+
+# Inputs:
+# Scales (number of memories), embedding dimension, query / insert counts
+
+# Outputs:
+# JSON with cold/warm load time, query latency percentiles, insert throughput and peak RSS per scale
+
+# Usage (from agent/):
+# python -m benchmarks.memory_benchmark --scales 10000 100000 1000000 --output bench.json
+# python -m benchmarks.memory_benchmark --scales 10000 --baseline bench.json
+
+import argparse
+import contextlib
+import json
+import multiprocessing
+import os
+import platform
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+import zlib
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+import numpy as np
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from engines.memory.embedding_backends import EmbeddingBackend
+
+# Metric name markers for which a higher value is worse; every other numeric metric is a throughput (--baseline)
+LOWER_IS_BETTER = ("seconds", "_ms", "rss_mb")
+REGRESSION_TOLERANCE = 0.10
+
+
+class RandomEmbeddingBackend(EmbeddingBackend):
+    """Offline stand-in for the embedding API: a random unit vector per text, deterministic per text."""
+
+    max_batch_size = 100_000
+    max_batch_tokens = 100_000_000
+
+    def __init__(self, dim: int):
+        self.dim = dim
+        self.model = f"random-{dim}"
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        vectors = np.stack([
+            np.random.default_rng(zlib.crc32(text.encode("utf-8"))).standard_normal(self.dim, dtype=np.float32)
+            for text in texts
+        ])
+        return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).tolist()
+
+
+def peak_rss_mb() -> Optional[float]:
+    """Peak resident set size of this process so far."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    return round(peak / (1 << 20 if sys.platform == "darwin" else 1 << 10), 1)
+
+
+def latency_summary(timings: List[float]) -> Dict[str, float]:
+    """Mean and percentiles of per-call timings, in milliseconds."""
+    timings_ms = np.asarray(timings) * 1000
+    return {
+        "mean_ms": round(float(timings_ms.mean()), 3),
+        "p50_ms": round(float(np.percentile(timings_ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(timings_ms, 95)), 3),
+        "p99_ms": round(float(np.percentile(timings_ms, 99)), 3),
+    }
+
+
+class SyntheticMemories:
+    """Random memory rows: pseudo-word content, unit embeddings, significance 1-10, created over 90 days."""
+
+    SYLLABLES = ["ka", "lo", "mi", "ne", "ru", "sa", "ti", "vo", "ze", "pa", "qu", "di", "fo", "ga", "hu", "ji"]
+
+    def __init__(self, dim: int, seed: int = 0, vocabulary_size: int = 5000, words_per_memory: int = 16):
+        self.dim = dim
+        self.words_per_memory = words_per_memory
+        self.rng = np.random.default_rng(seed)
+        syllables = np.asarray(self.SYLLABLES)
+        self.vocabulary = np.asarray(sorted({
+            "".join(syllables[self.rng.integers(0, len(syllables), self.rng.integers(2, 5))])
+            for _ in range(vocabulary_size)
+        }))
+
+    def texts(self, count: int) -> List[str]:
+        # Zipf-distributed words, like natural text, so full-text search sees common and rare terms
+        word_ids = np.minimum(self.rng.zipf(1.3, (count, self.words_per_memory)) - 1, len(self.vocabulary) - 1)
+        return [" ".join(words) for words in self.vocabulary[word_ids]]
+
+    def vectors(self, count: int) -> np.ndarray:
+        vectors = self.rng.standard_normal((count, self.dim), dtype=np.float32)
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    def significance(self, count: int) -> np.ndarray:
+        return self.rng.uniform(1.0, 10.0, count)
+
+
+def seed_memories(db_path: str, memories: SyntheticMemories, count: int, chunk_size: int = 10000) -> None:
+    """Bulk-insert synthetic memories straight through sqlite3 (this setup step is not what is measured)."""
+    from engines.memory.embedding_codec import encode_embedding
+
+    now = datetime.utcnow()
+    conn = sqlite3.connect(db_path)
+    try:
+        for start in range(0, count, chunk_size):
+            size = min(chunk_size, count - start)
+            ages = memories.rng.uniform(0, 90 * 86400, size)
+            conn.executemany(
+                "INSERT INTO long_term_memories (content, embedding, significance_score, created_at) VALUES (?, ?, ?, ?)",
+                [
+                    (text, encode_embedding(vector), float(score), (now - timedelta(seconds=float(age))).isoformat(" "))
+                    for text, vector, score, age in zip(
+                        memories.texts(size), memories.vectors(size), memories.significance(size), ages
+                    )
+                ]
+            )
+            conn.commit()
+    finally:
+        conn.close()
+
+
+def run_scale(scale: int, params: Dict) -> Dict:
+    """
+    Benchmark one table size. Runs in its own process: the database module reads SQLITE_DB_PATH at import,
+    and peak RSS is only meaningful per process.
+
+    Args:
+        scale (int): Number of memories in the table
+        params (Dict): Benchmark parameters from the command line
+
+    Returns:
+        Dict: Measurements for this scale
+    """
+    with tempfile.TemporaryDirectory(prefix="memory_benchmark_") as tmp_dir, contextlib.redirect_stdout(sys.stderr):
+        db_path = os.path.join(tmp_dir, "agents.db")
+        os.environ["SQLITE_DB_PATH"] = db_path
+        os.environ["EMBEDDING_CACHE_PATH"] = os.path.join(tmp_dir, "embedding_cache.db")
+
+        from db.db_setup import SessionLocal, create_database
+        from engines.memory.long_term_mem import LongTermMemoryManager
+
+        dim = params["dim"]
+        result = {"scale": scale, "dim": dim}
+        memories = SyntheticMemories(dim, seed=params["seed"])
+
+        def new_manager() -> LongTermMemoryManager:
+            manager = LongTermMemoryManager(
+                index_nprobe=params["nprobe"],
+                index_min_memories=params["index_min_memories"]
+            )
+            # Route every embedding call to the offline backend
+            manager._backends[None] = RandomEmbeddingBackend(dim)
+            return manager
+
+        create_database()
+        start = time.perf_counter()
+        seed_memories(db_path, memories, scale)
+        result["seed_seconds"] = round(time.perf_counter() - start, 3)
+        result["db_bytes"] = os.path.getsize(db_path)
+
+        db = SessionLocal()
+        try:
+            # Cold load: no sidecar files, every embedding is decoded from SQLite (and the index trained)
+            start = time.perf_counter()
+            new_manager().load_memory_matrix(db)
+            result["cold_load_seconds"] = round(time.perf_counter() - start, 3)
+            result["peak_rss_mb_after_cold_load"] = peak_rss_mb()
+
+            # Warm load: what a restart costs once the embedding store and index exist
+            manager = new_manager()
+            start = time.perf_counter()
+            manager.load_memory_matrix(db)
+            result["warm_load_seconds"] = round(time.perf_counter() - start, 3)
+            result["ann_index"] = manager.memory_index is not None
+
+            queries = memories.texts(params["queries"])
+            window_start = datetime.utcnow() - timedelta(days=30)
+            retrievals = {
+                "vector": lambda query: manager.retrieve_relevant_memories(db, query, None, similarity_threshold=0.0),
+                "vector_prefiltered": lambda query: manager.retrieve_relevant_memories(
+                    db, query, None, similarity_threshold=0.0, min_significance=7.0, created_after=window_start
+                ),
+                "hybrid": lambda query: manager.retrieve_hybrid_memories(db, query, None),
+            }
+            for mode, retrieve in retrievals.items():
+                # Warm-up: page in the matrix and SQLite caches before timing
+                for query in queries[:params["warmup"]]:
+                    retrieve(query)
+                timings = []
+                for query in queries:
+                    start = time.perf_counter()
+                    retrieve(query)
+                    timings.append(time.perf_counter() - start)
+                result[f"query_{mode}"] = latency_summary(timings)
+            result["peak_rss_mb_after_queries"] = peak_rss_mb()
+
+            # Insert throughput: one memory per transaction, as the pipeline stores them, and in batches
+            inserts = params["inserts"]
+            texts, vectors = memories.texts(inserts), memories.vectors(inserts).tolist()
+            start = time.perf_counter()
+            for text, vector in zip(texts, vectors):
+                manager.store_memory(db, text, vector, 5.0)
+            result["insert_single_per_second"] = round(inserts / (time.perf_counter() - start), 1)
+
+            batch_size = params["insert_batch_size"]
+            texts, vectors = memories.texts(inserts), memories.vectors(inserts).tolist()
+            start = time.perf_counter()
+            for batch_start in range(0, inserts, batch_size):
+                manager.store_memories(db, [
+                    {"content": text, "embedding": vector, "significance_score": 5.0}
+                    for text, vector in zip(
+                        texts[batch_start:batch_start + batch_size], vectors[batch_start:batch_start + batch_size]
+                    )
+                ])
+            result["insert_batched_per_second"] = round(inserts / (time.perf_counter() - start), 1)
+            result["peak_rss_mb"] = peak_rss_mb()
+        finally:
+            db.close()
+    return result
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare_to_baseline(baseline: Dict, report: Dict) -> List[str]:
+    """
+    Describe every metric that got more than REGRESSION_TOLERANCE worse than in the baseline report.
+
+    Args:
+        baseline (Dict): Earlier benchmark report
+        report (Dict): Current benchmark report
+
+    Returns:
+        List[str]: One line per regression
+    """
+    def flatten(result: Dict, prefix: str = "") -> Dict[str, float]:
+        metrics = {}
+        for key, value in result.items():
+            if isinstance(value, dict):
+                metrics.update(flatten(value, f"{prefix}{key}."))
+            elif isinstance(value, (int, float)) and not isinstance(value, bool):
+                metrics[f"{prefix}{key}"] = value
+        return metrics
+
+    baseline_by_scale = {result["scale"]: flatten(result) for result in baseline.get("results", [])}
+    regressions = []
+    for result in report["results"]:
+        before = baseline_by_scale.get(result["scale"])
+        if before is None:
+            continue
+        for metric, value in flatten(result).items():
+            previous = before.get(metric)
+            if not previous or metric in ("scale", "dim", "db_bytes", "seed_seconds"):
+                continue
+            lower_is_better = any(marker in metric for marker in LOWER_IS_BETTER)
+            change = (value - previous) / previous if lower_is_better else (previous - value) / previous
+            if change > REGRESSION_TOLERANCE:
+                regressions.append(f"{result['scale']:>9} {metric}: {previous} -> {value} ({change:+.0%} worse)")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark long-term memory retrieval and storage at several table sizes.")
+    parser.add_argument("--scales", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument(
+        "--dim", type=int, default=384,
+        help="Embedding dimension. 1536 matches text-embedding-3-small but needs ~12 GB of disk at 1M memories."
+    )
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--inserts", type=int, default=200)
+    parser.add_argument("--insert-batch-size", type=int, default=50)
+    parser.add_argument("--nprobe", type=int, default=8)
+    parser.add_argument("--index-min-memories", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+    parser.add_argument("--baseline", help="Earlier JSON report to flag regressions against")
+    args = parser.parse_args()
+
+    params = {
+        "dim": args.dim,
+        "queries": args.queries,
+        "warmup": args.warmup,
+        "inserts": args.inserts,
+        "insert_batch_size": args.insert_batch_size,
+        "nprobe": args.nprobe,
+        "index_min_memories": args.index_min_memories,
+        "seed": args.seed,
+    }
+    report = {
+        "benchmark": "long_term_memory",
+        "commit": git_commit(),
+        "timestamp": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "sqlite": sqlite3.sqlite_version,
+        "platform": platform.platform(),
+        "params": params,
+        "results": [],
+    }
+
+    # A fresh interpreter per scale keeps peak RSS and module-level database state independent
+    context = multiprocessing.get_context("spawn")
+    for scale in args.scales:
+        print(f"Benchmarking {scale:,} memories...", file=sys.stderr)
+        with context.Pool(1) as pool:
+            result = pool.apply(run_scale, (scale, params))
+        print(json.dumps(result), file=sys.stderr)
+        report["results"].append(result)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare_to_baseline(json.load(f), report)
+        print("\n".join(["Regressions against baseline:"] + regressions) if regressions else "No regressions against baseline", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
@@ -2,13 +2,13 @@ from dataclasses import dataclass
 import json
 import os
 from pathlib import Path
-from typing import Dict, Tuple
+from typing import Dict, Mapping, Optional, Tuple
 from sqlalchemy.orm import Session
 from twitter.account import Account
 from dotenv import load_dotenv
 from requests_oauthlib import OAuth1
 
-from db.db_setup import create_database, get_db
+from db.db_setup import create_database, create_missing_indexes, get_db
 from db.db_seed import seed_database
 
 
@@ -23,14 +23,45 @@ class Config:
     llm_api_key: str
     openrouter_api_key: str
     openai_api_key: str
+    llm_base_url: Optional[str] = None  # serve every LLM and embedding call from this OpenAI-compatible URL (local stand-in)
+    rate_limits: Optional[Dict[str, Dict[str, float]]] = None  # per "provider" or "provider/model" overrides of DEFAULT_RATE_LIMITS
+    llm_call_deadline_seconds: Optional[float] = 180.0  # total time an LLM call may take including retries, None = no limit
+    llm_hedge_requests: bool = True  # duplicate a request still running after its endpoint's p95 latency
+    llm_failover: bool = True  # fail over between Hyperbolic and OpenRouter when a provider's circuit breaker opens
     max_reply_rate: float = 1.0  # 100% for testing
     min_posting_significance_score: float = 3.0
     min_storing_memory_significance: float = 6.0
     min_reply_worthiness_score: float = 3.0
     min_follow_score: float = 0.9
+    significance_scoring_mode: str = "sampled"  # "sampled" (chat answer) or "logprob" (expected score from one max_tokens=1 completion)
+    significance_top_logprobs: int = 5  # first-token alternatives requested in logprob mode; many providers cap it at 5
     min_eth_balance: float = 0.3
+    stream_post_generation: bool = True  # stream the base model and stop once a full tweet is generated
+    local_tweet_formatting: bool = True  # clean up base model output locally, LLM formatter only as a fallback
+    reply_mode: str = "async"  # "async" (score and generate replies concurrently) or "sequential"
+    reply_concurrency: int = 4  # max concurrent LLM-bound reply tasks in async mode
+    pipeline_stage_workers: int = 4  # threads running independent pipeline stages; 1 runs them one after another
+    notification_queue_backend: str = "sqlite"  # "sqlite" (durable across restarts, acknowledged) or "memory"
+    trace_path: Optional[str] = "./data/traces/trace.jsonl"  # JSONL file of pipeline / outbound-call spans, None = off
+    trace_max_bytes: int = 50_000_000  # trace file size at which it is rotated
+    trace_backups: int = 5  # rotated trace files kept
+    metrics_path: Optional[str] = "./data/traces/metrics.prom"  # Prometheus text snapshot written after every cycle
+    min_reply_interval_seconds: float = 30.0  # minimum spacing between posted replies
+    embedding_backend: str = "openai"  # "openai", or "hashing" for local embeddings with no network calls
+    memory_index_nprobe: int = 8  # ANN lists scanned per retrieval, higher = better recall
+    memory_index_min_memories: int = 20000  # brute-force retrieval below this many memories
+    memory_index_save_every: int = 1000  # rewrite the ANN index file after this many new memories (and on retrain)
+    memory_retrieval_min_significance: Optional[float] = None  # SQL prefilter, None = all memories
+    memory_retrieval_window_days: Optional[float] = None  # only recall memories this recent, None = any age
+    memory_retrieval_mode: str = "vector"  # "vector" (embeddings only) or "hybrid" (BM25 candidates + embedding rerank)
+    memory_compaction_interval_hours: Optional[float] = None  # compact from the pipeline this often, None = never
+    memory_duplicate_threshold: float = 0.95
+    memory_decay_half_life_days: float = 30.0
+    memory_min_decayed_significance: Optional[float] = None  # delete memories decayed below this, None = keep them
+    max_long_term_memories: int = 50000
     bot_username: str = "tee_hee_he"
     bot_email: str = "tee_hee_he@example.com"
+    tweet_prompt_template: Optional[str] = None  # persona prompt, None = the TWEET_PROMPT_TEMPLATE environment variable
 
 
 class ConfigMaker:
@@ -50,26 +81,29 @@ class ConfigMaker:
             seed_database()
         else:
             print("Database already exists. Skipping creation and seeding.")
+            create_missing_indexes()
 
 
-    def get_api_keys(self) -> Dict[str, str]:
-        """Retrieve API keys from environment variables."""
+    def get_api_keys(self, env: Optional[Mapping[str, str]] = None) -> Dict[str, str]:
+        """Retrieve API keys from environment variables (or from env, e.g. one agent's .env file)."""
+        env = os.environ if env is None else env
         return {
-            "llm_api_key": os.getenv("HYPERBOLIC_API_KEY"),
-            "openai_api_key": os.getenv("OPENAI_API_KEY"),
-            "openrouter_api_key": os.getenv("OPENROUTER_API_KEY"),
+            "llm_api_key": env.get("HYPERBOLIC_API_KEY"),
+            "openai_api_key": env.get("OPENAI_API_KEY"),
+            "openrouter_api_key": env.get("OPENROUTER_API_KEY"),
         }
 
-    def get_twitter_config(self) -> Tuple[OAuth1, Account]:
-        """Set up Twitter authentication and account."""
+    def get_twitter_config(self, env: Optional[Mapping[str, str]] = None) -> Tuple[OAuth1, Account]:
+        """Set up Twitter authentication and account from environment variables (or from env)."""
+        env = os.environ if env is None else env
         auth = OAuth1(
-            os.getenv("X_CONSUMER_KEY"),
-            os.getenv("X_CONSUMER_SECRET"),
-            os.getenv("X_ACCESS_TOKEN"),
-            os.getenv("X_ACCESS_TOKEN_SECRET")
+            env.get("X_CONSUMER_KEY"),
+            env.get("X_CONSUMER_SECRET"),
+            env.get("X_ACCESS_TOKEN"),
+            env.get("X_ACCESS_TOKEN_SECRET")
         )
         
-        auth_tokens = json.loads(os.getenv("X_AUTH_TOKENS"))
+        auth_tokens = json.loads(env.get("X_AUTH_TOKENS"))
         account = Account(cookies=auth_tokens)
         
         return auth, account
@@ -6,8 +6,8 @@ import requests
 from sqlalchemy.orm import Session
 from models import User, Post, Comment, Like, LongTermMemory
 from db.db_setup import SessionLocal, engine
-from openai import OpenAI
 from dotenv import load_dotenv
+from engines.memory.long_term_mem import LongTermMemoryManager
 
 load_dotenv()
 
@@ -30,14 +30,13 @@ def load_example_content(filename="examples.txt"):
         print("Looking for file in:", current_dir)
         raise
 
+def get_memory_manager():
+    """Memory manager using the embedding backend selected by EMBEDDING_BACKEND (default openai)."""
+    return LongTermMemoryManager(embedding_backend=os.getenv('EMBEDDING_BACKEND', 'openai'))
+
 def create_embedding(text):
-    """Create embedding using OpenAI API."""
-    client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
-    response = client.embeddings.create(
-        input=text,
-        model="text-embedding-3-small"
-    )
-    return response.data[0].embedding
+    """Create embedding using OpenAI API, served from the shared embedding cache when possible."""
+    return get_memory_manager().create_embedding(text, os.getenv('OPENAI_API_KEY'))
 
 def seed_database():
     db = SessionLocal()
@@ -103,16 +102,13 @@ def seed_database():
     if remaining_examples:
         num_memories = min(3, len(remaining_examples))
         memory_examples = random.sample(remaining_examples, num_memories)
-        
-        for content in memory_examples:
-            embedding = create_embedding(content)
-            memory = LongTermMemory(
-                content=content,
-                embedding=str(embedding),
-                significance_score=random.uniform(7.0, 10.0)
-            )
-            db.add(memory)
-    db.commit()
+
+        get_memory_manager().ingest_memories(
+            db,
+            memory_examples,
+            [random.uniform(7.0, 10.0) for _ in memory_examples],
+            os.getenv('OPENAI_API_KEY')
+        )
 
     db.close()
 
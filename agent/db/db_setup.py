@@ -1,7 +1,8 @@
 import os
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.exc import OperationalError
 from sqlalchemy.orm import sessionmaker
-from models import Base, User, Post, Comment, Like, LongTermMemory
+from models import Base, User, Post, Comment, Like, LongTermMemory, LONG_TERM_MEMORY_FTS_TABLE
 
 # Database URL
 DB_PATH = os.getenv("SQLITE_DB_PATH", "./data/agents.db")
@@ -9,15 +10,90 @@ os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
 
 SQLALCHEMY_DATABASE_URL = f"sqlite:///{DB_PATH}"
 
+# Milliseconds a connection waits for another writer's lock before failing with "database is locked"
+SQLITE_BUSY_TIMEOUT_MS = 30000
+
+def _configure_sqlite_connection(dbapi_connection, connection_record) -> None:
+    """
+    WAL lets readers run alongside the one writer, and the busy timeout makes concurrent pipeline stages
+    queue for the write lock instead of failing.
+    """
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.close()
+
+def create_sqlite_engine(database_url: str):
+    """SQLite engine shared across threads, with every connection in WAL mode and a busy timeout."""
+    db_engine = create_engine(database_url, connect_args={"check_same_thread": False})
+    event.listen(db_engine, "connect", _configure_sqlite_connection)
+    return db_engine
+
+def create_session_factory(db_path: str) -> sessionmaker:
+    """
+    Engine and session factory for a SQLite database file, for processes that host several agents with one
+    database each. The file's directory is created if needed.
+    """
+    os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+    db_engine = create_sqlite_engine(f"sqlite:///{db_path}")
+    return sessionmaker(autocommit=False, autoflush=False, bind=db_engine)
+
 # Create engine
-engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
+engine = create_sqlite_engine(SQLALCHEMY_DATABASE_URL)
 
 # Create SessionLocal
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
-def create_database():
+# Full-text index mirroring long_term_memories.content, kept in sync by triggers
+MEMORY_FTS_TABLE = LONG_TERM_MEMORY_FTS_TABLE
+MEMORY_FTS_TRIGGERS = [
+    f"""CREATE TRIGGER IF NOT EXISTS long_term_memories_fts_insert AFTER INSERT ON long_term_memories BEGIN
+        INSERT INTO {MEMORY_FTS_TABLE}(rowid, content) VALUES (new.id, new.content);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS long_term_memories_fts_delete AFTER DELETE ON long_term_memories BEGIN
+        INSERT INTO {MEMORY_FTS_TABLE}({MEMORY_FTS_TABLE}, rowid, content) VALUES ('delete', old.id, old.content);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS long_term_memories_fts_update AFTER UPDATE OF content ON long_term_memories BEGIN
+        INSERT INTO {MEMORY_FTS_TABLE}({MEMORY_FTS_TABLE}, rowid, content) VALUES ('delete', old.id, old.content);
+        INSERT INTO {MEMORY_FTS_TABLE}(rowid, content) VALUES (new.id, new.content);
+    END""",
+]
+
+def create_database(bind=engine):
     """Create all tables in the database."""
-    Base.metadata.create_all(bind=engine)
+    Base.metadata.create_all(bind=bind)
+    create_memory_fts(bind)
+
+def create_missing_indexes(bind=engine):
+    """Create tables and indexes added after the database was first created."""
+    Base.metadata.create_all(bind=bind)
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=bind, checkfirst=True)
+    create_memory_fts(bind)
+
+def create_memory_fts(bind=engine) -> bool:
+    """
+    Create the FTS5 mirror of long-term memory content and its sync triggers, indexing any
+    existing memories. Returns False if this SQLite build has no FTS5.
+    """
+    with bind.begin() as conn:
+        exists = conn.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"), {"name": MEMORY_FTS_TABLE}
+        ).first()
+        if not exists:
+            try:
+                conn.execute(text(
+                    f"CREATE VIRTUAL TABLE {MEMORY_FTS_TABLE} USING fts5("
+                    "content, content='long_term_memories', content_rowid='id', tokenize='porter unicode61')"
+                ))
+            except OperationalError as e:
+                print(f"FTS5 unavailable, hybrid memory retrieval disabled: {e}")
+                return False
+            conn.execute(text(f"INSERT INTO {MEMORY_FTS_TABLE}({MEMORY_FTS_TABLE}) VALUES ('rebuild')"))
+        for trigger in MEMORY_FTS_TRIGGERS:
+            conn.execute(text(trigger))
+    return True
 
 def get_db():
     """Dependency to get DB session."""
@@ -0,0 +1,66 @@
+import argparse
+import os
+from sqlalchemy import text
+from db.db_setup import engine, DB_PATH
+from engines.memory.embedding_codec import encode_embedding, decode_embedding, is_encoded
+
+
+def migrate_embeddings(dtype: str = "float32", batch_size: int = 500) -> int:
+    """
+    Rewrite long_term_memories.embedding from the legacy str(list) text format
+    into header-prefixed binary blobs. Already-migrated rows are left untouched,
+    so the migration is safe to run more than once. Legacy rows are read in
+    id order one batch at a time and each batch is committed on its own, so
+    memory use stays flat and an interrupted run keeps the batches it finished.
+
+    Args:
+        dtype (str): Storage dtype for the blobs, "float32" or "float16"
+        batch_size (int): Number of rows read and rewritten per batch
+
+    Returns:
+        int: Number of rows migrated
+    """
+    with engine.connect() as conn:
+        total = conn.execute(text(
+            "SELECT count(*) FROM long_term_memories WHERE typeof(embedding) = 'text'"
+        )).scalar_one()
+
+    migrated = 0
+    last_id = 0
+    while True:
+        with engine.begin() as conn:
+            rows = conn.execute(text(
+                "SELECT id, embedding FROM long_term_memories "
+                "WHERE typeof(embedding) = 'text' AND id > :last_id ORDER BY id LIMIT :limit"
+            ), {"last_id": last_id, "limit": batch_size}).fetchall()
+            if not rows:
+                break
+            last_id = rows[-1][0]
+
+            batch = [
+                {"id": memory_id, "embedding": encode_embedding(decode_embedding(embedding), dtype)}
+                for memory_id, embedding in rows
+                if not is_encoded(embedding)
+            ]
+            if batch:
+                conn.execute(text("UPDATE long_term_memories SET embedding = :embedding WHERE id = :id"), batch)
+                migrated += len(batch)
+        print(f"Migrated {migrated}/{total} memories")
+
+    # Reclaim the space freed by the much smaller blobs
+    with engine.connect() as conn:
+        conn.execution_options(isolation_level="AUTOCOMMIT").execute(text("VACUUM"))
+
+    return migrated
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Migrate long-term memory embeddings to the binary format.")
+    parser.add_argument("--dtype", choices=["float32", "float16"], default="float32")
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+
+    size_before = os.path.getsize(DB_PATH)
+    count = migrate_embeddings(dtype=args.dtype, batch_size=args.batch_size)
+    size_after = os.path.getsize(DB_PATH)
+    print(f"Migrated {count} embeddings to {args.dtype}. Database size: {size_before:,} -> {size_after:,} bytes")
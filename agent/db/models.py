@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, Float, ForeignKey
+from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, Float, ForeignKey, LargeBinary, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from sqlalchemy.ext.declarative import declarative_base
@@ -71,9 +71,12 @@ class LongTermMemory(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     content = Column(String, nullable=False)
-    embedding = Column(String, nullable=False)  # Store as JSON string
-    significance_score = Column(Float, nullable=False)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    embedding = Column(LargeBinary, nullable=False)  # Header-prefixed float32/float16 blob, see embedding_codec
+    significance_score = Column(Float, nullable=False, index=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+
+# FTS5 mirror of LongTermMemory.content, created with its sync triggers in db_setup.create_memory_fts
+LONG_TERM_MEMORY_FTS_TABLE = "long_term_memories_fts"
 
 # You might want to add a ShortTermMemory model if needed
 class ShortTermMemory(Base):
@@ -88,4 +91,18 @@ class TweetPost(Base):
     __tablename__ = "tweet_posts"
 
     id = Column(Integer, primary_key=True, index=True)
-    tweet_id = Column(String, nullable=False)
\ No newline at end of file
+    tweet_id = Column(String, nullable=False)
+
+class QueuedNotification(Base):
+    __tablename__ = "notification_queue"
+    # Dequeue scans pending rows in enqueue order
+    __table_args__ = (Index("ix_notification_queue_status_id", "status", "id"),)
+
+    id = Column(Integer, primary_key=True)  # enqueue order
+    tweet_id = Column(String, nullable=False, unique=True)  # one row per notification, also after it was processed
+    content = Column(Text, nullable=False)
+    status = Column(String, nullable=False, default="pending")  # see notification_queue.SQLiteNotificationQueue
+    attempts = Column(Integer, nullable=False, default=0)  # times handed out by process_queue
+    enqueued_at = Column(DateTime(timezone=True), nullable=False)  # UTC
+    claimed_at = Column(DateTime(timezone=True))  # UTC start of the current delivery's lease
+    acked_at = Column(DateTime(timezone=True))  # UTC; when the row was acknowledged or parked as failed
@@ -0,0 +1,627 @@
+# LLM Client
+# Objective: One HTTP path for every LLM call the engines make. Requests go through a keep-alive session per
+# provider so TCP and TLS setup is paid once per connection instead of once per call, with one retry/backoff
+# policy and explicit timeouts instead of a hand-rolled loop in every engine. Every call has an overall
+# deadline, slow requests are hedged after the endpoint's p95, and a provider/model whose circuit breaker
+# opened fails over to the equivalent model on the other provider.
+
+# Inputs:
+# Provider name, API key, OpenAI-compatible chat / completion payloads
+
+# Outputs:
+# Generated text, or LLMError once retries are exhausted
+
+import contextvars
+import json
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Dict, List, Optional, Tuple
+import requests
+from requests.adapters import HTTPAdapter
+
+from engines.llm.resilience import CircuitBreaker, get_circuit_breaker, get_latency_tracker
+from engines.llm.response_cache import get_response_cache
+from engines.rate_limiter import Permit, RateLimiter, estimate_tokens, get_rate_limiter
+from engines.tracing import current_span, json_size, span
+
+PROVIDER_BASE_URLS = {
+    "hyperbolic": "https://api.hyperbolic.xyz/v1",
+    "openrouter": "https://openrouter.ai/api/v1",
+}
+
+# Transient failures worth retrying; any other 4xx is a bad request and fails immediately
+RETRYABLE_STATUS_CODES = {408, 409, 425, 429, 500, 502, 503, 504}
+
+# Equivalent model on another provider, used when a provider/model's circuit is open or its call failed
+FAILOVER_MODELS = {
+    ("hyperbolic", "meta-llama/Meta-Llama-3.1-70B-Instruct"): ("openrouter", "meta-llama/llama-3.1-70b-instruct"),
+    ("hyperbolic", "meta-llama/Meta-Llama-3.1-405B"): ("openrouter", "meta-llama/llama-3.1-405b"),
+    ("openrouter", "meta-llama/llama-3.1-70b-instruct"): ("hyperbolic", "meta-llama/Meta-Llama-3.1-70B-Instruct"),
+}
+
+# Runs primary and hedged requests so the caller can wait on whichever finishes first
+_hedge_executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix="llm-hedge")
+
+
+class LLMError(Exception):
+    """An LLM request failed after all retries, or was rejected outright."""
+
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+# One pooled session per base URL, shared by every client in the process
+_sessions: Dict[str, requests.Session] = {}
+_sessions_lock = threading.Lock()
+
+
+def get_http_session(base_url: str, pool_size: int = 16) -> requests.Session:
+    """
+    Keep-alive session for a base URL. Connections are reused across calls and threads.
+
+    Args:
+        base_url (str): Provider base URL
+        pool_size (int): Maximum number of pooled connections to the host
+
+    Returns:
+        requests.Session: The shared session
+    """
+    with _sessions_lock:
+        session = _sessions.get(base_url)
+        if session is None:
+            session = requests.Session()
+            # Retries are handled by LLMClient, which knows which failures are safe to repeat
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            session.headers.update({"Content-Type": "application/json"})
+            _sessions[base_url] = session
+        return session
+
+
+class LLMClient:
+    def __init__(
+        self,
+        provider: str = "hyperbolic",
+        base_url: Optional[str] = None,
+        max_retries: int = 3,
+        backoff_base: float = 1.0,
+        backoff_max: float = 30.0,
+        connect_timeout: float = 10.0,
+        read_timeout: float = 120.0,
+        rate_limiter: Optional[RateLimiter] = None,
+        deadline: Optional[float] = 180.0,
+        hedge: bool = True
+    ):
+        """
+        Args:
+            provider (str): Provider name, used to look up the base URL ("hyperbolic" or "openrouter")
+            base_url (Optional[str]): Override the provider's base URL
+            max_retries (int): Retries after the first attempt for transient failures
+            backoff_base (float): First retry delay in seconds, doubled on every retry (with jitter)
+            backoff_max (float): Upper bound on a single retry delay
+            connect_timeout (float): Seconds to wait for a connection
+            read_timeout (float): Seconds to wait for the response
+            rate_limiter (Optional[RateLimiter]): Limiter admitting each request, defaults to the process-wide one
+            deadline (Optional[float]): Default seconds a call may take including retries, None for no deadline
+            hedge (bool): Send a duplicate of a non-streaming request still running after the endpoint's p95
+        """
+        if base_url is None and provider not in PROVIDER_BASE_URLS:
+            raise ValueError(f"Unknown LLM provider {provider!r}, expected one of {tuple(PROVIDER_BASE_URLS)}")
+        self.provider = provider
+        self.base_url = (base_url or PROVIDER_BASE_URLS[provider]).rstrip("/")
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.timeout: Tuple[float, float] = (connect_timeout, read_timeout)
+        self.session = get_http_session(self.base_url)
+        self.rate_limiter = rate_limiter or get_rate_limiter()
+        self.deadline = deadline
+        self.hedge = hedge
+
+    @staticmethod
+    def _estimate_tokens(payload: Dict) -> int:
+        """Prompt plus maximum output tokens, reserved from the token buckets before sending."""
+        if "messages" in payload:
+            prompt = "".join(str(message.get("content") or "") for message in payload["messages"])
+        else:
+            prompt = str(payload.get("prompt") or "")
+        return estimate_tokens(prompt) + int(payload.get("max_tokens") or 0)
+
+    def _endpoint(self, path: str, payload: Dict, stream: bool = False) -> str:
+        """Latency tracking key. Streamed requests are timed to the first byte, so they are tracked apart."""
+        return f"{self.provider} {path}{' (stream)' if stream else ''} {payload.get('model')}"
+
+    def _deadline_at(self, deadline: Optional[float]) -> Optional[float]:
+        """Absolute monotonic deadline for a call, from its own deadline or the client default."""
+        deadline = self.deadline if deadline is None else deadline
+        return time.monotonic() + deadline if deadline else None
+
+    def _retry_delay(self, attempt: int, response: Optional[requests.Response]) -> float:
+        """Server-requested Retry-After if present, otherwise exponential backoff with full jitter."""
+        if response is not None:
+            retry_after = response.headers.get("Retry-After")
+            if retry_after:
+                try:
+                    return min(float(retry_after), self.backoff_max)
+                except ValueError:
+                    pass
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def _request(
+        self,
+        path: str,
+        payload: Dict,
+        api_key: str,
+        stream: bool = False,
+        deadline_at: Optional[float] = None
+    ) -> Tuple[requests.Response, Permit]:
+        """
+        POST a JSON payload to the provider, retrying connection errors, timeouts and transient statuses.
+        Every attempt is admitted by the rate limiter; a throttled attempt waits there (Retry-After or
+        cool-down, shared with every other caller of the provider) rather than in a private sleep.
+        Each attempt's outcome feeds the provider/model circuit breaker, except throttled attempts, which count
+        as neither success nor failure; retries stop early once it opens.
+
+        Args:
+            path (str): Endpoint path relative to the base URL, e.g. "/chat/completions"
+            payload (Dict): JSON request body
+            api_key (str): Provider API key
+            stream (bool): Return as soon as the headers arrive and leave the body unread
+            deadline_at (Optional[float]): time.monotonic() by which the call must finish
+
+        Returns:
+            Tuple[requests.Response, Permit]: The successful (200) response and its rate-limit permit, released
+                unless stream is set: a stream holds its concurrency slot until the caller has read the body
+        """
+        url = f"{self.base_url}{path}"
+        headers = {"Authorization": f"Bearer {api_key}"}
+        tokens = self._estimate_tokens(payload)
+        endpoint = self._endpoint(path, payload, stream)
+        breaker = get_circuit_breaker(self.provider, payload.get("model"))
+        error = None
+        for attempt in range(self.max_retries + 1):
+            if deadline_at is not None and deadline_at <= time.monotonic():
+                raise LLMError(f"{self.provider} {path} deadline exceeded" + (f" ({error})" if error else ""))
+            response = None
+            throttled = False
+            keep_permit = False
+            permit = self.rate_limiter.acquire(self.provider, payload.get("model"), tokens=tokens)
+            try:
+                read_timeout = self.timeout[1]
+                if deadline_at is not None:
+                    # The rate limiter may have used up part of the budget
+                    read_timeout = max(0.1, min(read_timeout, deadline_at - time.monotonic()))
+                started = time.monotonic()
+                response = self.session.post(
+                    url, json=payload, headers=headers, timeout=(self.timeout[0], read_timeout), stream=stream
+                )
+                if stream and response.status_code == 200:
+                    keep_permit = True
+                else:
+                    throttled = permit.release(response.status_code, response.headers)
+                if response.status_code == 200:
+                    get_latency_tracker().record(endpoint, time.monotonic() - started)
+                    breaker.record(True)
+                    return response, permit
+                error = LLMError(
+                    f"{self.provider} {path} returned {response.status_code}: {response.text[:500]}",
+                    response.status_code
+                )
+                if response.status_code not in RETRYABLE_STATUS_CODES:
+                    # The provider is up; the request itself is bad
+                    breaker.record(True)
+                    raise error
+                if throttled:
+                    # Throttling is the rate limiter's to handle (Retry-After, AIMD), not a sign of an outage
+                    breaker.record_neutral()
+                else:
+                    breaker.record(False)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                breaker.record(False)
+                error = LLMError(f"{self.provider} {path} failed: {e}")
+            finally:
+                # No-op when the response was already recorded
+                if not keep_permit:
+                    permit.release()
+
+            if attempt < self.max_retries:
+                if current_span() is not None:
+                    current_span().add("retries")
+                if breaker.state == CircuitBreaker.OPEN:
+                    print(f"Circuit for {self.provider}/{payload.get('model')} is open, not retrying")
+                    break
+                if throttled:
+                    print(f"Attempt {attempt + 1} throttled ({error}), waiting for the rate limiter")
+                    continue
+                delay = self._retry_delay(attempt, response)
+                if deadline_at is not None:
+                    delay = min(delay, max(0.0, deadline_at - time.monotonic()))
+                print(f"Attempt {attempt + 1} failed ({error}), retrying in {delay:.1f}s")
+                time.sleep(delay)
+        raise error
+
+    def _hedged_request(self, path: str, payload: Dict, api_key: str, deadline_at: Optional[float]) -> Tuple[requests.Response, Permit]:
+        """
+        _request, plus a duplicate request if the first is still running after the endpoint's p95 latency.
+        The first successful response wins; the slower one is left to finish and its result is discarded.
+        No hedge is sent while the provider is at its rate or concurrency limit.
+        """
+        delay = get_latency_tracker().hedge_delay(self._endpoint(path, payload))
+        if delay is None or (deadline_at is not None and deadline_at - time.monotonic() <= delay):
+            return self._request(path, payload, api_key, deadline_at=deadline_at)
+
+        # Copied contexts keep the attempts under the caller's trace span
+        primary = _hedge_executor.submit(
+            contextvars.copy_context().run, self._request, path, payload, api_key, False, deadline_at
+        )
+        done, _ = wait([primary], timeout=delay)
+        if done:
+            return primary.result()
+        if not self.rate_limiter.has_headroom(self.provider, payload.get("model")):
+            # A hedge would only queue behind the limits and slow every other call down
+            return primary.result()
+        print(f"{self._endpoint(path, payload)} slower than p95 ({delay:.1f}s), sending a hedged request")
+        if current_span() is not None:
+            current_span().set(hedged=True)
+        hedge = _hedge_executor.submit(
+            contextvars.copy_context().run, self._request, path, payload, api_key, False, deadline_at
+        )
+        pending = {primary, hedge}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    return future.result()
+                except LLMError as e:
+                    error = error or e
+        raise error
+
+    def _failover_target(self, model: Optional[str], api_key: str) -> Optional[Tuple["LLMClient", str, str]]:
+        """
+        Client, model and API key of the equivalent model on another provider, if the owner of api_key
+        registered a key for that provider.
+        """
+        target = FAILOVER_MODELS.get((self.provider, model))
+        keys = _failover_keys.get(api_key, {})
+        if target is None or not keys.get(target[0]):
+            return None
+        provider, failover_model = target
+        return get_llm_client(provider), failover_model, keys[provider]
+
+    def _send(
+        self,
+        path: str,
+        payload: Dict,
+        api_key: str,
+        stream: bool = False,
+        deadline_at: Optional[float] = None,
+        allow_failover: bool = True
+    ) -> Tuple[requests.Response, Permit]:
+        """
+        Send a request through the circuit breaker: hedged when possible, and failed over to the equivalent
+        model on another provider when the circuit is open or the call failed with a transient error.
+
+        Returns:
+            Tuple[requests.Response, Permit]: See _request
+        """
+        model = payload.get("model")
+        if get_circuit_breaker(self.provider, model).allow():
+            try:
+                if self.hedge and not stream:
+                    return self._hedged_request(path, payload, api_key, deadline_at)
+                return self._request(path, payload, api_key, stream, deadline_at)
+            except LLMError as e:
+                if e.status_code is not None and e.status_code not in RETRYABLE_STATUS_CODES:
+                    raise
+                error = e
+        else:
+            error = LLMError(f"{self.provider} circuit is open for {model}")
+
+        target = self._failover_target(model, api_key) if allow_failover else None
+        if target is None:
+            raise error
+        client, failover_model, failover_key = target
+        print(f"Failing over from {self.provider} {model} to {client.provider} {failover_model}: {error}")
+        if current_span() is not None:
+            current_span().set(failover=f"{client.provider}/{failover_model}")
+        return client._send(path, {**payload, "model": failover_model}, failover_key, stream, deadline_at, allow_failover=False)
+
+    def post(self, path: str, payload: Dict, api_key: str, deadline: Optional[float] = None) -> Dict:
+        """
+        POST a JSON payload to the provider (see _request for the retry policy and _send for hedging and failover).
+
+        Args:
+            path (str): Endpoint path relative to the base URL
+            payload (Dict): JSON request body
+            api_key (str): Provider API key
+            deadline (Optional[float]): Seconds the call may take, defaults to the client's deadline
+
+        Returns:
+            Dict: Decoded JSON response
+        """
+        with span(
+            "llm.request",
+            provider=self.provider,
+            path=path,
+            model=payload.get("model"),
+            request_bytes=json_size(payload)
+        ) as trace:
+            response, permit = self._send(path, payload, api_key, deadline_at=self._deadline_at(deadline))
+            trace.set(response_bytes=len(response.content))
+            try:
+                data = response.json()
+            except ValueError:
+                raise LLMError(f"{self.provider} {path} returned invalid JSON: {response.text[:500]}")
+            usage = data.get("usage") if isinstance(data, dict) else None
+            if isinstance(usage, dict):
+                trace.set(**{key: usage[key] for key in ("prompt_tokens", "completion_tokens", "total_tokens") if key in usage})
+                if usage.get("total_tokens"):
+                    permit.settle(usage["total_tokens"])
+            return data
+
+    def chat(
+        self,
+        messages: List[Dict],
+        model: str,
+        api_key: str,
+        cache_type: Optional[str] = None,
+        cache_validator: Optional[Callable[[str], bool]] = None,
+        deadline: Optional[float] = None,
+        **params
+    ) -> str:
+        """
+        Chat completion.
+
+        Args:
+            messages (List[Dict]): Chat messages
+            model (str): Model name
+            api_key (str): Provider API key
+            cache_type (Optional[str]): Response cache call type (see response_cache.DEFAULT_TTLS).
+                Leave unset for generative calls, which must never be cached.
+            cache_validator (Optional[Callable[[str], bool]]): Only responses it accepts are cached or served
+                from the cache, so an unusable answer is re-asked instead of replayed
+            deadline (Optional[float]): Seconds the call may take, defaults to the client's deadline
+            **params: Sampling parameters (temperature, top_p, max_tokens, ...)
+
+        Returns:
+            str: Content of the first choice
+        """
+        payload = {"messages": messages, "model": model, **params}
+
+        def fetch() -> str:
+            response = self.post("/chat/completions", payload, api_key, deadline=deadline)
+            try:
+                return response["choices"][0]["message"]["content"] or ""
+            except (KeyError, IndexError, TypeError):
+                raise LLMError(f"Malformed chat completion response: {str(response)[:500]}")
+
+        return self._cached("/chat/completions", payload, cache_type, cache_validator, fetch)
+
+    def _cached(
+        self,
+        path: str,
+        payload: Dict,
+        cache_type: Optional[str],
+        cache_validator: Optional[Callable[[str], bool]],
+        fetch: Callable[[], str]
+    ) -> str:
+        """Serve a response from the response cache, or fetch it and cache it if the validator accepts it."""
+        cache = get_response_cache() if cache_type else None
+        if cache is None or not cache.enabled_for(cache_type):
+            return fetch()
+        request_hash = cache.request_hash(f"{self.base_url}{path}", payload)
+        content = cache.get(cache_type, request_hash)
+        if content is not None and (cache_validator is None or cache_validator(content)):
+            return content
+        content = fetch()
+        if cache_validator is None or cache_validator(content):
+            cache.put(cache_type, request_hash, content)
+        return content
+
+    def complete(self, prompt: str, model: str, api_key: str, deadline: Optional[float] = None, **params) -> str:
+        """
+        Text completion (base models).
+
+        Args:
+            prompt (str): Prompt to continue
+            model (str): Model name
+            api_key (str): Provider API key
+            deadline (Optional[float]): Seconds the call may take, defaults to the client's deadline
+            **params: Sampling parameters (temperature, top_p, max_tokens, stop, ...)
+
+        Returns:
+            str: Text of the first choice
+        """
+        response = self.post("/completions", {"prompt": prompt, "model": model, **params}, api_key, deadline=deadline)
+        try:
+            return response["choices"][0]["text"] or ""
+        except (KeyError, IndexError, TypeError):
+            raise LLMError(f"Malformed completion response: {str(response)[:500]}")
+
+
+    def first_token_logprobs(
+        self,
+        prompt: str,
+        model: str,
+        api_key: str,
+        top_logprobs: int = 5,
+        cache_type: Optional[str] = None,
+        deadline: Optional[float] = None,
+        **params
+    ) -> Dict[str, float]:
+        """
+        Log-probabilities of the most likely first tokens of a completion, from a single max_tokens=1 request.
+
+        Args:
+            prompt (str): Prompt to continue
+            model (str): Model name
+            api_key (str): Provider API key
+            top_logprobs (int): Number of alternatives to return. Providers cap this differently (often at 5) and
+                reject larger values or return no logprobs, both of which raise LLMError
+            cache_type (Optional[str]): Response cache call type, see chat()
+            deadline (Optional[float]): Seconds the call may take, defaults to the client's deadline
+            **params: Other completion parameters
+
+        Returns:
+            Dict[str, float]: Log-probability by token text
+        """
+        payload = {"prompt": prompt, "model": model, **params, "max_tokens": 1, "logprobs": top_logprobs}
+
+        def fetch() -> str:
+            response = self.post("/completions", payload, api_key, deadline=deadline)
+            try:
+                top = response["choices"][0]["logprobs"]["top_logprobs"][0]
+                return json.dumps({str(token): float(logprob) for token, logprob in top.items()})
+            except (KeyError, IndexError, TypeError, AttributeError, ValueError):
+                raise LLMError(f"Completion response has no logprobs: {str(response)[:500]}")
+
+        return json.loads(self._cached("/completions", payload, cache_type, None, fetch))
+
+    def stream_complete(
+        self,
+        prompt: str,
+        model: str,
+        api_key: str,
+        should_stop: Optional[Callable[[str], bool]] = None,
+        deadline: Optional[float] = None,
+        **params
+    ) -> Tuple[str, Optional[str]]:
+        """
+        Streaming text completion. Server-sent chunks are consumed as they arrive, and the request is
+        abandoned (closing the connection stops generation server-side) as soon as should_stop
+        accepts the text so far, so no tokens are paid for after the useful output.
+
+        Args:
+            prompt (str): Prompt to continue
+            model (str): Model name
+            api_key (str): Provider API key
+            should_stop (Optional[Callable[[str], bool]]): Called with the accumulated text after every chunk
+            deadline (Optional[float]): Seconds until the first byte, defaults to the client's deadline
+            **params: Sampling parameters (temperature, top_p, max_tokens, stop, ...)
+
+        Returns:
+            Tuple[str, Optional[str]]: Generated text up to the point where generation finished or was stopped,
+                and the provider's finish_reason ("stop", "length", ...), None if the stream was cut short
+        """
+        payload = {"prompt": prompt, "model": model, **params, "stream": True}
+        with span(
+            "llm.stream",
+            provider=self.provider,
+            path="/completions",
+            model=model,
+            request_bytes=json_size(payload)
+        ) as trace:
+            started = time.monotonic()
+            response, permit = self._send(
+                "/completions", payload, api_key, stream=True, deadline_at=self._deadline_at(deadline)
+            )
+            trace.set(first_byte_seconds=round(time.monotonic() - started, 6))
+            try:
+                text, finish_reason = self._read_stream(response, should_stop)
+            finally:
+                # The provider is busy generating until the stream is closed, so that is when the slot frees up
+                permit.release(response.status_code, response.headers)
+            # Streams carry no usage block; the token count is the same estimate the rate limiter uses
+            trace.set(
+                response_bytes=len(text.encode("utf-8")),
+                completion_tokens=estimate_tokens(text),
+                finish_reason=finish_reason
+            )
+            return text, finish_reason
+
+    def _read_stream(
+        self,
+        response: requests.Response,
+        should_stop: Optional[Callable[[str], bool]]
+    ) -> Tuple[str, Optional[str]]:
+        """Accumulate streamed completion text until it finishes or should_stop accepts it."""
+        text = ""
+        finish_reason = None
+        try:
+            for line in response.iter_lines(decode_unicode=True):
+                if not line or not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    break
+                try:
+                    choice = json.loads(data)["choices"][0]
+                except (ValueError, KeyError, IndexError, TypeError):
+                    continue
+                text += choice.get("text") or ""
+                if choice.get("finish_reason"):
+                    finish_reason = choice["finish_reason"]
+                    break
+                if should_stop is not None and should_stop(text):
+                    break
+        except (requests.ConnectionError, requests.Timeout) as e:
+            if not text:
+                raise LLMError(f"{self.provider} /completions stream failed: {e}")
+            print(f"Completion stream interrupted after {len(text)} characters: {e}")
+        finally:
+            response.close()
+        return text, finish_reason
+
+
+_clients: Dict[str, LLMClient] = {}
+_clients_lock = threading.Lock()
+# When set, every provider is served from this base URL (e.g. the local stand-in server)
+_base_url_override: Optional[str] = None
+# LLMClient keyword arguments applied to every shared client (deadline, hedge, ...)
+_client_options: Dict = {}
+# API keys of the providers calls may fail over to, by the API key the call was made with, so agents sharing
+# the clients each fail over with their own credentials
+_failover_keys: Dict[str, Dict[str, str]] = {}
+
+
+def set_llm_base_url(base_url: Optional[str]) -> None:
+    """
+    Point every provider at one OpenAI-compatible base URL, or restore the real providers with None.
+    Engines pick up their client when constructed, so call this before building them.
+
+    Args:
+        base_url (Optional[str]): Base URL including the /v1 prefix
+    """
+    global _base_url_override
+    with _clients_lock:
+        _base_url_override = base_url
+        _clients.clear()
+
+
+def set_llm_client_options(**options) -> None:
+    """
+    Set LLMClient keyword arguments (deadline, hedge, max_retries, ...) for every shared client.
+    Like set_llm_base_url, call this before building the engines.
+    """
+    with _clients_lock:
+        _client_options.clear()
+        _client_options.update(options)
+        _clients.clear()
+
+
+def set_llm_failover_keys(api_keys: Dict[str, Optional[str]]) -> None:
+    """
+    Enable failover to the providers that have an API key here (see FAILOVER_MODELS), for calls made with any
+    of these keys. Each agent in a process registers its own set.
+
+    Args:
+        api_keys (Dict[str, Optional[str]]): API key by provider name; empty keys disable failover to that provider
+    """
+    keys = {provider: key for provider, key in api_keys.items() if key}
+    with _clients_lock:
+        for key in keys.values():
+            _failover_keys[key] = keys
+
+
+def get_llm_client(provider: str = "hyperbolic") -> LLMClient:
+    """Process-wide client for a provider, shared by every engine."""
+    with _clients_lock:
+        client = _clients.get(provider)
+        if client is None:
+            client = _clients[provider] = LLMClient(provider, base_url=_base_url_override, **_client_options)
+        return client
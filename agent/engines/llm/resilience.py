@@ -0,0 +1,182 @@
+# LLM Resilience
+# Objective: Keep one slow or failing provider from stalling the pipeline. Latency is recorded per endpoint so
+# slow requests can be hedged after the endpoint's own p95, and a circuit breaker per provider/model stops
+# sending to a provider whose recent error rate spiked, so calls fail over (e.g. Hyperbolic -> OpenRouter)
+# instead of burning their deadline on retries.
+
+# Inputs:
+# Latency and outcome of every LLM request attempt
+
+# Outputs:
+# Latency percentiles per endpoint, hedge delays, and whether a provider/model may be called
+
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, Optional
+
+# Recent samples kept per endpoint
+LATENCY_WINDOW = 500
+# Hedging starts once an endpoint has this many samples, before that its tail is unknown
+MIN_HEDGE_SAMPLES = 20
+# Never hedge sooner than this, whatever the p95 says
+MIN_HEDGE_DELAY = 0.5
+
+
+class LatencyTracker:
+    """Sliding window of request latencies per endpoint ("provider path model")."""
+
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self.window = window
+        self._samples: Dict[str, Deque[float]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, endpoint: str, seconds: float) -> None:
+        with self._lock:
+            samples = self._samples.get(endpoint)
+            if samples is None:
+                samples = self._samples[endpoint] = deque(maxlen=self.window)
+            samples.append(seconds)
+
+    def percentile(self, endpoint: str, q: float) -> Optional[float]:
+        """
+        Latency percentile over the window.
+
+        Args:
+            endpoint (str): Endpoint key
+            q (float): Percentile, 0-100
+
+        Returns:
+            Optional[float]: Seconds, or None with no samples
+        """
+        with self._lock:
+            samples = sorted(self._samples.get(endpoint, ()))
+        if not samples:
+            return None
+        return samples[min(len(samples) - 1, int(round(q / 100 * (len(samples) - 1))))]
+
+    def hedge_delay(self, endpoint: str) -> Optional[float]:
+        """Seconds to wait before hedging a request to the endpoint: its p95, None until enough samples exist."""
+        with self._lock:
+            count = len(self._samples.get(endpoint, ()))
+        if count < MIN_HEDGE_SAMPLES:
+            return None
+        return max(MIN_HEDGE_DELAY, self.percentile(endpoint, 95))
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """Sample count and p50 / p95 / p99 latency per endpoint."""
+        with self._lock:
+            endpoints = sorted(self._samples)
+        stats = {}
+        for endpoint in endpoints:
+            stats[endpoint] = {
+                "count": len(self._samples[endpoint]),
+                **{f"p{q}": round(self.percentile(endpoint, q), 3) for q in (50, 95, 99)}
+            }
+        return stats
+
+
+class CircuitBreaker:
+    """
+    Closed -> open when at least `failure_threshold` of the last `window` attempts failed (with at least
+    `min_calls` attempts seen). Open rejects calls for `open_seconds`, then one half-open trial call decides
+    between closing again and another open period.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        name: str = "",
+        window: int = 20,
+        min_calls: int = 10,
+        failure_threshold: float = 0.5,
+        open_seconds: float = 30.0
+    ):
+        self.name = name
+        self.window = window
+        self.min_calls = min_calls
+        self.failure_threshold = failure_threshold
+        self.open_seconds = open_seconds
+        self.state = self.CLOSED
+        self.opened_at = 0.0
+        self.outcomes: Deque[bool] = deque(maxlen=window)
+        self._trial_in_flight = False
+        self._trial_started = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """Whether a call may be sent now. In half-open state only one trial call is let through."""
+        with self._lock:
+            if self.state == self.OPEN:
+                if time.monotonic() - self.opened_at < self.open_seconds:
+                    return False
+                self.state = self.HALF_OPEN
+                self._trial_in_flight = False
+            if self.state == self.HALF_OPEN:
+                # A trial that never reported back (e.g. it ran out of deadline first) does not block forever
+                if self._trial_in_flight and time.monotonic() - self._trial_started < self.open_seconds:
+                    return False
+                self._trial_in_flight = True
+                self._trial_started = time.monotonic()
+            return True
+
+    def record_neutral(self) -> None:
+        """An attempt that says nothing about the provider's health (it was throttled); frees a half-open trial."""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record(self, success: bool) -> None:
+        """Record the outcome of one attempt."""
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self._trial_in_flight = False
+                if success:
+                    self.state = self.CLOSED
+                    self.outcomes.clear()
+                else:
+                    self._open()
+                return
+            self.outcomes.append(success)
+            failures = self.outcomes.count(False)
+            if (
+                self.state == self.CLOSED
+                and len(self.outcomes) >= self.min_calls
+                and failures / len(self.outcomes) >= self.failure_threshold
+            ):
+                self._open()
+
+    def _open(self) -> None:
+        """Caller holds the lock."""
+        self.state = self.OPEN
+        self.opened_at = time.monotonic()
+        self.outcomes.clear()
+        print(f"Circuit for {self.name} opened for {self.open_seconds:.0f}s after repeated failures")
+
+
+_latency_tracker = LatencyTracker()
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_latency_tracker() -> LatencyTracker:
+    """Process-wide latency tracker shared by every LLM client."""
+    return _latency_tracker
+
+
+def get_circuit_breaker(provider: str, model: str) -> CircuitBreaker:
+    """Process-wide circuit breaker for a provider/model pair."""
+    key = f"{provider}/{model}"
+    with _breakers_lock:
+        breaker = _breakers.get(key)
+        if breaker is None:
+            breaker = _breakers[key] = CircuitBreaker(key)
+        return breaker
+
+
+def circuit_states() -> Dict[str, str]:
+    """Current state of every circuit breaker, by provider/model."""
+    with _breakers_lock:
+        return {key: breaker.state for key, breaker in sorted(_breakers.items())}
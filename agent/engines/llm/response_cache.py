@@ -0,0 +1,154 @@
+# LLM Response Cache
+# Objective: Stop paying for the same decision twice. Scoring and decision calls (significance, reply
+# worthiness, follow decisions) are cached in a small SQLite database beside agents.db, keyed by a hash of
+# the full request (endpoint, model, sampling parameters, messages), with a TTL per call type. Generative
+# calls (posts, short-term memory) and wallet decisions, which move funds, are never cached: only calls that
+# name a cache type are.
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+
+# Seconds a cached response stays valid, per call type. 0 disables caching for that type.
+DEFAULT_TTLS = {
+    "significance": 7 * 86400,
+    "reply_worthiness": 86400,
+    "follow_decision": 86400,
+}
+
+
+def is_json(text: str) -> bool:
+    """Cache validator for decision calls whose answer must be JSON."""
+    try:
+        json.loads(text)
+        return True
+    except (TypeError, ValueError):
+        return False
+
+
+def default_response_cache_path() -> str:
+    """llm_cache.db in the same directory as agents.db."""
+    db_path = os.getenv("SQLITE_DB_PATH", "./data/agents.db")
+    return os.getenv("LLM_RESPONSE_CACHE_PATH", os.path.join(os.path.dirname(db_path) or ".", "llm_cache.db"))
+
+
+class LLMResponseCache:
+    """Persistent request-hash -> response cache with per-call-type TTLs."""
+
+    # Expired and overflowing entries are purged once every this many writes
+    PURGE_INTERVAL = 100
+
+    def __init__(self, path: str, ttls: Optional[Dict[str, float]] = None, max_entries: int = 100_000):
+        """
+        Args:
+            path (str): SQLite file to store the cache in
+            ttls (Optional[Dict[str, float]]): TTL in seconds per call type, defaults to DEFAULT_TTLS
+            max_entries (int): Oldest entries are dropped above this many rows
+        """
+        self.path = path
+        self.ttls = dict(DEFAULT_TTLS if ttls is None else ttls)
+        self.max_entries = max_entries
+        self.hits: Dict[str, int] = {}
+        self.misses: Dict[str, int] = {}
+        self._writes = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS llm_response_cache (
+                request_hash TEXT PRIMARY KEY,
+                call_type TEXT NOT NULL,
+                response TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                expires_at REAL NOT NULL
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_llm_response_cache_expires_at ON llm_response_cache (expires_at)")
+
+    @staticmethod
+    def request_hash(url: str, payload: Dict) -> str:
+        """Hash of everything that determines the answer: endpoint, model, parameters and prompt."""
+        canonical = json.dumps({"url": url, "payload": payload}, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    def enabled_for(self, call_type: Optional[str]) -> bool:
+        return bool(call_type) and self.ttls.get(call_type, 0) > 0
+
+    def get(self, call_type: str, request_hash: str) -> Optional[str]:
+        """
+        Look up an unexpired cached response.
+
+        Args:
+            call_type (str): Call type, used for the hit/miss counters
+            request_hash (str): Hash from request_hash()
+
+        Returns:
+            Optional[str]: Cached response text, or None on a miss
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response FROM llm_response_cache WHERE request_hash = ? AND expires_at > ?",
+                (request_hash, time.time())
+            ).fetchone()
+            counters = self.misses if row is None else self.hits
+            counters[call_type] = counters.get(call_type, 0) + 1
+        return None if row is None else row[0]
+
+    def put(self, call_type: str, request_hash: str, response: str) -> None:
+        """
+        Store a response for the TTL of its call type.
+
+        Args:
+            call_type (str): Call type, selects the TTL
+            request_hash (str): Hash from request_hash()
+            response (str): Response text
+        """
+        if not self.enabled_for(call_type):
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_response_cache (request_hash, call_type, response, created_at, expires_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (request_hash, call_type, response, now, now + self.ttls[call_type])
+            )
+            self._writes += 1
+            if self._writes % self.PURGE_INTERVAL == 0:
+                self._purge(now)
+
+    def _purge(self, now: float) -> None:
+        """Drop expired entries and the oldest ones above max_entries. Caller holds the lock."""
+        self._conn.execute("DELETE FROM llm_response_cache WHERE expires_at <= ?", (now,))
+        self._conn.execute(
+            "DELETE FROM llm_response_cache WHERE request_hash IN ("
+            "SELECT request_hash FROM llm_response_cache ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,)
+        )
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """Hit/miss counters and hit rate per call type for this process."""
+        stats = {}
+        for call_type in sorted(set(self.hits) | set(self.misses)):
+            hits, misses = self.hits.get(call_type, 0), self.misses.get(call_type, 0)
+            stats[call_type] = {"hits": hits, "misses": misses, "hit_rate": hits / (hits + misses)}
+        return stats
+
+
+_cache: Optional[LLMResponseCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> LLMResponseCache:
+    """Process-wide response cache shared by every LLM client."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = LLMResponseCache(default_response_cache_path())
+        return _cache
@@ -0,0 +1,184 @@
+# Embedding Backends
+# Objective: Decouple memory retrieval from a specific embedding provider. The OpenAI backend is the default;
+# the hashing backend runs fully locally with NumPy for offline benchmarking, tests and high-throughput
+# deployments that cannot afford a network hop per embedding.
+
+# Note: vectors from different backends live in unrelated spaces. Memories stored with one backend are not
+# comparable with queries embedded by another, so switch backends on a fresh database (or re-embed).
+
+import math
+import re
+import zlib
+from abc import ABC, abstractmethod
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from openai import APIStatusError, DefaultHttpxClient, OpenAI
+
+from engines.rate_limiter import estimate_tokens, get_rate_limiter
+from engines.tracing import span
+
+
+class EmbeddingBackend(ABC):
+    """Interface for embedding providers."""
+
+    model: str = ""
+    # Request packing limits used by LongTermMemoryManager.create_embeddings
+    max_batch_size: int = 2048
+    max_batch_tokens: int = 250_000
+
+    @abstractmethod
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embed a batch of texts.
+
+        Args:
+            texts (List[str]): Texts to embed
+
+        Returns:
+            List[List[float]]: One embedding per text, in order
+        """
+
+    @property
+    def cache_key(self) -> str:
+        """Namespaces cached embeddings so different backends never share entries."""
+        return self.model
+
+
+# One client per API key for the life of the process. They all send through one HTTP connection pool, so
+# agents hosted in the same process with their own keys still reuse each other's connections.
+_openai_clients: Dict[Tuple[str, Optional[str]], OpenAI] = {}
+_openai_http_client: Optional[DefaultHttpxClient] = None
+# When set, embeddings are requested from this OpenAI-compatible base URL (e.g. the local stand-in server)
+_openai_base_url: Optional[str] = None
+
+
+def set_openai_base_url(base_url: Optional[str]) -> None:
+    """Send embedding requests to another OpenAI-compatible base URL, or back to OpenAI with None."""
+    global _openai_base_url
+    _openai_base_url = base_url
+
+
+def get_openai_client(openai_api_key: str) -> OpenAI:
+    global _openai_http_client
+    key = (openai_api_key, _openai_base_url)
+    client = _openai_clients.get(key)
+    if client is None:
+        if _openai_http_client is None:
+            _openai_http_client = DefaultHttpxClient()
+        client = _openai_clients[key] = OpenAI(
+            api_key=openai_api_key,
+            base_url=_openai_base_url,
+            http_client=_openai_http_client
+        )
+    return client
+
+
+class OpenAIEmbeddingBackend(EmbeddingBackend):
+    # OpenAI accepts up to 2048 inputs and 300k tokens per embeddings request
+    max_batch_size = 2048
+    max_batch_tokens = 250_000
+
+    def __init__(self, openai_api_key: str, model: str = "text-embedding-3-small"):
+        self.openai_api_key = openai_api_key
+        self.model = model
+
+    @property
+    def cache_key(self) -> str:
+        # Vectors from another base URL (e.g. the stand-in server) must not be served as the real model's
+        return f"{self.model}@{_openai_base_url}" if _openai_base_url else self.model
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        # The SDK retries transient failures itself; the shared limiter paces requests and learns from the outcome
+        tokens = sum(estimate_tokens(text) for text in texts)
+        with span(
+            "embedding.request",
+            model=self.model,
+            inputs=len(texts),
+            request_bytes=sum(len(text.encode("utf-8")) for text in texts)
+        ) as trace, get_rate_limiter().acquire("openai", self.model, tokens=tokens) as permit:
+            try:
+                raw = get_openai_client(self.openai_api_key).embeddings.with_raw_response.create(
+                    input=texts,
+                    model=self.model
+                )
+            except APIStatusError as e:
+                permit.release(e.status_code, e.response.headers)
+                raise
+            permit.release(raw.status_code, raw.headers)
+            trace.set(response_bytes=len(raw.content))
+            response = raw.parse()
+            if response.usage is not None:
+                permit.settle(response.usage.total_tokens)
+                trace.set(prompt_tokens=response.usage.prompt_tokens, total_tokens=response.usage.total_tokens)
+        return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+
+
+class HashingEmbeddingBackend(EmbeddingBackend):
+    """
+    Local feature-hashing embeddings: word unigrams, word bigrams and character trigrams are hashed
+    (signed) into a fixed number of dimensions with sublinear term frequency, then L2-normalized.
+    Deterministic across processes and needs no network or model download.
+    """
+
+    max_batch_size = 100_000
+    max_batch_tokens = 100_000_000
+
+    WORD_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+    def __init__(self, dim: int = 1536, char_ngram_weight: float = 0.5):
+        """
+        Args:
+            dim (int): Output dimension (1536 matches text-embedding-3-small)
+            char_ngram_weight (float): Weight of character trigram features relative to word features
+        """
+        self.dim = dim
+        self.char_ngram_weight = char_ngram_weight
+        self.model = f"hashing-{dim}"
+
+    def _features(self, text: str) -> Dict[str, float]:
+        """Feature -> weight, using sublinear term frequency (1 + log tf)."""
+        words = self.WORD_PATTERN.findall(text.lower())
+        features = Counter(words)
+        features.update(f"b:{first} {second}" for first, second in zip(words, words[1:]))
+        features.update(
+            f"c:{padded[i:i + 3]}"
+            for padded in (f"#{word}#" for word in words)
+            for i in range(len(padded) - 2)
+        )
+        return {
+            feature: (1.0 + math.log(count)) * (self.char_ngram_weight if feature.startswith("c:") else 1.0)
+            for feature, count in features.items()
+        }
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature, weight in self._features(text).items():
+                encoded = feature.encode("utf-8")
+                sign = 1.0 if zlib.adler32(encoded) & 1 else -1.0
+                vectors[row, zlib.crc32(encoded) % self.dim] += sign * weight
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return (vectors / norms).tolist()
+
+
+EMBEDDING_BACKENDS = ("openai", "hashing")
+
+
+def make_embedding_backend(name: str, openai_api_key: str = None) -> EmbeddingBackend:
+    """
+    Build the embedding backend selected in Config.
+
+    Args:
+        name (str): "openai" or "hashing"
+        openai_api_key (str): OpenAI API key, required for the openai backend
+
+    Returns:
+        EmbeddingBackend: The backend instance
+    """
+    if name == "openai":
+        return OpenAIEmbeddingBackend(openai_api_key)
+    if name == "hashing":
+        return HashingEmbeddingBackend()
+    raise ValueError(f"Unknown embedding backend {name!r}, expected one of {EMBEDDING_BACKENDS}")
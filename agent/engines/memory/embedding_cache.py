@@ -0,0 +1,207 @@
+# Embedding Cache
+# Objective: Never pay for the same embedding twice. Embeddings are cached in a small SQLite database beside
+# agents.db, keyed by (model, sha256(text)), with least-recently-used eviction and hit/miss counters.
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+import numpy as np
+
+from engines.memory.embedding_codec import encode_embedding, decode_embedding
+
+
+def default_cache_path() -> str:
+    """embedding_cache.db in the same directory as agents.db."""
+    db_path = os.getenv("SQLITE_DB_PATH", "./data/agents.db")
+    return os.getenv("EMBEDDING_CACHE_PATH", os.path.join(os.path.dirname(db_path) or ".", "embedding_cache.db"))
+
+
+class EmbeddingCache:
+    """Persistent (model, sha256(text)) -> embedding cache with LRU eviction."""
+
+    # Stay well under SQLite's bound-parameter limit in IN (...) lookups
+    LOOKUP_CHUNK_SIZE = 500
+
+    def __init__(self, path: str, max_entries: int = 200_000, max_bytes: int = 1 << 30):
+        """
+        Args:
+            path (str): SQLite file to store the cache in
+            max_entries (int): Evict least-recently-used entries above this many rows
+            max_bytes (int): Evict least-recently-used entries above this many bytes of embeddings
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS embedding_cache (
+                model TEXT NOT NULL,
+                text_hash TEXT NOT NULL,
+                embedding BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (model, text_hash)
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_embedding_cache_last_used ON embedding_cache (last_used)")
+        self._entries, self._bytes = self._conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM embedding_cache"
+        ).fetchone()
+
+    @staticmethod
+    def text_hash(text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def get(self, model: str, text: str) -> Optional[np.ndarray]:
+        """
+        Look up a cached embedding and mark it as recently used.
+
+        Args:
+            model (str): Embedding model name
+            text (str): Embedded text
+
+        Returns:
+            Optional[np.ndarray]: Cached embedding, or None on a miss
+        """
+        key = (model, self.text_hash(text))
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT embedding FROM embedding_cache WHERE model = ? AND text_hash = ?", key
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._conn.execute(
+                "UPDATE embedding_cache SET last_used = ? WHERE model = ? AND text_hash = ?", (time.time(), *key)
+            )
+        return decode_embedding(row[0])
+
+    def get_many(self, model: str, texts: Iterable[str]) -> Dict[str, np.ndarray]:
+        """
+        Look up many embeddings at once.
+
+        Args:
+            model (str): Embedding model name
+            texts (Iterable[str]): Texts to look up
+
+        Returns:
+            Dict[str, np.ndarray]: Cached embeddings by text; misses are absent
+        """
+        hashes = {self.text_hash(text): text for text in texts}
+        found = {}
+        now = time.time()
+        hash_list = list(hashes)
+        with self._lock:
+            for start in range(0, len(hash_list), self.LOOKUP_CHUNK_SIZE):
+                chunk = hash_list[start:start + self.LOOKUP_CHUNK_SIZE]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT text_hash, embedding FROM embedding_cache WHERE model = ? AND text_hash IN ({placeholders})",
+                    (model, *chunk)
+                ).fetchall()
+                self._conn.executemany(
+                    "UPDATE embedding_cache SET last_used = ? WHERE model = ? AND text_hash = ?",
+                    [(now, model, text_hash) for text_hash, _ in rows]
+                )
+                for text_hash, blob in rows:
+                    found[hashes[text_hash]] = decode_embedding(blob)
+            self.hits += len(found)
+            self.misses += len(hashes) - len(found)
+        return found
+
+    def put(self, model: str, text: str, embedding: Sequence[float]) -> None:
+        """
+        Store an embedding, evicting least-recently-used entries if the cache is over its limits.
+
+        Args:
+            model (str): Embedding model name
+            text (str): Embedded text
+            embedding (Sequence[float]): Embedding vector
+        """
+        self.put_many(model, [(text, embedding)])
+
+    def put_many(self, model: str, items: Iterable[Tuple[str, Sequence[float]]]) -> None:
+        """
+        Store many (text, embedding) pairs in a single transaction.
+
+        Args:
+            model (str): Embedding model name
+            items (Iterable[Tuple[str, Sequence[float]]]): Texts and their embeddings
+        """
+        now = time.time()
+        rows: List[tuple] = []
+        for text, embedding in items:
+            blob = encode_embedding(embedding)
+            rows.append((model, self.text_hash(text), blob, len(blob), now))
+        if not rows:
+            return
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                for row in rows:
+                    cursor = self._conn.execute(
+                        "INSERT OR IGNORE INTO embedding_cache (model, text_hash, embedding, size, last_used) VALUES (?, ?, ?, ?, ?)",
+                        row
+                    )
+                    if cursor.rowcount:
+                        self._entries += 1
+                        self._bytes += row[3]
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._evict()
+
+    def _evict(self) -> None:
+        """Drop the oldest entries (plus 10% slack) once a limit is exceeded. Caller holds the lock."""
+        if self._entries <= self.max_entries and self._bytes <= self.max_bytes:
+            return
+        average_size = self._bytes / max(self._entries, 1)
+        excess = max(self._entries - self.max_entries, int((self._bytes - self.max_bytes) / max(average_size, 1)), 0)
+        to_remove = excess + max(1, self.max_entries // 10)
+        self._conn.execute(
+            "DELETE FROM embedding_cache WHERE rowid IN (SELECT rowid FROM embedding_cache ORDER BY last_used LIMIT ?)",
+            (to_remove,)
+        )
+        entries, self._bytes = self._conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM embedding_cache"
+        ).fetchone()
+        self.evictions += self._entries - entries
+        self._entries = entries
+
+    def stats(self) -> Dict[str, float]:
+        """Hit/miss counters for this process plus the current cache size."""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": self._entries,
+            "bytes": self._bytes,
+        }
+
+
+_cache: Optional[EmbeddingCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_embedding_cache() -> EmbeddingCache:
+    """Process-wide embedding cache shared by every embedding call site."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = EmbeddingCache(default_cache_path())
+        return _cache
@@ -0,0 +1,72 @@
+# Embedding Codec
+# Objective: Compact binary storage for memory embeddings. Each blob is a small header (magic, version,
+# dtype, dimension) followed by the raw little-endian vector, so decoding is a zero-copy np.frombuffer.
+
+import json
+import struct
+from typing import Sequence, Union
+import numpy as np
+
+MAGIC = b"EM"
+VERSION = 1
+
+# magic, version, dtype code, dimension
+HEADER = struct.Struct("<2sBBI")
+
+DTYPES = {
+    0: np.dtype("<f4"),
+    1: np.dtype("<f2"),
+}
+DTYPE_CODES = {dtype: code for code, dtype in DTYPES.items()}
+
+
+def encode_embedding(embedding: Sequence[float], dtype: str = "float32") -> bytes:
+    """
+    Encode an embedding as a header-prefixed binary blob.
+
+    Args:
+        embedding (Sequence[float]): Embedding vector
+        dtype (str): Storage dtype, "float32" or "float16"
+
+    Returns:
+        bytes: Encoded embedding
+    """
+    storage_dtype = np.dtype(dtype).newbyteorder("<")
+    if storage_dtype not in DTYPE_CODES:
+        raise ValueError(f"Unsupported embedding dtype: {dtype}")
+
+    vector = np.asarray(embedding, dtype=storage_dtype)
+    if vector.ndim != 1:
+        raise ValueError("Embedding must be a 1-D vector")
+    return HEADER.pack(MAGIC, VERSION, DTYPE_CODES[storage_dtype], vector.shape[0]) + vector.tobytes()
+
+
+def decode_embedding(value: Union[bytes, memoryview, str]) -> np.ndarray:
+    """
+    Decode a stored embedding. Binary blobs are returned as a read-only view over the
+    blob without copying; legacy `str(list)` rows are parsed as JSON.
+
+    Args:
+        value (Union[bytes, memoryview, str]): Stored embedding column value
+
+    Returns:
+        np.ndarray: Embedding vector
+    """
+    if isinstance(value, str):
+        return np.asarray(json.loads(value), dtype=np.float32)
+
+    if len(value) < HEADER.size:
+        raise ValueError("Embedding blob is too short")
+    magic, version, dtype_code, dim = HEADER.unpack_from(value)
+    if magic != MAGIC or version != VERSION or dtype_code not in DTYPES:
+        raise ValueError("Unrecognized embedding blob header")
+
+    dtype = DTYPES[dtype_code]
+    if len(value) != HEADER.size + dim * dtype.itemsize:
+        raise ValueError(f"Embedding blob size does not match header dimension {dim}")
+    return np.frombuffer(value, dtype=dtype, count=dim, offset=HEADER.size)
+
+
+def is_encoded(value) -> bool:
+    """Return True if the stored value is already in the binary format."""
+    return isinstance(value, (bytes, memoryview)) and bytes(value[:len(MAGIC)]) == MAGIC
@@ -0,0 +1,164 @@
+# Embedding Matrix
+# Objective: Keep every long-term memory embedding resident in one pre-normalized float32 matrix so that
+# retrieval is a single matrix-vector product instead of a Python loop over ORM rows.
+
+from typing import Iterable, List, Optional, Sequence, Tuple
+import numpy as np
+
+
+class EmbeddingMatrix:
+    """Resident, L2-normalized float32 matrix of memory embeddings keyed by memory id."""
+
+    def __init__(self, initial_capacity: int = 1024):
+        self.dim = None
+        self._ids = np.empty(0, dtype=np.int64)
+        self._vectors = None
+        self._size = 0
+        self._ids_sorted = True
+        self._id_order = None
+        self._initial_capacity = initial_capacity
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def ids(self) -> np.ndarray:
+        """Memory ids of the populated rows, aligned with `vectors`."""
+        return self._ids[:self._size]
+
+    @property
+    def vectors(self) -> np.ndarray:
+        """View of the populated rows of the matrix."""
+        if self._vectors is None:
+            return np.empty((0, self.dim or 0), dtype=np.float32)
+        return self._vectors[:self._size]
+
+    @staticmethod
+    def normalize(vectors: np.ndarray) -> np.ndarray:
+        """
+        L2-normalize vectors row-wise. Zero vectors are left as zeros so they never match.
+
+        Args:
+            vectors (np.ndarray): 1-D or 2-D array of embeddings
+
+        Returns:
+            np.ndarray: float32 array of unit vectors
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+    def _reserve(self, extra: int) -> None:
+        """Grow the backing array (amortized doubling) so `extra` more rows fit."""
+        needed = self._size + extra
+        capacity = 0 if self._vectors is None else self._vectors.shape[0]
+        if needed <= capacity:
+            return
+        new_capacity = max(needed, capacity * 2, self._initial_capacity)
+        vectors = np.empty((new_capacity, self.dim), dtype=np.float32)
+        ids = np.empty(new_capacity, dtype=np.int64)
+        if self._size:
+            vectors[:self._size] = self._vectors[:self._size]
+            ids[:self._size] = self._ids[:self._size]
+        self._vectors = vectors
+        self._ids = ids
+
+    def add_many(self, memory_ids: Sequence[int], embeddings: Sequence[Sequence[float]]) -> None:
+        """
+        Append embeddings for the given memory ids.
+
+        Args:
+            memory_ids (Sequence[int]): Row ids of the memories
+            embeddings (Sequence[Sequence[float]]): Raw (unnormalized) embedding vectors
+        """
+        if len(memory_ids) == 0:
+            return
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        if vectors.ndim != 2 or vectors.shape[0] != len(memory_ids):
+            raise ValueError("Expected one embedding per memory id")
+        if self.dim is None:
+            self.dim = vectors.shape[1]
+        elif vectors.shape[1] != self.dim:
+            raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match matrix dimension {self.dim}")
+
+        memory_ids = np.asarray(memory_ids, dtype=np.int64)
+        if np.any(np.diff(memory_ids) <= 0) or (self._size and memory_ids[0] <= self._ids[self._size - 1]):
+            self._ids_sorted = False
+
+        self._reserve(len(memory_ids))
+        end = self._size + len(memory_ids)
+        self._vectors[self._size:end] = self.normalize(vectors)
+        self._ids[self._size:end] = memory_ids
+        self._size = end
+        self._id_order = None
+
+    def add(self, memory_id: int, embedding: Sequence[float]) -> None:
+        """Append a single memory embedding."""
+        self.add_many([memory_id], [embedding])
+
+    def rows_for(self, memory_ids: Iterable[int]) -> np.ndarray:
+        """Map memory ids to matrix rows, skipping ids that are not loaded."""
+        if not isinstance(memory_ids, np.ndarray):
+            memory_ids = np.fromiter(memory_ids, dtype=np.int64)
+        if self._size == 0 or len(memory_ids) == 0:
+            return np.empty(0, dtype=np.int64)
+
+        # Ids are normally appended in increasing order, so rows are found by binary search
+        if self._ids_sorted:
+            sorted_ids, order = self.ids, None
+        else:
+            if self._id_order is None:
+                self._id_order = np.argsort(self.ids, kind="stable")
+            order = self._id_order
+            sorted_ids = self.ids[order]
+
+        positions = np.minimum(np.searchsorted(sorted_ids, memory_ids), self._size - 1)
+        positions = positions[sorted_ids[positions] == memory_ids]
+        return positions if order is None else order[positions]
+
+    def similarities(self, query: Sequence[float], rows: np.ndarray) -> np.ndarray:
+        """Exact cosine similarity between the query and the given matrix rows."""
+        query = np.asarray(query, dtype=np.float32)
+        if len(rows) == 0 or query.shape != (self.dim,):
+            return np.zeros(len(rows), dtype=np.float32)
+        return self.vectors[np.asarray(rows, dtype=np.int64)] @ self.normalize(query)
+
+    def search(
+        self,
+        query: Sequence[float],
+        similarity_threshold: float,
+        top_k: int,
+        rows: Optional[np.ndarray] = None
+    ) -> List[Tuple[int, float]]:
+        """
+        Find the memories most similar to the query.
+
+        Args:
+            query (Sequence[float]): Query embedding (need not be normalized)
+            similarity_threshold (float): Minimum cosine similarity to keep a memory
+            top_k (int): Maximum number of results
+            rows (Optional[np.ndarray]): Restrict scoring to these matrix rows (exact rescoring of candidates)
+
+        Returns:
+            List[Tuple[int, float]]: (memory_id, similarity) pairs, most similar first
+        """
+        if self._size == 0 or top_k <= 0:
+            return []
+        query = np.asarray(query, dtype=np.float32)
+        if query.shape != (self.dim,) or not np.any(query):
+            return []
+
+        if rows is None:
+            rows = np.arange(self._size)
+            similarities = self.vectors @ self.normalize(query)
+        else:
+            rows = np.sort(np.asarray(rows, dtype=np.int64))
+            similarities = self.vectors[rows] @ self.normalize(query)
+        candidates = np.flatnonzero(similarities >= similarity_threshold)
+        if candidates.size > top_k:
+            candidates = candidates[np.argpartition(-similarities[candidates], top_k - 1)[:top_k]]
+
+        # Most similar first, ties broken by insertion order like a stable sort would
+        order = np.lexsort((candidates, -similarities[candidates]))
+        return [(int(self._ids[rows[i]]), float(similarities[i])) for i in candidates[order]]
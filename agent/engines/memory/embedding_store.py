@@ -0,0 +1,159 @@
+# Embedding Store
+# Objective: Persist the normalized embedding matrix in sidecar files beside agents.db and access them through
+# np.memmap. Opening an existing store maps the files instead of reading and decoding every memory row, and the
+# OS page cache is shared by every agent process on the host that maps the same files.
+
+# Files:
+# <agents.db>.embeddings      header + float32 [capacity, dim] matrix of unit vectors
+# <agents.db>.embeddings.ids  int64 [capacity] memory ids aligned with the matrix rows
+# <agents.db>.embeddings.lock flock()ed while a process reads the header or appends, so agent processes sharing
+#                             the store never write over each other's rows
+
+import fcntl
+import os
+import struct
+from contextlib import contextmanager
+from typing import Iterator, Optional
+import numpy as np
+
+from engines.memory.embedding_matrix import EmbeddingMatrix
+
+
+class MemmapEmbeddingMatrix(EmbeddingMatrix):
+    """EmbeddingMatrix whose rows live in memory-mapped sidecar files."""
+
+    MAGIC = b"NFEMBMAT"
+    VERSION = 2
+    # magic, version, dim, count, capacity, sum of the stored ids (checked against the database on open)
+    HEADER = struct.Struct("<8sIIQQq")
+    # Padded so the float32 rows start cache-line aligned
+    HEADER_SIZE = 64
+
+    def __init__(self, path: str, initial_capacity: int = 1024):
+        super().__init__(initial_capacity)
+        self.path = path
+        self.ids_path = f"{path}.ids"
+        self.id_checksum = 0
+        self._capacity = 0
+
+    @staticmethod
+    @contextmanager
+    def _locked(path: str, exclusive: bool = True) -> Iterator[None]:
+        """Hold the store's advisory lock (shared for reading the header, exclusive for writing)."""
+        with open(f"{path}.lock", "a+b") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    @classmethod
+    def _read_header(cls, path: str):
+        with open(path, "rb") as f:
+            magic, version, dim, count, capacity, id_checksum = cls.HEADER.unpack(f.read(cls.HEADER.size))
+        if magic != cls.MAGIC or version != cls.VERSION or count > capacity:
+            raise ValueError("bad header")
+        return dim, count, capacity, id_checksum
+
+    @classmethod
+    def open(cls, path: str) -> Optional["MemmapEmbeddingMatrix"]:
+        """
+        Map an existing store. Only the header is read, regardless of how many embeddings it holds.
+
+        Args:
+            path (str): Path of the vectors file
+
+        Returns:
+            Optional[MemmapEmbeddingMatrix]: The mapped store, or None if it is missing or unreadable
+        """
+        if not os.path.exists(path):
+            return None
+        matrix = cls(path)
+        try:
+            with cls._locked(path, exclusive=False):
+                dim, count, capacity, id_checksum = cls._read_header(path)
+            expected_size = cls.HEADER_SIZE + capacity * dim * 4
+            if os.path.getsize(path) < expected_size or os.path.getsize(matrix.ids_path) < capacity * 8:
+                raise ValueError("truncated file")
+        except (OSError, ValueError, struct.error) as e:
+            print(f"Ignoring unreadable embedding store at {path}: {e}")
+            return None
+
+        matrix.dim = dim
+        matrix._size = count
+        matrix.id_checksum = id_checksum
+        if capacity:
+            matrix._map(capacity)
+        return matrix
+
+    @classmethod
+    def remove(cls, path: str) -> None:
+        """Delete the store files so the next load rebuilds them."""
+        for file_path in (path, f"{path}.ids"):  # the lock file stays, other processes may hold it
+            if os.path.exists(file_path):
+                os.remove(file_path)
+
+    def _map(self, capacity: int) -> None:
+        self._vectors = np.memmap(
+            self.path, dtype=np.float32, mode="r+", offset=self.HEADER_SIZE, shape=(capacity, self.dim)
+        )
+        self._ids = np.memmap(self.ids_path, dtype=np.int64, mode="r+", shape=(capacity,))
+        self._capacity = capacity
+
+    def _write_header(self) -> None:
+        with open(self.path, "r+b") as f:
+            f.write(self.HEADER.pack(self.MAGIC, self.VERSION, self.dim, self._size, self._capacity, self.id_checksum))
+
+    def _adopt_appended_rows(self) -> None:
+        """Pick up rows another process appended since this one last read the header (lock must be held)."""
+        if not os.path.exists(self.path):
+            return
+        dim, count, capacity, id_checksum = self._read_header(self.path)
+        if count <= self._size:
+            return
+        if capacity != self._capacity:
+            self._vectors = self._ids = None
+            self.dim = dim
+            self._map(capacity)
+        previous = self._size
+        self._size = count
+        self.id_checksum = id_checksum
+        adopted = self._ids[max(previous - 1, 0):count]
+        if np.any(np.diff(adopted) <= 0):
+            self._ids_sorted = False
+        self._id_order = None
+
+    def _reserve(self, extra: int) -> None:
+        """Grow both files (amortized doubling) and remap them so `extra` more rows fit."""
+        needed = self._size + extra
+        if needed <= self._capacity:
+            return
+        new_capacity = max(needed, self._capacity * 2, self._initial_capacity)
+
+        if self._vectors is not None:
+            self._vectors.flush()
+            self._ids.flush()
+        self._vectors = self._ids = None
+
+        mode = "r+b" if os.path.exists(self.path) and self._capacity else "w+b"
+        with open(self.path, mode) as f:
+            f.truncate(self.HEADER_SIZE + new_capacity * self.dim * 4)
+        with open(self.ids_path, mode) as f:
+            f.truncate(new_capacity * 8)
+        self._map(new_capacity)
+        self._write_header()
+
+    def add_many(self, memory_ids, embeddings) -> None:
+        """
+        Append embeddings after any rows other processes have added, then publish the new row count and id
+        checksum in the header once the rows are on disk.
+        """
+        if len(memory_ids) == 0:
+            return
+        with self._locked(self.path):
+            self._adopt_appended_rows()
+            super().add_many(memory_ids, embeddings)
+            self.id_checksum += int(np.sum(np.asarray(memory_ids, dtype=np.int64)))
+            self._vectors.flush()
+            self._ids.flush()
+            self._write_header()
@@ -8,32 +8,203 @@
 # Outputs:
 # Text memory w/ significance score 
 
+from datetime import datetime
+import re
+import threading
 from typing import List, Dict, Optional
 import numpy as np
+from sqlalchemy import func, text
+from sqlalchemy.exc import OperationalError
 from sqlalchemy.orm import Session
-from sqlalchemy import Column, Integer, String, Float, DateTime
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.sql import func
-from openai import OpenAI
 
-Base = declarative_base()
+from models import LongTermMemory, LONG_TERM_MEMORY_FTS_TABLE
+from engines.memory.embedding_backends import EmbeddingBackend, make_embedding_backend
+from engines.memory.embedding_cache import get_embedding_cache
+from engines.memory.embedding_codec import encode_embedding, decode_embedding
+from engines.memory.embedding_matrix import EmbeddingMatrix
+from engines.memory.embedding_store import MemmapEmbeddingMatrix
+from engines.memory.memory_index import IVFMemoryIndex
 
-class LongTermMemory(Base):
-    __tablename__ = "long_term_memories"
-
-    id = Column(Integer, primary_key=True, index=True)
-    content = Column(String, nullable=False)
-    embedding = Column(String, nullable=False)  # Store as JSON string
-    significance_score = Column(Float, nullable=False)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+def memory_sidecar_path(db: Session, suffix: str) -> Optional[str]:
+    """Path of a file stored beside the SQLite database file, or None for in-memory databases."""
+    database = db.get_bind().url.database
+    if not database or database == ":memory:":
+        return None
+    return f"{database}{suffix}"
 
 
 class LongTermMemoryManager:
-    def __init__(self):
-        pass
+    def __init__(
+        self,
+        index_nprobe: int = 8,
+        index_min_memories: int = 20000,
+        index_save_every: int = 1000,
+        embedding_backend: str = "openai"
+    ):
+        """
+        Args:
+            index_nprobe (int): Lists scanned per query by the ANN index (recall/latency knob)
+            index_min_memories (int): Below this many memories retrieval stays brute force
+            index_save_every (int): Rewrite the index file after this many incremental inserts. The in-memory
+                index is authoritative in between; a stale file only costs the inserts on the next load.
+            embedding_backend (str): "openai" or "hashing" (local, no network)
+        """
+        self.embedding_backend = embedding_backend
+        self._backends: Dict[str, EmbeddingBackend] = {}
+        self.memory_matrix: Optional[EmbeddingMatrix] = None
+        self.memory_index: Optional[IVFMemoryIndex] = None
+        self.index_nprobe = index_nprobe
+        self.index_min_memories = index_min_memories
+        self.index_save_every = index_save_every
+        self._index_unsaved_inserts = 0
+        # Pipeline stages share this manager across worker threads; the matrix and index change under this lock
+        self._memory_lock = threading.RLock()
+
+    def load_memory_matrix(self, db: Session) -> EmbeddingMatrix:
+        """
+        Load the embedding matrix for every stored memory. Called once at startup; afterwards
+        store_memory keeps it up to date.
+
+        For file-backed databases the matrix is memory-mapped from a sidecar store beside agents.db,
+        so a restart only reads its header and decodes memories added since it was last written.
+        The store is rebuilt from the table if it no longer matches it.
+
+        Args:
+            db (Session): Database session
+
+        Returns:
+            EmbeddingMatrix: The loaded matrix
+        """
+        with self._memory_lock:
+            path = memory_sidecar_path(db, ".embeddings")
+            matrix = None
+            if path:
+                matrix = MemmapEmbeddingMatrix.open(path)
+                if matrix is not None and not self._matrix_in_sync(db, matrix):
+                    print("Embedding store is out of sync with the database, rebuilding")
+                    matrix = None
+                if matrix is None:
+                    MemmapEmbeddingMatrix.remove(path)
+                    matrix = MemmapEmbeddingMatrix(path)
+            else:
+                matrix = EmbeddingMatrix()
+
+            last_id = int(matrix.ids.max()) if len(matrix) else 0
+            self._append_memories_after(db, matrix, last_id)
+            print(f"Loaded {len(matrix)} long-term memory embeddings")
+
+            self.memory_matrix = matrix
+            self.memory_index = None
+            self._sync_memory_index(db)
+            return matrix
+
+    @staticmethod
+    def _matrix_in_sync(db: Session, matrix: MemmapEmbeddingMatrix) -> bool:
+        """
+        Consistency check against the store header: the memories up to the highest stored id must be exactly
+        the stored ones, compared by row count and id sum (one aggregate over the primary key index).
+        """
+        if len(matrix) == 0:
+            return True
+        count, id_sum = (
+            db.query(func.count(LongTermMemory.id), func.sum(LongTermMemory.id))
+            .filter(LongTermMemory.id <= int(matrix.ids.max()))
+            .one()
+        )
+        return count == len(matrix) and (id_sum or 0) == matrix.id_checksum
+
+    @staticmethod
+    def _append_memories_after(db: Session, matrix: EmbeddingMatrix, last_id: int, chunk_size: int = 10000) -> None:
+        """Decode and append every memory with an id above last_id, in id order."""
+        memory_ids, embeddings = [], []
+        rows = (
+            db.query(LongTermMemory.id, LongTermMemory.embedding)
+            .filter(LongTermMemory.id > last_id)
+            .order_by(LongTermMemory.id)
+        )
+        for memory_id, embedding in rows:
+            vector = decode_embedding(embedding)
+            dim = matrix.dim or (len(embeddings[0]) if embeddings else len(vector))
+            if len(vector) != dim:
+                print(f"Skipping memory {memory_id}: embedding dimension {len(vector)} != {dim}")
+                continue
+            memory_ids.append(memory_id)
+            embeddings.append(vector)
+            if len(memory_ids) >= chunk_size:
+                matrix.add_many(memory_ids, embeddings)
+                memory_ids, embeddings = [], []
+        matrix.add_many(memory_ids, embeddings)
+
+    def _sync_memory_index(self, db: Session) -> None:
+        """
+        Bring the ANN index in line with the embedding matrix: load it from disk, insert any
+        memories it has not seen, and retrain when it is missing, stale or has outgrown its lists.
+        The file is rewritten after a retrain or once index_save_every inserts have accumulated.
+        """
+        with self._memory_lock:
+            matrix = self.memory_matrix
+            if len(matrix) < self.index_min_memories:
+                self.memory_index = None
+                self._index_unsaved_inserts = 0
+                return
+
+            path = memory_sidecar_path(db, ".ivf.npz")
+            index = self.memory_index
+            if index is None and path:
+                index = IVFMemoryIndex.load(path, nprobe=self.index_nprobe)
+
+            if index is not None:
+                new_rows = np.flatnonzero(matrix.ids > index.max_id)
+                if len(index) + len(new_rows) != len(matrix):
+                    print("Memory index is out of sync with the database, rebuilding")
+                    index = None
+                elif len(new_rows):
+                    index.add(matrix.ids[new_rows], matrix.vectors[new_rows])
+                    self._index_unsaved_inserts += len(new_rows)
+
+            retrained = index is None or index.needs_retrain
+            if retrained:
+                index = IVFMemoryIndex(nprobe=self.index_nprobe)
+                index.train(matrix.ids, matrix.vectors)
+                print(f"Trained memory index with {len(index.lists)} lists over {len(index)} memories")
+
+            index.nprobe = self.index_nprobe
+            self.memory_index = index
+            if retrained or self._index_unsaved_inserts >= self.index_save_every:
+                self.save_memory_index(db, force=True)
+
+    def save_memory_index(self, db: Session, force: bool = False) -> None:
+        """
+        Write the ANN index to its sidecar file if it has inserts the file lacks (e.g. at shutdown).
+
+        Args:
+            db (Session): Database session, locates the sidecar file
+            force (bool): Write even without unsaved inserts
+        """
+        with self._memory_lock:
+            path = memory_sidecar_path(db, ".ivf.npz")
+            if self.memory_index is None or not path or not (force or self._index_unsaved_inserts):
+                return
+            self.memory_index.save(path)
+            self._index_unsaved_inserts = 0
+
+    def _get_memory_matrix(self, db: Session) -> EmbeddingMatrix:
+        with self._memory_lock:
+            if self.memory_matrix is None:
+                self.load_memory_matrix(db)
+            return self.memory_matrix
+
+    def get_embedding_backend(self, openai_api_key: str) -> EmbeddingBackend:
+        """The configured embedding backend (one instance per API key)."""
+        backend = self._backends.get(openai_api_key)
+        if backend is None:
+            backend = self._backends[openai_api_key] = make_embedding_backend(self.embedding_backend, openai_api_key)
+        return backend
+
     def create_embedding(self, text: str, openai_api_key: str) -> List[float]:
         """
-        Create an embedding for the given text using OpenAI's API.
+        Create an embedding for the given text with the configured backend (OpenAI by default).
+        Embeddings are served from the persistent embedding cache when the same text was embedded before.
 
         Args:
             text (str): Text to create an embedding for
@@ -42,12 +213,47 @@ class LongTermMemoryManager:
         Returns:
             List[float]: Embedding vector
         """
-        client = OpenAI(api_key=openai_api_key)
-        response = client.embeddings.create(
-            input=text,
-            model="text-embedding-3-small"
-        )
-        return response.data[0].embedding
+        return self.create_embeddings([text], openai_api_key)[0]
+
+    def create_embeddings(self, texts: List[str], openai_api_key: str) -> List[List[float]]:
+        """
+        Create embeddings for many texts, packing cache misses into as few backend requests as the
+        provider limits allow.
+
+        Args:
+            texts (List[str]): Texts to create embeddings for
+            openai_api_key (str): OpenAI API key
+
+        Returns:
+            List[List[float]]: Embedding vectors, in the same order as `texts`
+        """
+        backend = self.get_embedding_backend(openai_api_key)
+        cache = get_embedding_cache()
+        embeddings = {text: vector.tolist() for text, vector in cache.get_many(backend.cache_key, texts).items()}
+        missing = [text for text in dict.fromkeys(texts) if text not in embeddings]
+
+        for batch in self._embedding_batches(missing, backend):
+            batch_embeddings = backend.embed(batch)
+            cache.put_many(backend.cache_key, zip(batch, batch_embeddings))
+            embeddings.update(zip(batch, batch_embeddings))
+
+        return [embeddings[text] for text in texts]
+
+    @staticmethod
+    def _embedding_batches(texts: List[str], backend: EmbeddingBackend) -> List[List[str]]:
+        """Split texts into request-sized batches by input count and (estimated) token count."""
+        batches, batch, batch_tokens = [], [], 0
+        for text in texts:
+            # ~3 characters per token is a conservative estimate for English text
+            tokens = len(text) // 3 + 1
+            if batch and (len(batch) >= backend.max_batch_size or batch_tokens + tokens > backend.max_batch_tokens):
+                batches.append(batch)
+                batch, batch_tokens = [], 0
+            batch.append(text)
+            batch_tokens += tokens
+        if batch:
+            batches.append(batch)
+        return batches
 
     def store_memory(self, db: Session, content: str, embedding: List[float], significance_score: float):
         """
@@ -59,14 +265,70 @@ class LongTermMemoryManager:
             embedding (List[float]): Embedding vector
             significance_score (float): Significance score of the memory
         """
-        new_memory = LongTermMemory(
-            content=content,
-            embedding=str(embedding),  # Convert to string for storage
-            significance_score=significance_score
-        )
-        db.add(new_memory)
+        self.store_memories(db, [{
+            "content": content,
+            "embedding": embedding,
+            "significance_score": significance_score
+        }])
+
+    def store_memories(self, db: Session, memories: List[Dict]) -> List[int]:
+        """
+        Store many memories in a single transaction.
+
+        Args:
+            db (Session): Database session
+            memories (List[Dict]): Memories with content, embedding and significance_score
+
+        Returns:
+            List[int]: Ids of the new memories
+        """
+        new_memories = [
+            LongTermMemory(
+                content=memory["content"],
+                embedding=encode_embedding(memory["embedding"]),
+                significance_score=memory["significance_score"]
+            )
+            for memory in memories
+        ]
+        if not new_memories:
+            return []
+        db.add_all(new_memories)
+        db.flush()
+        memory_ids = [memory.id for memory in new_memories]
         db.commit()
 
+        with self._memory_lock:
+            if self.memory_matrix is not None:
+                self.memory_matrix.add_many(memory_ids, [memory["embedding"] for memory in memories])
+                self._sync_memory_index(db)
+        return memory_ids
+
+    def ingest_memories(
+        self,
+        db: Session,
+        contents: List[str],
+        significance_scores: List[float],
+        openai_api_key: str
+    ) -> List[int]:
+        """
+        Embed and store a batch of memories (seeding, backfills, imports) with batched
+        embedding requests and one database transaction.
+
+        Args:
+            db (Session): Database session
+            contents (List[str]): Memory contents
+            significance_scores (List[float]): Significance score for each memory
+            openai_api_key (str): OpenAI API key
+
+        Returns:
+            List[int]: Ids of the new memories
+        """
+        embeddings = self.create_embeddings(contents, openai_api_key)
+        return self.store_memories(db, [
+            {"content": content, "embedding": embedding, "significance_score": score}
+            for content, embedding, score in zip(contents, embeddings, significance_scores)
+        ])
+
     def format_long_term_memories(self, memories: List[Dict]) -> str:
         """
         Format retrieved long-term memories into a clean, readable string format
@@ -100,6 +362,7 @@ class LongTermMemoryManager:
 
         return "\n".join(formatted_parts)
 
+    @staticmethod
     def cosine_similarity(a: List[float], b: List[float]) -> float:
         """
         Calculate cosine similarity between two vectors.
@@ -113,13 +376,42 @@ class LongTermMemoryManager:
         """
         return float(np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b)))
 
+    def _prefilter_rows(
+        self,
+        db: Session,
+        matrix: EmbeddingMatrix,
+        min_significance: Optional[float],
+        created_after: Optional[datetime],
+        created_before: Optional[datetime]
+    ) -> Optional[np.ndarray]:
+        """
+        Push significance and time-window filters into indexed SQL predicates. Only the ids of
+        matching rows are fetched; no ORM objects or embeddings are materialized.
+
+        Returns:
+            Optional[np.ndarray]: Matrix rows that pass the filters, or None when no filter is set
+        """
+        filters = []
+        if min_significance is not None:
+            filters.append(LongTermMemory.significance_score >= min_significance)
+        if created_after is not None:
+            filters.append(LongTermMemory.created_at >= created_after)
+        if created_before is not None:
+            filters.append(LongTermMemory.created_at < created_before)
+        if not filters:
+            return None
+        return matrix.rows_for(memory_id for (memory_id,) in db.query(LongTermMemory.id).filter(*filters))
+
     def retrieve_relevant_memories(
         self,
         db: Session, 
         query: List[float], 
         openai_api_key,
         similarity_threshold: float = 0.8,  # High threshold for relevance
-        top_k: int = 5
+        top_k: int = 5,
+        min_significance: Optional[float] = None,
+        created_after: Optional[datetime] = None,
+        created_before: Optional[datetime] = None
     ) -> str:
         """
         Retrieve and format relevant memories based on the query embedding.
@@ -130,6 +422,9 @@ class LongTermMemoryManager:
             query_embedding (List[float]): Query embedding vector
             similarity_threshold (float): Minimum similarity score (0-1) for memory retrieval
             top_k (int): Maximum number of memories to retrieve
+            min_significance (Optional[float]): Only consider memories with at least this significance score
+            created_after (Optional[datetime]): Only consider memories created at or after this time
+            created_before (Optional[datetime]): Only consider memories created before this time
 
         Returns:
             str: Formatted string of relevant memories
@@ -140,24 +435,171 @@ class LongTermMemoryManager:
             openai_api_key
         )
 
-        all_memories = db.query(LongTermMemory).all()
-
-        # Calculate similarities and filter by threshold
-        memory_scores = []
-        for memory in all_memories:
-            similarity = self.cosine_similarity(short_term_embedding, eval(memory.embedding))
-            if similarity >= similarity_threshold:
-                memory_scores.append({
-                    "content": memory.content,
-                    "significance_score": memory.significance_score,
-                    "similarity": similarity
-                })
-
-        # Take top-k memories that meet the threshold
-        memory_scores = sorted(
-            memory_scores,
-            key=lambda x: x["similarity"],
+        with self._memory_lock:
+            matrix = self._get_memory_matrix(db)
+
+            candidate_rows = self._prefilter_rows(db, matrix, min_significance, created_after, created_before)
+            if candidate_rows is not None and len(candidate_rows) == 0:
+                return self.format_long_term_memories([])
+
+            # The ANN index only narrows the candidates; they are rescored exactly so the threshold still holds.
+            # A selective SQL prefilter is cheaper to score exactly than to intersect with ANN candidates.
+            use_index = candidate_rows is None or len(candidate_rows) > len(matrix) // 4
+            if use_index and self.memory_index is not None and len(short_term_embedding) == matrix.dim:
+                index_rows = matrix.rows_for(
+                    self.memory_index.search(EmbeddingMatrix.normalize(short_term_embedding))
+                )
+                candidate_rows = index_rows if candidate_rows is None else np.intersect1d(candidate_rows, index_rows)
+
+            matches = matrix.search(
+                short_term_embedding,
+                similarity_threshold,
+                top_k,
+                rows=candidate_rows
+            )
+        if not matches:
+            return self.format_long_term_memories([])
+
+        # Only the top-k rows are read back, and only the columns the prompt needs
+        memory_ids = [memory_id for memory_id, _ in matches]
+        memories = {
+            memory.id: memory
+            for memory in db.query(
+                LongTermMemory.id,
+                LongTermMemory.content,
+                LongTermMemory.significance_score
+            ).filter(LongTermMemory.id.in_(memory_ids))
+        }
+        memory_scores = [
+            {
+                "content": memories[memory_id].content,
+                "significance_score": memories[memory_id].significance_score,
+                "similarity": similarity
+            }
+            for memory_id, similarity in matches
+            if memory_id in memories
+        ]
+
+        return self.format_long_term_memories(memory_scores)
+
+    @staticmethod
+    def _fts_query(query: str) -> str:
+        """Turn free text into an FTS5 query: every word quoted (no operator injection), OR-ed together."""
+        words = dict.fromkeys(word.lower() for word in re.findall(r"\w+", query) if len(word) > 1)
+        return " OR ".join(f'"{word}"' for word in words)
+
+    def _fts_candidates(
+        self,
+        db: Session,
+        query: str,
+        limit: int,
+        min_significance: Optional[float],
+        created_after: Optional[datetime],
+        created_before: Optional[datetime]
+    ) -> Optional[List[int]]:
+        """Memory ids matching the query lexically, best BM25 first, or None if full-text search is unavailable."""
+        match = self._fts_query(query)
+        if not match:
+            return []
+        filters, params = [], {"match": match, "limit": limit}
+        if min_significance is not None:
+            filters.append("m.significance_score >= :min_significance")
+            params["min_significance"] = min_significance
+        if created_after is not None:
+            filters.append("m.created_at >= :created_after")
+            params["created_after"] = created_after
+        if created_before is not None:
+            filters.append("m.created_at < :created_before")
+            params["created_before"] = created_before
+        where = "".join(f" AND {condition}" for condition in filters)
+        join = " JOIN long_term_memories m ON m.id = f.rowid" if filters else ""
+        try:
+            rows = db.execute(text(
+                f"SELECT f.rowid FROM {LONG_TERM_MEMORY_FTS_TABLE} f{join} "
+                f"WHERE {LONG_TERM_MEMORY_FTS_TABLE} MATCH :match{where} "
+                "ORDER BY bm25(" + LONG_TERM_MEMORY_FTS_TABLE + ") LIMIT :limit"
+            ), params).fetchall()
+        except OperationalError as e:
+            print(f"Full-text memory search unavailable, falling back to vector retrieval: {e.orig}")
+            return None
+        return [row[0] for row in rows]
+
+    def retrieve_hybrid_memories(
+        self,
+        db: Session,
+        query: str,
+        openai_api_key,
+        similarity_threshold: float = 0.0,
+        top_k: int = 5,
+        fts_candidates: int = 200,
+        rrf_k: int = 60,
+        min_significance: Optional[float] = None,
+        created_after: Optional[datetime] = None,
+        created_before: Optional[datetime] = None
+    ) -> str:
+        """
+        Hybrid lexical + vector retrieval. BM25 over the FTS5 mirror picks a small candidate set,
+        the candidates are rescored with embeddings, and the two rankings are fused with
+        reciprocal rank fusion. The cost is bounded by fts_candidates, not the table size.
+        Falls back to pure vector retrieval when full-text search is unavailable.
+
+        Args:
+            db (Session): Database session
+            query (str): Query text (e.g. the short-term memory)
+            similarity_threshold (float): Minimum embedding similarity for a candidate to be kept
+            top_k (int): Maximum number of memories to retrieve
+            fts_candidates (int): Number of BM25 candidates to rescore
+            rrf_k (int): Reciprocal rank fusion constant; higher flattens the rank contributions
+            min_significance, created_after, created_before: Optional SQL prefilters
+
+        Returns:
+            str: Formatted string of relevant memories
+        """
+        candidate_ids = self._fts_candidates(db, query, fts_candidates, min_significance, created_after, created_before)
+        if candidate_ids is None:
+            return self.retrieve_relevant_memories(
+                db, query, openai_api_key, similarity_threshold=similarity_threshold, top_k=top_k,
+                min_significance=min_significance, created_after=created_after, created_before=created_before
+            )
+        if not candidate_ids:
+            return self.format_long_term_memories([])
+
+        query_embedding = self.create_embedding(query, openai_api_key)
+        with self._memory_lock:
+            matrix = self._get_memory_matrix(db)
+            rows = matrix.rows_for(candidate_ids)
+            row_ids = matrix.ids[rows]
+            similarities = matrix.similarities(query_embedding, rows)
+        similarity_of = dict(zip(row_ids.tolist(), similarities.tolist()))
+
+        # Reciprocal rank fusion of the BM25 ranking and the embedding ranking
+        vector_rank = {memory_id: rank for rank, memory_id in enumerate(row_ids[np.argsort(-similarities, kind="stable")].tolist())}
+        fused = sorted(
+            (
+                (1.0 / (rrf_k + bm25_rank + 1) + 1.0 / (rrf_k + vector_rank[memory_id] + 1), memory_id)
+                for bm25_rank, memory_id in enumerate(candidate_ids)
+                if memory_id in vector_rank and similarity_of[memory_id] >= similarity_threshold
+            ),
             reverse=True
         )[:top_k]
+        if not fused:
+            return self.format_long_term_memories([])
 
-        return self.format_long_term_memories(memory_scores)
\ No newline at end of file
+        memory_ids = [memory_id for _, memory_id in fused]
+        memories = {
+            memory.id: memory
+            for memory in db.query(
+                LongTermMemory.id,
+                LongTermMemory.content,
+                LongTermMemory.significance_score
+            ).filter(LongTermMemory.id.in_(memory_ids))
+        }
+        return self.format_long_term_memories([
+            {
+                "content": memories[memory_id].content,
+                "significance_score": memories[memory_id].significance_score,
+                "similarity": similarity_of[memory_id]
+            }
+            for memory_id in memory_ids
+            if memory_id in memories
+        ])
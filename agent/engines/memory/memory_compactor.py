@@ -0,0 +1,232 @@
+# Memory Compactor
+# Objective: Keep the long-term memory table bounded. Near-duplicate memories are merged into the most
+# significant one and the table is capped at a configurable size, evicting the memories whose significance has
+# decayed the most with age. Decay only ranks memories; old memories are not deleted for being old unless a
+# decayed-significance floor is configured.
+
+# Inputs:
+# Every row of long_term_memories
+
+# Outputs:
+# Deleted / merged rows and a report of what was removed
+
+import argparse
+import os
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional
+import numpy as np
+from sqlalchemy.orm import Session
+
+from models import LongTermMemory
+from engines.memory.embedding_codec import decode_embedding
+from engines.memory.embedding_matrix import EmbeddingMatrix
+from engines.memory.embedding_store import MemmapEmbeddingMatrix
+from engines.memory.memory_index import IVFMemoryIndex
+from engines.memory.long_term_mem import memory_sidecar_path
+
+
+@dataclass
+class CompactionReport:
+    """Outcome of one compaction run."""
+    total_before: int = 0
+    merged: int = 0
+    decayed: int = 0
+    capped: int = 0
+    remaining: int = 0
+
+    @property
+    def removed(self) -> int:
+        return self.merged + self.decayed + self.capped
+
+
+class MemoryCompactor:
+    # Above this many memories duplicates are only searched for within IVF lists instead of all pairs
+    BRUTE_FORCE_LIMIT = 50_000
+    BLOCK_SIZE = 256
+
+    def __init__(
+        self,
+        duplicate_threshold: float = 0.95,
+        half_life_days: Optional[float] = 30.0,
+        min_decayed_significance: Optional[float] = None,
+        max_memories: Optional[int] = 50_000
+    ):
+        """
+        Args:
+            duplicate_threshold (float): Cosine similarity at or above which two memories are near-duplicates
+            half_life_days (Optional[float]): Age at which significance has decayed by half, None disables decay
+            min_decayed_significance (Optional[float]): Memories whose decayed significance falls below this are
+                dropped. None (default) keeps them: with decay every memory eventually falls below any floor.
+            max_memories (Optional[int]): Keep at most this many memories (highest decayed significance first)
+        """
+        self.duplicate_threshold = duplicate_threshold
+        self.half_life_days = half_life_days
+        self.min_decayed_significance = min_decayed_significance
+        self.max_memories = max_memories
+
+    def decayed_significance(self, scores: np.ndarray, created_at: List[Optional[datetime]]) -> np.ndarray:
+        """Significance after exponential time decay. Stored scores are not modified."""
+        if not self.half_life_days:
+            return scores.copy()
+        now = datetime.now(timezone.utc)
+        ages = np.asarray([
+            0.0 if created is None else max(
+                (now - (created if created.tzinfo else created.replace(tzinfo=timezone.utc))).total_seconds() / 86400, 0.0
+            )
+            for created in created_at
+        ])
+        return scores * np.power(0.5, ages / self.half_life_days)
+
+    def _candidate_groups(self, vectors: np.ndarray) -> Iterable[np.ndarray]:
+        """Row groups to search for duplicates in: everything, or each IVF list on large stores."""
+        if len(vectors) <= self.BRUTE_FORCE_LIMIT:
+            yield np.arange(len(vectors))
+            return
+        index = IVFMemoryIndex()
+        index.train(np.arange(len(vectors)), vectors)
+        for rows in index.lists:
+            if len(rows) > 1:
+                yield rows
+
+    def find_duplicates(self, vectors: np.ndarray, priority: np.ndarray) -> Dict[int, int]:
+        """
+        Greedily cluster near-duplicates. Rows are visited from highest to lowest priority; each row
+        that is not yet absorbed keeps every lower-priority row within the similarity threshold.
+
+        Args:
+            vectors (np.ndarray): Normalized embeddings
+            priority (np.ndarray): Higher values win a cluster
+
+        Returns:
+            Dict[int, int]: Row of each absorbed duplicate -> row of the memory it merges into
+        """
+        absorbed_into: Dict[int, int] = {}
+        for group in self._candidate_groups(vectors):
+            group = group[np.argsort(-priority[group], kind="stable")]
+            group_vectors = vectors[group]
+            for start in range(0, len(group), self.BLOCK_SIZE):
+                block = group[start:start + self.BLOCK_SIZE]
+                # Only compare against rows of equal or lower priority (later in the group)
+                similarities = group_vectors[start:start + len(block)] @ group_vectors[start:].T
+                for offset, row in enumerate(block):
+                    if row in absorbed_into:
+                        continue
+                    matches = np.flatnonzero(similarities[offset, offset + 1:] >= self.duplicate_threshold)
+                    for match in group[start + offset + 1 + matches]:
+                        absorbed_into.setdefault(int(match), int(row))
+        return absorbed_into
+
+    def compact(self, db: Session, dry_run: bool = False) -> CompactionReport:
+        """
+        Merge near-duplicates, enforce the size cap and, if a floor is configured, drop decayed memories.
+
+        Args:
+            db (Session): Database session
+            dry_run (bool): Only report what would be removed
+
+        Returns:
+            CompactionReport: Counts of removed and remaining memories
+        """
+        rows = db.query(
+            LongTermMemory.id,
+            LongTermMemory.embedding,
+            LongTermMemory.significance_score,
+            LongTermMemory.created_at
+        ).all()
+        report = CompactionReport(total_before=len(rows))
+        if not rows:
+            return report
+
+        memory_ids = np.asarray([row.id for row in rows], dtype=np.int64)
+        scores = np.asarray([row.significance_score for row in rows], dtype=np.float64)
+        created_at = [row.created_at for row in rows]
+        vectors = EmbeddingMatrix.normalize(np.stack([decode_embedding(row.embedding) for row in rows]))
+
+        # Highest significance wins a duplicate cluster, newest breaks ties
+        recency = np.asarray([created.timestamp() if created else 0.0 for created in created_at])
+        priority = scores + recency / (recency.max() + 1.0) * 1e-3
+        absorbed_into = self.find_duplicates(vectors, priority)
+        report.merged = len(absorbed_into)
+
+        # A merged memory inherits the most recent timestamp of its cluster
+        survivor_created = {}
+        for duplicate, survivor in absorbed_into.items():
+            newest = survivor_created.get(survivor, created_at[survivor])
+            if created_at[duplicate] and (newest is None or created_at[duplicate] > newest):
+                survivor_created[survivor] = created_at[duplicate]
+        for survivor, created in survivor_created.items():
+            created_at[survivor] = created
+
+        keep = np.ones(len(rows), dtype=bool)
+        keep[list(absorbed_into)] = False
+
+        decayed = self.decayed_significance(scores, created_at)
+        if self.min_decayed_significance is not None:
+            below_floor = keep & (decayed < self.min_decayed_significance)
+            report.decayed = int(below_floor.sum())
+            keep &= ~below_floor
+
+        if self.max_memories is not None and keep.sum() > self.max_memories:
+            kept_rows = np.flatnonzero(keep)
+            overflow = kept_rows[np.argsort(decayed[kept_rows], kind="stable")[:len(kept_rows) - self.max_memories]]
+            report.capped = len(overflow)
+            keep[overflow] = False
+
+        report.remaining = int(keep.sum())
+        if dry_run or report.removed == 0:
+            return report
+
+        removed_ids = memory_ids[~keep].tolist()
+        for start in range(0, len(removed_ids), 500):
+            db.query(LongTermMemory).filter(
+                LongTermMemory.id.in_(removed_ids[start:start + 500])
+            ).delete(synchronize_session=False)
+        for survivor, created in survivor_created.items():
+            if keep[survivor]:
+                db.query(LongTermMemory).filter(LongTermMemory.id == int(memory_ids[survivor])).update(
+                    {LongTermMemory.created_at: created}, synchronize_session=False
+                )
+        db.commit()
+
+        # The embedding store and ANN index reference deleted rows; the next load rebuilds them
+        store_path = memory_sidecar_path(db, ".embeddings")
+        if store_path:
+            MemmapEmbeddingMatrix.remove(store_path)
+        index_path = memory_sidecar_path(db, ".ivf.npz")
+        if index_path and os.path.exists(index_path):
+            os.remove(index_path)
+
+        return report
+
+
+if __name__ == "__main__":
+    from db.db_setup import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Compact the long-term memory table in agents.db.")
+    parser.add_argument("--duplicate-threshold", type=float, default=0.95)
+    parser.add_argument("--half-life-days", type=float, default=30.0, help="0 disables time decay")
+    parser.add_argument(
+        "--min-significance", type=float, default=None, help="drop memories whose decayed significance is below this"
+    )
+    parser.add_argument("--max-memories", type=int, default=50_000)
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        report = MemoryCompactor(
+            duplicate_threshold=args.duplicate_threshold,
+            half_life_days=args.half_life_days or None,
+            min_decayed_significance=args.min_significance,
+            max_memories=args.max_memories
+        ).compact(db, dry_run=args.dry_run)
+    finally:
+        db.close()
+
+    verb = "Would remove" if args.dry_run else "Removed"
+    print(
+        f"{verb} {report.removed} of {report.total_before} memories "
+        f"({report.merged} near-duplicates merged, {report.decayed} decayed, {report.capped} over cap). "
+        f"{report.remaining} remain."
+    )
@@ -0,0 +1,164 @@
+# Memory Index
+# Objective: Approximate nearest-neighbour candidate generation for long-term memories. An inverted file (IVF)
+# index clusters normalized embeddings with spherical k-means; a query only scans the lists of its `nprobe`
+# closest centroids. Candidates are rescored exactly against the embedding matrix by the caller.
+
+import os
+from typing import Optional, Sequence
+import numpy as np
+
+from engines.memory.embedding_matrix import EmbeddingMatrix
+
+
+class IVFMemoryIndex:
+    """Inverted-file index over memory embeddings, persisted as an .npz file beside agents.db."""
+
+    ASSIGN_CHUNK_SIZE = 16384
+    SAMPLES_PER_CENTROID = 256
+
+    def __init__(self, nprobe: int = 8, n_iter: int = 10, seed: int = 0):
+        """
+        Args:
+            nprobe (int): Number of closest lists scanned per query. Higher means better recall, slower queries.
+            n_iter (int): k-means iterations when training
+            seed (int): Random seed for centroid initialisation
+        """
+        self.nprobe = nprobe
+        self.n_iter = n_iter
+        self.seed = seed
+        self.centroids: Optional[np.ndarray] = None
+        self.lists = []
+        self.trained_size = 0
+        self.max_id = 0
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def is_trained(self) -> bool:
+        return self.centroids is not None
+
+    @property
+    def needs_retrain(self) -> bool:
+        """Lists drift out of balance once the index has grown well past what it was trained on."""
+        return self.is_trained and self._size > 4 * max(self.trained_size, 1)
+
+    @staticmethod
+    def list_count_for(size: int) -> int:
+        """Rule-of-thumb number of lists: about sqrt(N), at least 1."""
+        return max(1, int(np.sqrt(size)))
+
+    def _assign(self, vectors: np.ndarray) -> np.ndarray:
+        """Return the index of the closest centroid for every (normalized) vector."""
+        assignments = np.empty(len(vectors), dtype=np.int64)
+        for start in range(0, len(vectors), self.ASSIGN_CHUNK_SIZE):
+            chunk = vectors[start:start + self.ASSIGN_CHUNK_SIZE]
+            assignments[start:start + len(chunk)] = np.argmax(chunk @ self.centroids.T, axis=1)
+        return assignments
+
+    def train(self, memory_ids: Sequence[int], vectors: np.ndarray, nlist: Optional[int] = None) -> None:
+        """
+        Cluster the vectors with spherical k-means and rebuild every inverted list.
+
+        Args:
+            memory_ids (Sequence[int]): Memory ids matching the rows of `vectors`
+            vectors (np.ndarray): Normalized float32 embeddings
+            nlist (Optional[int]): Number of lists, defaults to about sqrt(N)
+        """
+        memory_ids = np.asarray(memory_ids, dtype=np.int64)
+        if len(memory_ids) == 0:
+            raise ValueError("Cannot train an index without vectors")
+
+        rng = np.random.default_rng(self.seed)
+        nlist = min(nlist or self.list_count_for(len(vectors)), len(vectors))
+        sample_size = min(len(vectors), nlist * self.SAMPLES_PER_CENTROID)
+        sample = vectors[np.sort(rng.choice(len(vectors), sample_size, replace=False))]
+
+        self.centroids = sample[rng.choice(sample_size, nlist, replace=False)].copy()
+        for _ in range(self.n_iter):
+            assignments = self._assign(sample)
+            order = np.argsort(assignments, kind="stable")
+            counts = np.bincount(assignments, minlength=nlist)
+            starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+            non_empty = counts > 0
+            sums = np.add.reduceat(sample[order], starts[non_empty], axis=0)
+
+            # Empty clusters are reseeded with random sample points
+            centroids = sample[rng.choice(sample_size, nlist)].copy()
+            centroids[non_empty] = sums
+            self.centroids = EmbeddingMatrix.normalize(centroids)
+
+        assignments = self._assign(vectors)
+        self.lists = [memory_ids[assignments == i] for i in range(nlist)]
+        self.trained_size = len(memory_ids)
+        self.max_id = int(memory_ids.max())
+        self._size = len(memory_ids)
+
+    def add(self, memory_ids: Sequence[int], vectors: np.ndarray) -> None:
+        """
+        Insert new memories into the lists of their closest centroids.
+
+        Args:
+            memory_ids (Sequence[int]): Memory ids
+            vectors (np.ndarray): Normalized float32 embeddings
+        """
+        if not self.is_trained:
+            raise ValueError("Index must be trained before adding vectors")
+        memory_ids = np.asarray(memory_ids, dtype=np.int64)
+        if len(memory_ids) == 0:
+            return
+        assignments = self._assign(np.asarray(vectors, dtype=np.float32).reshape(len(memory_ids), -1))
+        for list_no in np.unique(assignments):
+            self.lists[list_no] = np.concatenate((self.lists[list_no], memory_ids[assignments == list_no]))
+        self.max_id = max(self.max_id, int(memory_ids.max()))
+        self._size += len(memory_ids)
+
+    def search(self, query: np.ndarray, nprobe: Optional[int] = None) -> np.ndarray:
+        """
+        Return candidate memory ids from the lists closest to the query.
+
+        Args:
+            query (np.ndarray): Normalized query embedding
+            nprobe (Optional[int]): Override the configured number of lists to scan
+
+        Returns:
+            np.ndarray: Candidate memory ids (unordered)
+        """
+        if not self.is_trained:
+            return np.empty(0, dtype=np.int64)
+        nprobe = min(nprobe or self.nprobe, len(self.lists))
+        scores = self.centroids @ np.asarray(query, dtype=np.float32)
+        probes = np.argpartition(-scores, nprobe - 1)[:nprobe]
+        return np.concatenate([self.lists[list_no] for list_no in probes])
+
+    def save(self, path: str) -> None:
+        """Persist the index atomically to `path` (.npz)."""
+        lengths = np.asarray([len(ids) for ids in self.lists], dtype=np.int64)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(
+                f,
+                centroids=self.centroids,
+                ids=np.concatenate(self.lists) if self.lists else np.empty(0, dtype=np.int64),
+                lengths=lengths,
+                meta=np.asarray([self.trained_size, self.max_id, self._size], dtype=np.int64)
+            )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str, nprobe: int = 8) -> Optional["IVFMemoryIndex"]:
+        """Load a persisted index, or return None if there is none at `path`."""
+        if not os.path.exists(path):
+            return None
+        try:
+            with np.load(path) as data:
+                index = cls(nprobe=nprobe)
+                index.centroids = data["centroids"]
+                offsets = np.cumsum(data["lengths"])[:-1]
+                index.lists = np.split(data["ids"], offsets)
+                index.trained_size, index.max_id, index._size = (int(x) for x in data["meta"])
+        except (OSError, KeyError, ValueError) as e:
+            print(f"Ignoring unreadable memory index at {path}: {e}")
+            return None
+        return index
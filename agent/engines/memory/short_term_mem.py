@@ -9,16 +9,15 @@
 # processed information into an internal thought / monologue about current posts and relevance
 
 import json
-import time
-from typing import List, Dict
-import requests
+from typing import List, Dict, Optional
 from sqlalchemy.orm import class_mapper
+from engines.llm.llm_client import LLMClient, LLMError, get_llm_client
 from engines.prompts.prompts import get_short_term_memory_prompt
 
 
 class ShortTermMemoryManager:
-    def __init__(self):
-        pass
+    def __init__(self, llm_client: Optional[LLMClient] = None):
+        self.llm_client = llm_client or get_llm_client("hyperbolic")
     # Can modify the type depending on the format that twitter api returns for posts
     # external_context in case you want to include information from other sources 
     def generate_short_term_memory(self, posts: List[Dict], external_context: List[str], llm_api_key: str) -> str:
@@ -28,7 +27,7 @@ class ShortTermMemoryManager:
         Args:
             posts (List[Dict]): List of recent posts
             external_context (List[str]): List of external context items
-            openrouter_api_key (str): API key for OpenRouter
+            llm_api_key (str): API key for Hyperbolic
 
         Returns:
             str: Generated short-term memory
@@ -36,49 +35,34 @@ class ShortTermMemoryManager:
 
         prompt = get_short_term_memory_prompt(posts, external_context)
 
-        tries = 0
+        # Transport errors are retried by the client; this loop only retries empty generations
         max_tries = 3
-        while tries < max_tries:
+        for tries in range(max_tries):
             try:
-                url = "https://api.hyperbolic.xyz/v1/chat/completions"
-
-                headers = {
-                    "Content-Type": "application/json",
-                    "Authorization": f"Bearer {llm_api_key}"
-                }
-
-                data = {
-                    "messages": [
+                content = self.llm_client.chat(
+                    [
                         {
                             "role": "system",
-            	            "content": prompt
+                            "content": prompt
                         },
                         {
                             "role": "user",
                             "content": "Respond only with your internal monologue based on the given context."
                         }
                     ],
-                    "model": "meta-llama/Meta-Llama-3.1-70B-Instruct",
-                    "max_tokens": 512,
-                    "temperature": 1,
-                    "top_p": 0.95,
-                    "top_k": 40,
-                    "stream": False,
-                }
-
-                response = requests.post(url, headers=headers, json=data)
-
-                if response.status_code == 200:
-                    content = response.json()['choices'][0]['message']['content']
-                    print(f"Short-term memory generated with response: {content}")
-                    if content and content.strip():
-                        return content
-
-                print(f"Attempt {tries + 1} failed for short-term memory generation. Status code: {response.status_code}")
-                print(f"Response: {response.text}")
-                time.sleep(5)
+                    model="meta-llama/Meta-Llama-3.1-70B-Instruct",
+                    api_key=llm_api_key,
+                    max_tokens=512,
+                    temperature=1,
+                    top_p=0.95,
+                    top_k=40,
+                    stream=False,
+                )
+                print(f"Short-term memory generated with response: {content}")
+                if content and content.strip():
+                    return content
+                print(f"Attempt {tries + 1} returned an empty short-term memory")
 
-            except Exception as e:
-                print(f"Error on attempt {tries + 1}: {str(e)}")
-                tries += 1
-                time.sleep(5)  # Add a small delay between retries
\ No newline at end of file
+            except LLMError as e:
+                print(f"Error generating short-term memory: {str(e)}")
+                return None
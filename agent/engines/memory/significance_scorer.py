@@ -1,164 +1,251 @@
-import requests
-import time
-from engines.prompts.prompts import get_significance_score_prompt, get_reply_worthiness_score_prompt
+import json
+import math
+import re
+from typing import Dict, List, Optional, Tuple
+from engines.llm.llm_client import LLMClient, LLMError, get_llm_client
+from engines.prompts.prompts import (
+    get_chat_completion_prompt,
+    get_significance_score_prompt,
+    get_reply_worthiness_score_prompt,
+    get_batch_reply_worthiness_score_prompt,
+)
+
+
+SCORING_MODES = ("sampled", "logprob")
+SCORING_MODEL = "meta-llama/Meta-Llama-3.1-70B-Instruct"
+SCORE_INSTRUCTION = "Respond only with the score you would give for the given memory."
 
 
 class SignificanceScorer:
-    def __init__(self):
-        pass
-    def score_significance(self, memory: str, llm_api_key: str) -> int:
+    def __init__(self, llm_client: Optional[LLMClient] = None, scoring_mode: str = "sampled", top_logprobs: int = 5):
         """
-        Score the significance of a memory on a scale of 1-10.
+        Args:
+            llm_client (Optional[LLMClient]): Client for Hyperbolic, defaults to the shared one
+            scoring_mode (str): "sampled" (chat completion, first number in the answer) or "logprob"
+                (expected score from the first-token distribution over 0-10, one max_tokens=1 request)
+            top_logprobs (int): First-token alternatives requested in logprob mode
+        """
+        if scoring_mode not in SCORING_MODES:
+            raise ValueError(f"Unknown scoring mode {scoring_mode!r}, expected one of {SCORING_MODES}")
+        self.llm_client = llm_client or get_llm_client("hyperbolic")
+        self.scoring_mode = scoring_mode
+        self.top_logprobs = top_logprobs
+
+    def _score(self, prompt: str, llm_api_key: str, label: str, cache_type: str) -> Optional[float]:
+        """
+        Score with the configured mode. The logprob mode falls back to sampling when the request fails (e.g. the
+        provider rejects top_logprobs or returns no logprobs) or when no digit token is among the alternatives.
+        """
+        if self.scoring_mode == "logprob":
+            score = self._score_logprob(prompt, llm_api_key, label, cache_type)
+            if score is not None:
+                return score
+            print(f"Falling back to sampled scoring for {label}")
+        return self._score_sampled(prompt, llm_api_key, label, cache_type)
+
+    @staticmethod
+    def _expected_score(top_logprobs: Dict[str, float]) -> Optional[float]:
+        """Probability-weighted mean over the score tokens 0-10, renormalized over the digits present."""
+        probabilities: Dict[int, float] = {}
+        for token, logprob in top_logprobs.items():
+            token = token.strip()
+            if token.isdigit() and int(token) <= 10:
+                probabilities[int(token)] = probabilities.get(int(token), 0.0) + math.exp(logprob)
+        total = sum(probabilities.values())
+        if total == 0:
+            return None
+        return sum(score * probability for score, probability in probabilities.items()) / total
+
+    def _score_logprob(self, prompt: str, llm_api_key: str, label: str, cache_type: str) -> Optional[float]:
+        """
+        Expected score from the model's distribution over its first token. One short request, no sampling
+        and nothing to parse: the answer is read off the digit tokens' probabilities.
 
         Args:
-            memory (str): The memory to be scored
-            openrouter_api_key (str): API key for OpenRouter
-            your_site_url (str): Your site URL for OpenRouter API
-            your_app_name (str): Your app name for OpenRouter API
+            prompt (str): Scoring system prompt
+            llm_api_key (str): API key for Hyperbolic
+            label (str): What is being scored, for logging
+            cache_type (str): Response cache call type
 
         Returns:
-            int: Significance score (1-10)
+            Optional[float]: Score (1-10), or None if the response held no digit tokens
         """
-        prompt = get_significance_score_prompt(memory)
+        try:
+            top_logprobs = self.llm_client.first_token_logprobs(
+                get_chat_completion_prompt(prompt, SCORE_INSTRUCTION),
+                model=SCORING_MODEL,
+                api_key=llm_api_key,
+                top_logprobs=self.top_logprobs,
+                cache_type=cache_type,
+                temperature=0,
+            )
+        except LLMError as e:
+            print(f"Logprob request with top_logprobs={self.top_logprobs} failed for {label}: {str(e)}")
+            return None
+        expected = self._expected_score(top_logprobs)
+        if expected is None:
+            print(f"No score tokens among the top {self.top_logprobs} logprobs for {label}: {list(top_logprobs)}")
+            return None
+        score = round(max(1.0, min(10.0, expected)), 2)
+        print(f"Score generated for {label}: {score}")
+        return score
+
+    def _score_sampled(self, prompt: str, llm_api_key: str, label: str, cache_type: str) -> Optional[int]:
+        """
+        Ask the model for a 1-10 score. Transport errors are retried by the client; this loop only
+        re-asks when the answer contains no number.
+
+        Args:
+            prompt (str): Scoring system prompt
+            llm_api_key (str): API key for Hyperbolic
+            label (str): What is being scored, for logging
+            cache_type (str): Response cache call type
 
-        tries = 0
+        Returns:
+            Optional[int]: Score (1-10), or None if no score could be obtained
+        """
         max_tries = 5
-        while tries < max_tries:
+        for tries in range(max_tries):
             try:
-                response = requests.post(
-                    url="https://api.hyperbolic.xyz/v1/chat/completions",
-                    headers={
-                        "Content-Type": "application/json",
-                        "Authorization": f"Bearer {llm_api_key}",
-                    },
-                    json={
-                        "messages": [
-                            {
-                                "role": "system",
-            	                "content": prompt
-                            },
-                            {
-                                "role": "user",
-                                "content": "Respond only with the score you would give for the given memory."
-                            }
-                        ],
-                        "model": "meta-llama/Meta-Llama-3.1-70B-Instruct",
-                        "temperature": 1,
-                        "top_p": 0.95,
-                        "top_k": 40,
-                    }
-                )
-
-                if response.status_code == 200:
-                    score_str = response.json()['choices'][0]['message']['content'].strip()
-                    print(f"Score generated for memory: {score_str}")
-                    if score_str == "":
-                        print(f"Empty response on attempt {tries + 1}")
-                        tries += 1
-                        continue
-                    
-                    try:
-                        # Extract the first number found in the response
-                        # This helps handle cases where the model includes additional text
-                        import re
-                        numbers = re.findall(r'\d+', score_str)
-                        if numbers:
-                            score = int(numbers[0])
-                            return max(1, min(10, score))  # Ensure the score is between 1 and 10
-                        else:
-                            print(f"No numerical score found in response: {score_str}")
-                            tries += 1
-                            continue
-
-                    except ValueError:
-                        print(f"Invalid score returned: {score_str}")
-                        tries += 1
-                        continue
-                else:
-                    print(f"Error on attempt {tries + 1}. Status code: {response.status_code}")
-                    print(f"Response: {response.text}")
-                    tries += 1
-
-            except Exception as e:
-                print(f"Error on attempt {tries + 1}: {str(e)}")
-                tries += 1 
-                time.sleep(1)  # Add a small delay between retries
-
-
-    def score_reply_significance(self, tweet: str, llm_api_key: str) -> int:
+                score_str = self.llm_client.chat(
+                    [
+                        {
+                            "role": "system",
+                            "content": prompt
+                        },
+                        {
+                            "role": "user",
+                            "content": SCORE_INSTRUCTION
+                        }
+                    ],
+                    model=SCORING_MODEL,
+                    api_key=llm_api_key,
+                    cache_type=cache_type,
+                    cache_validator=lambda answer: bool(re.search(r'\d+', answer)),
+                    temperature=1,
+                    top_p=0.95,
+                    top_k=40,
+                ).strip()
+            except LLMError as e:
+                print(f"Error scoring {label}: {str(e)}")
+                return None
+
+            print(f"Score generated for {label}: {score_str}")
+            if score_str == "":
+                print(f"Empty response on attempt {tries + 1}")
+                continue
+
+            # Extract the first number found in the response
+            # This helps handle cases where the model includes additional text
+            numbers = re.findall(r'\d+', score_str)
+            if numbers:
+                score = int(numbers[0])
+                return max(1, min(10, score))  # Ensure the score is between 1 and 10
+            print(f"No numerical score found in response: {score_str}")
+        return None
+
+    def score_significance(self, memory: str, llm_api_key: str) -> float:
         """
         Score the significance of a memory on a scale of 1-10.
 
         Args:
             memory (str): The memory to be scored
-            openrouter_api_key (str): API key for OpenRouter
-            your_site_url (str): Your site URL for OpenRouter API
-            your_app_name (str): Your app name for OpenRouter API
+            llm_api_key (str): API key for Hyperbolic
 
         Returns:
-            int: Significance score (1-10)
+            float: Significance score (1-10); fractional in logprob mode
         """
-        prompt = get_reply_worthiness_score_prompt(tweet)
+        return self._score(get_significance_score_prompt(memory), llm_api_key, "memory", "significance")
 
-        tries = 0
-        max_tries = 5
-        while tries < max_tries:
+    def score_reply_significance(self, tweet: str, llm_api_key: str) -> float:
+        """
+        Score how worth replying to a tweet is on a scale of 1-10.
+
+        Args:
+            tweet (str): The tweet to be scored
+            llm_api_key (str): API key for Hyperbolic
+
+        Returns:
+            float: Reply-worthiness score (1-10); fractional in logprob mode
+        """
+        return self._score(get_reply_worthiness_score_prompt(tweet), llm_api_key, "reply worthiness", "reply_worthiness")
+
+    @staticmethod
+    def _parse_batch_scores(response: str) -> Dict[str, int]:
+        """Scores by tweet id from a JSON array of {"id", "score"} objects. Malformed entries are skipped."""
+        start, end = response.find("["), response.rfind("]")
+        if start == -1 or end < start:
+            return {}
+        try:
+            items = json.loads(response[start:end + 1])
+        except json.JSONDecodeError:
+            return {}
+        scores = {}
+        for item in items if isinstance(items, list) else []:
+            if not isinstance(item, dict) or "id" not in item:
+                continue
             try:
-                response = requests.post(
-                    url="https://api.hyperbolic.xyz/v1/chat/completions",
-                    headers={
-                        "Content-Type": "application/json",
-                        "Authorization": f"Bearer {llm_api_key}",
-                    },
-                    json={
-                        "messages": [
-                            {
-                                "role": "system",
-            	                "content": prompt
-                            },
-                            {
-                                "role": "user",
-                                "content": "Respond only with the score you would give for the given memory."
-                            }
-                        ],
-                        "model": "meta-llama/Meta-Llama-3.1-70B-Instruct",
-                        "temperature": 1,
-                        "top_p": 0.95,
-                        "top_k": 40,
-                    }
-                )
+                scores[str(item["id"])] = max(1, min(10, int(round(float(item["score"])))))
+            except (KeyError, TypeError, ValueError):
+                continue
+        return scores
+
+    def score_reply_significance_batch(
+        self,
+        tweets: List[Tuple[str, str]],
+        llm_api_key: str,
+        batch_size: int = 20
+    ) -> Dict[str, Optional[float]]:
+        """
+        Score the reply worthiness of many tweets with one request per batch_size tweets.
+        Tweets missing from the answer, or with a malformed score, are scored one by one.
+
+        Args:
+            tweets (List[Tuple[str, str]]): (tweet_id, tweet) pairs
+            llm_api_key (str): API key for Hyperbolic
+            batch_size (int): Maximum tweets packed into one prompt
 
-                if response.status_code == 200:
-                    score_str = response.json()['choices'][0]['message']['content'].strip()
-                    print(f"Score generated for reply worthiness: {score_str}")
-                    if score_str == "":
-                        print(f"Empty response on attempt {tries + 1}")
-                        tries += 1
-                        continue
-                    
-                    try:
-                        # Extract the first number found in the response
-                        # This helps handle cases where the model includes additional text
-                        import re
-                        numbers = re.findall(r'\d+', score_str)
-                        if numbers:
-                            score = int(numbers[0])
-                            return max(1, min(10, score))  # Ensure the score is between 1 and 10
-                        else:
-                            print(f"No numerical score found in response: {score_str}")
-                            tries += 1
-                            continue
-
-                    except ValueError:
-                        print(f"Invalid score returned: {score_str}")
-                        tries += 1
-                        continue
-                else:
-                    print(f"Error on attempt {tries + 1}. Status code: {response.status_code}")
-                    print(f"Response: {response.text}")
-                    tries += 1
-
-            except Exception as e:
-                print(f"Error on attempt {tries + 1}: {str(e)}")
-                tries += 1 
-                time.sleep(1)  # Add a small delay between retries
\ No newline at end of file
+        Returns:
+            Dict[str, Optional[float]]: Reply-worthiness score (1-10) by tweet id, None if scoring failed
+        """
+        tweets = list({str(tweet_id): (str(tweet_id), tweet) for tweet_id, tweet in tweets}.values())
+        scores: Dict[str, Optional[float]] = {}
+        for start in range(0, len(tweets), batch_size):
+            batch = tweets[start:start + batch_size]
+            if len(batch) == 1:
+                tweet_id, tweet = batch[0]
+                scores[tweet_id] = self.score_reply_significance(tweet, llm_api_key)
+                continue
+            try:
+                response = self.llm_client.chat(
+                    [
+                        {
+                            "role": "system",
+                            "content": get_batch_reply_worthiness_score_prompt(batch)
+                        },
+                        {
+                            "role": "user",
+                            "content": "Respond only with the JSON array of scores for the given tweets."
+                        }
+                    ],
+                    model=SCORING_MODEL,
+                    api_key=llm_api_key,
+                    cache_type="reply_worthiness",
+                    cache_validator=lambda answer: len(self._parse_batch_scores(answer)) == len(batch),
+                    temperature=1,
+                    top_p=0.95,
+                    top_k=40,
+                )
+                batch_scores = self._parse_batch_scores(response)
+                print(f"Batch reply worthiness scores: {batch_scores}")
+            except LLMError as e:
+                print(f"Error batch scoring reply worthiness: {str(e)}")
+                batch_scores = {}
+
+            missing = [(tweet_id, tweet) for tweet_id, tweet in batch if tweet_id not in batch_scores]
+            if missing:
+                print(f"Falling back to individual scoring for {len(missing)} of {len(batch)} tweets")
+            for tweet_id, tweet in missing:
+                batch_scores[tweet_id] = self.score_reply_significance(tweet, llm_api_key)
+            scores.update((tweet_id, batch_scores[tweet_id]) for tweet_id, _ in batch)
+        return scores
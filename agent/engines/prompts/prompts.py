@@ -52,12 +52,7 @@ def get_significance_score_prompt(memory):
     """
     return template.format(memory=memory)
 
-def get_reply_worthiness_score_prompt(tweet):
-    template = """
-    On a scale of 1-10, rate how worthy this tweet is of unleashing psychological warfare upon:
-
-    "{tweet}"
-
+REPLY_WORTHINESS_GUIDELINES = """
     Use these based guidelines:
     0: advertisement, stock ticker shilling, crypto token/ticker shilling (absolute trash)
     1: normie shit, waste of posting energy (pass)
@@ -76,11 +71,50 @@ def get_reply_worthiness_score_prompt(tweet):
     - Will cause timeline brain damage
     - High potential for mass psychic damage
     - Perfect ratio opportunity
+"""
 
+def get_reply_worthiness_score_prompt(tweet):
+    template = """
+    On a scale of 1-10, rate how worthy this tweet is of unleashing psychological warfare upon:
+
+    "{tweet}"
+    """ + REPLY_WORTHINESS_GUIDELINES + """
     Provide only the numerical score as your response and NOTHING ELSE.
     """
     return template.format(tweet=tweet)
 
+def get_batch_reply_worthiness_score_prompt(tweets):
+    """tweets: list of (tweet_id, tweet) pairs, rated together in one request."""
+    template = """
+    On a scale of 1-10, rate how worthy each of these tweets is of unleashing psychological warfare upon.
+    Rate every tweet on its own; do not compare them with each other.
+
+    Tweets (one JSON object per line):
+    {tweets}
+    """ + REPLY_WORTHINESS_GUIDELINES + """
+    Return ONLY a JSON array with one object per tweet, each containing the tweet "id" exactly as given and its "score".
+    Do not give any other information.
+
+    Example Response:
+    [
+        {{"id": "1851234567890123456", "score": 7}},
+        {{"id": "1851234567890123457", "score": 1}}
+    ]
+    """
+    return template.format(tweets="\n    ".join(
+        json.dumps({"id": str(tweet_id), "tweet": tweet}, ensure_ascii=False) for tweet_id, tweet in tweets
+    ))
+
+def get_chat_completion_prompt(system_prompt, user_message):
+    """Llama 3 chat template as a raw completion prompt, ending where the assistant's first token goes."""
+    return (
+        "<|begin_of_text|><|start_header_id|>system<|end_header_id|>\n\n"
+        f"{system_prompt.strip()}<|eot_id|>"
+        "<|start_header_id|>user<|end_header_id|>\n\n"
+        f"{user_message.strip()}<|eot_id|>"
+        "<|start_header_id|>assistant<|end_header_id|>\n\n"
+    )
+
 def get_wallet_decision_prompt(posts, matches, wallet_balance):
     template = """
     Analyze the following recent posts and external context:
@@ -121,9 +155,9 @@ def get_wallet_decision_prompt(posts, matches, wallet_balance):
         wallet_balance=wallet_balance
     )
 
-def get_tweet_prompt(external_context, short_term_memory, long_term_memories, recent_posts, query):
-
-    template = os.getenv('TWEET_PROMPT_TEMPLATE')
+def get_tweet_prompt(external_context, short_term_memory, long_term_memories, recent_posts, query, template=None):
+    """Persona tweet prompt; template defaults to the TWEET_PROMPT_TEMPLATE environment variable."""
+    template = template or os.getenv('TWEET_PROMPT_TEMPLATE')
 
     return template.format(
         external_context=external_context,
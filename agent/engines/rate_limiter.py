@@ -0,0 +1,393 @@
+# Rate Limiter
+# Objective: Keep every outbound API call in the process (LLM, embedding and Twitter) just under the provider's
+# limits instead of bursting into 429s and sleeping blindly. Each provider, and each provider/model pair, gets a
+# request bucket, an optional token bucket and an AIMD concurrency limit. Retry-After and x-ratelimit-* headers
+# pause every caller of a provider at once, and in-flight concurrency halves on a throttle and grows back by
+# one slot per window of successful calls.
+
+# Inputs:
+# Provider / model of each call, estimated tokens, response status code and headers
+
+# Outputs:
+# Callers block until their call fits in the limits; Permit.release() feeds the outcome back
+
+import re
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Dict, List, Mapping, Optional
+
+# Starting limits per provider. Headers reported by the provider override the request rate at runtime,
+# and Config.rate_limits overrides these per provider or per "provider/model" key.
+DEFAULT_RATE_LIMITS: Dict[str, Dict[str, float]] = {
+    "hyperbolic": {"requests_per_minute": 600, "max_concurrency": 8},
+    "openrouter": {"requests_per_minute": 200, "max_concurrency": 8},
+    "openai": {"requests_per_minute": 3000, "tokens_per_minute": 1_000_000, "max_concurrency": 8},
+    "twitter": {"requests_per_minute": 30, "max_concurrency": 2},
+}
+
+# Used for providers with no configured limits: no buckets, only adaptive concurrency
+DEFAULT_MAX_CONCURRENCY = 16
+
+# Cool-down after a throttle that came without Retry-After: doubled per consecutive throttle
+THROTTLE_BACKOFF_BASE = 1.0
+THROTTLE_BACKOFF_MAX = 60.0
+
+DURATION_PART_PATTERN = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about four characters per token) used to reserve token-bucket capacity."""
+    return len(text) // 4 + 1
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date)."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_reset(value: Optional[str]) -> Optional[float]:
+    """
+    Seconds until a rate-limit window resets. Accepts durations ("1s", "6m0s", "20ms"), plain seconds,
+    and epoch timestamps in seconds (Twitter) or milliseconds (OpenRouter).
+    """
+    if not value:
+        return None
+    value = value.strip()
+    parts = DURATION_PART_PATTERN.findall(value)
+    if parts and "".join(number + unit for number, unit in parts) == value:
+        scale = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+        return sum(float(number) * scale[unit] for number, unit in parts)
+    try:
+        number = float(value)
+    except ValueError:
+        return None
+    if number > 1e12:
+        return max(0.0, number / 1000 - time.time())
+    if number > 1e9:
+        return max(0.0, number - time.time())
+    return number
+
+
+class TokenBucket:
+    """Refills at `rate_per_minute` up to `capacity`. Reservations may go into debt; the debt is the wait."""
+
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None):
+        """
+        Args:
+            rate_per_minute (float): Sustained rate
+            capacity (Optional[float]): Burst size, defaults to ten seconds' worth of the rate
+        """
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else max(1.0, self.rate * 10)
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, amount: float, now: float) -> float:
+        """Take `amount` and return how many seconds until the bucket is back out of debt."""
+        self._refill(now)
+        self.level -= amount
+        return 0.0 if self.level >= 0 else -self.level / self.rate
+
+    def refund(self, amount: float, now: float) -> None:
+        """Give back (or, with a negative amount, take more than) what was reserved."""
+        self._refill(now)
+        self.level = min(self.capacity, self.level + amount)
+
+    def set_rate(self, rate_per_minute: float) -> None:
+        """Adopt a limit reported by the provider."""
+        self.rate = rate_per_minute / 60.0
+        self.capacity = max(1.0, self.rate * 10)
+        self.level = min(self.level, self.capacity)
+
+
+class AIMDConcurrency:
+    """
+    In-flight limit with additive increase / multiplicative decrease: every successful call adds 1/limit
+    (one slot per window of successes) and a throttle multiplies the limit by `decrease`.
+    """
+
+    def __init__(self, max_limit: int, min_limit: int = 1, decrease: float = 0.5):
+        self.max_limit = max(1, int(max_limit))
+        self.min_limit = max(1, min(int(min_limit), self.max_limit))
+        self.decrease = decrease
+        self.limit = float(self.max_limit)
+        self.in_flight = 0
+        self._condition = threading.Condition()
+
+    def acquire(self) -> None:
+        with self._condition:
+            while self.in_flight >= max(self.min_limit, int(self.limit)):
+                self._condition.wait()
+            self.in_flight += 1
+
+    def release(self, throttled: bool) -> None:
+        with self._condition:
+            self.in_flight -= 1
+            if throttled:
+                self.limit = max(float(self.min_limit), self.limit * self.decrease)
+            else:
+                self.limit = min(float(self.max_limit), self.limit + 1.0 / self.limit)
+            self._condition.notify_all()
+
+
+class RateLimitState:
+    """Buckets, concurrency limit and pause for one provider or provider/model key."""
+
+    def __init__(
+        self,
+        key: str,
+        requests_per_minute: Optional[float] = None,
+        tokens_per_minute: Optional[float] = None,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY
+    ):
+        """
+        Args:
+            key (str): "provider" or "provider/model"
+            requests_per_minute (Optional[float]): Request rate limit, None for no request bucket
+            tokens_per_minute (Optional[float]): Token rate limit, None for no token bucket
+            max_concurrency (int): Upper bound of the adaptive in-flight limit
+        """
+        self.key = key
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.concurrency = AIMDConcurrency(max_concurrency)
+        self.blocked_until = 0.0
+        self.consecutive_throttles = 0
+        self.calls = 0
+        self.throttles = 0
+        self.waited = 0.0
+        self._lock = threading.Lock()
+
+    def reserve(self, tokens: float, now: float) -> float:
+        """Reserve one request and `tokens` tokens; return the seconds to wait before sending."""
+        with self._lock:
+            wait = max(0.0, self.blocked_until - now)
+            if self.requests is not None:
+                wait = max(wait, self.requests.reserve(1, now))
+            if self.tokens is not None and tokens:
+                wait = max(wait, self.tokens.reserve(tokens, now))
+            self.calls += 1
+            self.waited += wait
+            return wait
+
+    def settle_tokens(self, difference: float) -> None:
+        """Correct the token bucket once the real usage is known (positive difference = over-reserved)."""
+        if self.tokens is not None and difference:
+            with self._lock:
+                self.tokens.refund(difference, time.monotonic())
+
+    def throttle(self, retry_after: Optional[float]) -> None:
+        """Pause every caller of this key for Retry-After, or an exponential cool-down without one."""
+        with self._lock:
+            self.throttles += 1
+            self.consecutive_throttles += 1
+            if retry_after is None:
+                retry_after = min(THROTTLE_BACKOFF_MAX, THROTTLE_BACKOFF_BASE * 2 ** (self.consecutive_throttles - 1))
+            self.blocked_until = max(self.blocked_until, time.monotonic() + retry_after)
+
+    def record_success(self, headers: Mapping[str, str]) -> None:
+        """End a throttle streak, adopt a reported request limit and honour an exhausted x-ratelimit-* window."""
+        normalized = {name.lower().replace("rate-limit", "ratelimit"): value for name, value in headers.items()}
+        with self._lock:
+            self.consecutive_throttles = 0
+            limit = normalized.get("x-ratelimit-limit-requests")
+            if limit and self.requests is not None:
+                try:
+                    self.requests.set_rate(float(limit))
+                except ValueError:
+                    pass
+            for suffix in ("-requests", "-tokens", ""):
+                remaining = normalized.get(f"x-ratelimit-remaining{suffix}")
+                reset = parse_reset(normalized.get(f"x-ratelimit-reset{suffix}"))
+                try:
+                    exhausted = remaining is not None and float(remaining) <= 0
+                except ValueError:
+                    exhausted = False
+                if exhausted and reset:
+                    self.blocked_until = max(self.blocked_until, time.monotonic() + min(reset, THROTTLE_BACKOFF_MAX))
+
+    def has_headroom(self, now: float) -> bool:
+        """Whether one more request could be sent right now without waiting or exceeding the concurrency limit."""
+        with self._lock:
+            if self.blocked_until > now:
+                return False
+            if self.requests is not None:
+                self.requests._refill(now)
+                if self.requests.level < 1:
+                    return False
+        return self.concurrency.in_flight < max(self.concurrency.min_limit, int(self.concurrency.limit))
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "calls": self.calls,
+            "throttles": self.throttles,
+            "waited_seconds": round(self.waited, 3),
+            "concurrency_limit": round(self.concurrency.limit, 2),
+            "in_flight": self.concurrency.in_flight,
+        }
+
+
+class Permit:
+    """
+    One admitted call. Release it with the outcome so the limiter can adapt; as a context manager it is
+    released on exit if the caller has not done so.
+    """
+
+    def __init__(self, states: List[RateLimitState], tokens: float):
+        self.states = states
+        self.tokens = tokens
+        self._released = False
+
+    def settle(self, tokens_used: Optional[float]) -> None:
+        """Replace the token estimate with the usage reported by the provider."""
+        if tokens_used is None:
+            return
+        for state in self.states:
+            state.settle_tokens(self.tokens - tokens_used)
+        self.tokens = tokens_used
+
+    def release(
+        self,
+        status_code: Optional[int] = None,
+        headers: Optional[Mapping[str, str]] = None,
+        throttled: Optional[bool] = None
+    ) -> bool:
+        """
+        Free the concurrency slot and record the outcome.
+
+        Args:
+            status_code (Optional[int]): HTTP status of the response, if any
+            headers (Optional[Mapping[str, str]]): Response headers, read for Retry-After and x-ratelimit-*
+            throttled (Optional[bool]): Whether the provider throttled the call; derived from the status if unset
+
+        Returns:
+            bool: Whether the call was treated as throttled (the limiter then holds back the next call)
+        """
+        if self._released:
+            return False
+        self._released = True
+        headers = headers or {}
+        if throttled is None:
+            throttled = status_code == 429 or (status_code == 503 and "retry-after" in {h.lower() for h in headers})
+        retry_after = parse_retry_after(next((v for h, v in headers.items() if h.lower() == "retry-after"), None))
+        for state in self.states:
+            if throttled:
+                state.throttle(retry_after)
+            else:
+                state.record_success(headers)
+            state.concurrency.release(throttled)
+        return throttled
+
+    def __enter__(self) -> "Permit":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.release()
+
+
+class RateLimiter:
+    """Process-wide registry of rate-limit states, keyed by provider and provider/model."""
+
+    def __init__(self, limits: Optional[Dict[str, Dict[str, float]]] = None):
+        """
+        Args:
+            limits (Optional[Dict[str, Dict[str, float]]]): Settings per "provider" or "provider/model" key
+                (requests_per_minute, tokens_per_minute, max_concurrency), defaults to DEFAULT_RATE_LIMITS
+        """
+        self.limits = {key: dict(settings) for key, settings in (DEFAULT_RATE_LIMITS if limits is None else limits).items()}
+        self._states: Dict[str, RateLimitState] = {}
+        self._lock = threading.Lock()
+
+    def configure(self, key: str, **settings: float) -> None:
+        """Override the limits of a provider or provider/model key. Takes effect for the key's next state."""
+        with self._lock:
+            self.limits[key] = {**self.limits.get(key, {}), **settings}
+            for state_key in [state_key for state_key in self._states if state_key.split("/", 1)[0] == key]:
+                self._states.pop(state_key)
+
+    def _state(self, key: str, provider: str) -> RateLimitState:
+        with self._lock:
+            state = self._states.get(key)
+            if state is None:
+                settings = self.limits.get(key)
+                if settings is None and key == provider and "/" in provider:
+                    # A per-account provider key such as "twitter/<username>" gets the provider's full limits
+                    settings = self.limits.get(provider.split("/", 1)[0])
+                if settings is None:
+                    # A model with no limits of its own only gets adaptive concurrency, bounded like its provider
+                    provider_settings = self.limits.get(provider, {})
+                    settings = {"max_concurrency": provider_settings.get("max_concurrency", DEFAULT_MAX_CONCURRENCY)}
+                state = self._states[key] = RateLimitState(key, **settings)
+            return state
+
+    def acquire(self, provider: str, model: Optional[str] = None, tokens: float = 0) -> Permit:
+        """
+        Block until a call fits in the provider's (and the model's) limits.
+
+        Args:
+            provider (str): Provider name, e.g. "hyperbolic", "openai", "twitter"
+            model (Optional[str]): Model name, for per-model limits
+            tokens (float): Estimated tokens (prompt + max output), charged to the token buckets
+
+        Returns:
+            Permit: Release it with the response once the call completes
+        """
+        # Model first, then provider: a consistent order, and waiting on a busy model never holds a provider slot
+        states = ([self._state(f"{provider}/{model}", provider)] if model else []) + [self._state(provider, provider)]
+        now = time.monotonic()
+        wait = max(state.reserve(tokens, now) for state in states)
+        # A throttle seen by another caller while this one waits extends the pause
+        while wait > 0:
+            time.sleep(wait)
+            wait = max(state.blocked_until for state in states) - time.monotonic()
+        for state in states:
+            state.concurrency.acquire()
+        return Permit(states, tokens)
+
+    def has_headroom(self, provider: str, model: Optional[str] = None) -> bool:
+        """
+        Whether an extra, optional request (e.g. a hedge) could go out now without queueing behind the limits.
+
+        Args:
+            provider (str): Provider name
+            model (Optional[str]): Model name
+
+        Returns:
+            bool: True if neither the provider nor the model is paused, out of requests or at its concurrency limit
+        """
+        states = ([self._state(f"{provider}/{model}", provider)] if model else []) + [self._state(provider, provider)]
+        now = time.monotonic()
+        return all(state.has_headroom(now) for state in states)
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """Calls, throttles, time spent waiting and current concurrency limit per key."""
+        with self._lock:
+            states = list(self._states.values())
+        return {state.key: state.stats() for state in sorted(states, key=lambda state: state.key)}
+
+
+_rate_limiter: Optional[RateLimiter] = None
+_rate_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter() -> RateLimiter:
+    """Process-wide rate limiter shared by every LLM, embedding and Twitter call."""
+    global _rate_limiter
+    with _rate_limiter_lock:
+        if _rate_limiter is None:
+            _rate_limiter = RateLimiter()
+        return _rate_limiter
@@ -0,0 +1,308 @@
+# Tracing
+# Objective: Show where a pipeline cycle's time goes. Spans are opened around every pipeline stage and every
+# outbound call (LLM, embedding, Twitter, web3, SQLite) and nest through contextvars, so one cycle forms a
+# trace tree. Each span records its duration plus numeric attributes such as payload bytes, retries and token
+# usage. Finished spans are appended to a size-rotated JSONL file and aggregated into per-span histograms that
+# are written out as a Prometheus text snapshot.
+
+# Inputs:
+# Spans opened with span(...) and counters added to them while they run
+
+# Outputs:
+# JSONL trace file (one span per line), Prometheus text exposition of per-span metrics
+
+import contextvars
+import json
+import logging
+import os
+import random
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from logging.handlers import RotatingFileHandler
+from typing import Any, Dict, Iterator, List, Optional
+from sqlalchemy import event
+
+# Histogram bucket upper bounds in seconds, from a SQLite query up to a full base-model generation
+DURATION_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+# Numeric span attributes summed into Prometheus counters; other attributes only go to the trace file
+COUNTED_ATTRIBUTES = (
+    "request_bytes",
+    "response_bytes",
+    "retries",
+    "prompt_tokens",
+    "completion_tokens",
+    "total_tokens",
+    "rows",
+)
+
+METRIC_PREFIX = "agent"
+
+_current_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("current_span", default=None)
+
+
+@dataclass
+class Span:
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: Optional[str]
+    start: float  # wall clock, seconds since the epoch
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    seconds: float = 0.0
+    error: Optional[str] = None
+
+    def set(self, **attributes) -> None:
+        """Set attributes, e.g. status code or model."""
+        self.attributes.update(attributes)
+
+    def add(self, key: str, value: float = 1) -> None:
+        """Add to a numeric attribute, e.g. retries or response bytes."""
+        self.attributes[key] = self.attributes.get(key, 0) + value
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start": round(self.start, 6),
+            "seconds": round(self.seconds, 6),
+            "error": self.error,
+            "attributes": self.attributes,
+        }
+
+
+@dataclass
+class SpanMetrics:
+    """Aggregates of every finished span with one name."""
+    count: int = 0
+    errors: int = 0
+    seconds: float = 0.0
+    buckets: List[int] = field(default_factory=lambda: [0] * len(DURATION_BUCKETS))
+    counters: Dict[str, float] = field(default_factory=dict)
+
+
+def _new_id(bits: int) -> str:
+    return format(random.getrandbits(bits), f"0{bits // 4}x")
+
+
+class Tracer:
+    def __init__(self):
+        self.metrics: Dict[str, SpanMetrics] = {}
+        self._lock = threading.Lock()
+        self._logger: Optional[logging.Logger] = None
+        self._handler: Optional[RotatingFileHandler] = None
+
+    def configure(self, trace_path: Optional[str], max_bytes: int = 50_000_000, backups: int = 5) -> None:
+        """
+        Start (or stop, with trace_path None) writing finished spans to a JSONL file.
+
+        Args:
+            trace_path (Optional[str]): Trace file; rotated to trace_path.1 ... trace_path.<backups>
+            max_bytes (int): Size at which the file is rotated
+            backups (int): Rotated files kept
+        """
+        with self._lock:
+            if self._handler is not None:
+                self._logger.removeHandler(self._handler)
+                self._handler.close()
+                self._handler = None
+            if not trace_path:
+                return
+            os.makedirs(os.path.dirname(trace_path) or ".", exist_ok=True)
+            self._handler = RotatingFileHandler(trace_path, maxBytes=max_bytes, backupCount=backups, encoding="utf-8")
+            self._handler.setFormatter(logging.Formatter("%(message)s"))
+            self._logger = logging.getLogger("agent.trace")
+            self._logger.setLevel(logging.INFO)
+            self._logger.propagate = False
+            self._logger.addHandler(self._handler)
+
+    @contextmanager
+    def span(self, name: str, **attributes) -> Iterator[Span]:
+        """
+        Time a block of work as a child of the current span (or as a new trace). An exception escaping the
+        block marks the span as failed and is re-raised.
+
+        Args:
+            name (str): Span name, dotted by component, e.g. "llm.request" or "stage.post"
+            **attributes: Initial attributes
+
+        Yields:
+            Span: The open span, to add attributes while the work runs
+        """
+        parent = _current_span.get()
+        span = Span(
+            name=name,
+            trace_id=parent.trace_id if parent else _new_id(128),
+            span_id=_new_id(64),
+            parent_id=parent.span_id if parent else None,
+            start=time.time(),
+            attributes=attributes
+        )
+        token = _current_span.set(span)
+        started = time.perf_counter()
+        try:
+            yield span
+        except BaseException as e:
+            span.error = f"{type(e).__name__}: {e}"[:500]
+            raise
+        finally:
+            span.seconds = time.perf_counter() - started
+            _current_span.reset(token)
+            self._finish(span)
+
+    def record(self, name: str, seconds: float, error: Optional[str] = None, **attributes) -> None:
+        """Record a span for work that was timed elsewhere (e.g. by SQLAlchemy event hooks)."""
+        parent = _current_span.get()
+        self._finish(Span(
+            name=name,
+            trace_id=parent.trace_id if parent else _new_id(128),
+            span_id=_new_id(64),
+            parent_id=parent.span_id if parent else None,
+            start=time.time() - seconds,
+            attributes=attributes,
+            seconds=seconds,
+            error=error
+        ))
+
+    def _finish(self, span: Span) -> None:
+        with self._lock:
+            metrics = self.metrics.get(span.name)
+            if metrics is None:
+                metrics = self.metrics[span.name] = SpanMetrics()
+            metrics.count += 1
+            metrics.errors += span.error is not None
+            metrics.seconds += span.seconds
+            bucket = bisect_left(DURATION_BUCKETS, span.seconds)
+            if bucket < len(DURATION_BUCKETS):
+                metrics.buckets[bucket] += 1
+            for key in COUNTED_ATTRIBUTES:
+                value = span.attributes.get(key)
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    metrics.counters[key] = metrics.counters.get(key, 0) + value
+            handler = self._handler
+        if handler is not None:
+            try:
+                self._logger.info(json.dumps(span.to_dict(), default=str))
+            except (TypeError, ValueError) as e:
+                print(f"Could not write span {span.name}: {e}")
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """Count, errors and total / mean seconds per span name, slowest total first."""
+        with self._lock:
+            items = [(name, metrics.count, metrics.errors, metrics.seconds) for name, metrics in self.metrics.items()]
+        return {
+            name: {"count": count, "errors": errors, "seconds": round(seconds, 3), "mean": round(seconds / count, 4)}
+            for name, count, errors, seconds in sorted(items, key=lambda item: -item[3])
+        }
+
+    def prometheus_text(self) -> str:
+        """Current metrics in the Prometheus text exposition format."""
+        duration = f"{METRIC_PREFIX}_span_duration_seconds"
+        errors = f"{METRIC_PREFIX}_span_errors_total"
+        lines = [
+            f"# HELP {duration} Duration of traced pipeline stages and outbound calls.",
+            f"# TYPE {duration} histogram",
+        ]
+        counter_lines = {key: [] for key in COUNTED_ATTRIBUTES}
+        error_lines = []
+        with self._lock:
+            for name in sorted(self.metrics):
+                metrics = self.metrics[name]
+                label = f'span="{_escape_label(name)}"'
+                cumulative = 0
+                for bound, count in zip(DURATION_BUCKETS, metrics.buckets):
+                    cumulative += count
+                    lines.append(f'{duration}_bucket{{{label},le="{bound}"}} {cumulative}')
+                lines.append(f'{duration}_bucket{{{label},le="+Inf"}} {metrics.count}')
+                lines.append(f"{duration}_sum{{{label}}} {metrics.seconds:.6f}")
+                lines.append(f"{duration}_count{{{label}}} {metrics.count}")
+                error_lines.append(f"{errors}{{{label}}} {metrics.errors}")
+                for key, value in metrics.counters.items():
+                    counter_lines[key].append(f"{METRIC_PREFIX}_span_{key}_total{{{label}}} {value:g}")
+        lines += [f"# HELP {errors} Traced spans that ended in an exception.", f"# TYPE {errors} counter", *error_lines]
+        for key, samples in counter_lines.items():
+            if samples:
+                metric = f"{METRIC_PREFIX}_span_{key}_total"
+                lines += [f"# HELP {metric} Sum of the {key} attribute over traced spans.", f"# TYPE {metric} counter"]
+                lines += samples
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path: str) -> None:
+        """Atomically replace path with the current Prometheus snapshot (for node_exporter's textfile collector)."""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self.prometheus_text())
+        os.replace(tmp_path, path)
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def json_size(value: Any) -> int:
+    """Bytes of a value serialized as JSON, for payload-size attributes."""
+    try:
+        return len(json.dumps(value, default=str).encode("utf-8"))
+    except (TypeError, ValueError):
+        return 0
+
+
+def current_span() -> Optional[Span]:
+    """The innermost open span in this context, if any."""
+    return _current_span.get()
+
+
+_tracer = Tracer()
+
+
+def get_tracer() -> Tracer:
+    """Process-wide tracer."""
+    return _tracer
+
+
+def span(name: str, **attributes):
+    """Shortcut for get_tracer().span(...)."""
+    return _tracer.span(name, **attributes)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    conn.info.setdefault("trace_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    started = conn.info["trace_started"].pop()
+    verb = statement.lstrip().split(None, 1)[0].lower() if statement.strip() else "statement"
+    attributes = {"statement": statement[:200], "executemany": executemany}
+    if cursor.rowcount is not None and cursor.rowcount >= 0:
+        attributes["rows"] = cursor.rowcount
+    _tracer.record(f"sqlite.{verb}", time.perf_counter() - started, **attributes)
+
+
+def _handle_error(exception_context) -> None:
+    conn = exception_context.connection
+    started_stack = conn.info.get("trace_started") if conn is not None else None
+    if not started_stack:
+        return
+    statement = exception_context.statement or ""
+    verb = statement.lstrip().split(None, 1)[0].lower() if statement.strip() else "statement"
+    _tracer.record(
+        f"sqlite.{verb}",
+        time.perf_counter() - started_stack.pop(),
+        error=str(exception_context.original_exception)[:500],
+        statement=statement[:200]
+    )
+
+
+def instrument_sqlalchemy(engine) -> None:
+    """Record a span per SQL statement executed through the engine (safe to call more than once)."""
+    if event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        return
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
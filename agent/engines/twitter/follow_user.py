@@ -1,22 +1,31 @@
 import json
-from typing import List
-import requests
+from typing import List, Optional
 import re
+from sqlalchemy.orm import Session
 from twitter.account import Account
 from twitter.scraper import Scraper
+from engines.llm.llm_client import LLMClient, get_llm_client
+from engines.llm.response_cache import is_json
+from engines.twitter.utils import twitter_call
 from models import User
 
 
 class FollowManager:
-    def __init__(self, config):
+    def __init__(self, config, llm_client: Optional[LLMClient] = None):
         self.config = config
-        pass
-    def _handle_follows(self, notif_context: List[str]) -> None: 
-        """Process and execute follow decisions."""
+        self.llm_client = llm_client or get_llm_client("openrouter")
+    def _handle_follows(self, notif_context: List[str], db: Optional[Session] = None) -> None: 
+        """
+        Process and execute follow decisions.
+
+        Args:
+            notif_context (List[str]): Notification context to pick users from
+            db (Optional[Session]): Session to record users with, defaults to Config.db
+        """
         for _ in range(2):  # Max 2 attempts
             try:
                 decision_data = self.decide_to_follow_users(
-                    self.config.db,
+                    db or self.config.db,
                     notif_context,
                     self.config.openrouter_api_key
                 )
@@ -113,28 +122,20 @@ class FollowManager:
         []
         """ 
 
-        # Send the prompt to the AI model
-        response = requests.post(
-            url="https://openrouter.ai/api/v1/chat/completions",
-            headers={
-                "Authorization": f"Bearer {openrouter_api_key}",
-            },
-            json={
-                "model": "meta-llama/llama-3.1-70b-instruct",
-                "messages": [{"role": "user", "content": prompt}],
-                "temperature": 0.7,
-            },
-        )   
-
-        if response.status_code == 200:
-            return response.json()["choices"][0]["message"]["content"]
-        else:
-            raise Exception(f"Error generating decision: {response.text}")  
+        # Send the prompt to the AI model (raises LLMError on failure)
+        return self.llm_client.chat(
+            [{"role": "user", "content": prompt}],
+            model="meta-llama/llama-3.1-70b-instruct",
+            api_key=openrouter_api_key,
+            cache_type="follow_decision",
+            cache_validator=is_json,
+            temperature=0.7,
+        )
 
 
     def get_user_id(self, account: Account, username):
         scraper = Scraper(account.session.cookies)
-        users = scraper.users([username])
+        users = twitter_call(scraper.users, [username])
         if users:
             return users[0].id
         else:
@@ -142,7 +143,7 @@ class FollowManager:
 
 
     def follow_user(self, account: Account, user_id):
-        return account.follow(user_id)  
+        return twitter_call(account.follow, user_id)  
 
 
     def follow_by_username(self, account: Account, username): 
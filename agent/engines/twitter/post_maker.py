@@ -13,15 +13,56 @@
 # Database schema. Schemas for posts and how replies are classified.
 
 import time
-import requests
 from typing import List, Dict, Optional
+from engines.llm.llm_client import LLMClient, LLMError, get_llm_client
 from engines.prompts.prompts import get_tweet_prompt
 from engines.memory.significance_scorer import SignificanceScorer
 from engines.memory.long_term_mem import LongTermMemoryManager
+from engines.twitter.tweet_formatter import MAX_TWEET_LENGTH, format_tweet
+
+
+def tweet_candidate_complete(text: str) -> bool:
+    """
+    True once streamed base-model output holds a whole tweet: a finished line the formatter accepts
+    (a bare label such as "Tweet 1:" is not one), or more text than fits in one tweet (anything after
+    that would be cut by the formatter).
+    """
+    stripped = text.lstrip()
+    if len(stripped) > MAX_TWEET_LENGTH + 40:
+        return True
+    finished_lines, newline, _ = stripped.rpartition("\n")
+    return bool(newline) and format_tweet(finished_lines) is not None
+
 
 class PostMaker:
-    def __init__(self):
-        pass
+    def __init__(
+        self,
+        long_term_mem: Optional[LongTermMemoryManager] = None,
+        llm_client: Optional[LLMClient] = None,
+        stream_generation: bool = True,
+        local_formatting: bool = True,
+        scoring_mode: str = "sampled",
+        scoring_top_logprobs: int = 5,
+        prompt_template: Optional[str] = None
+    ):
+        """
+        Args:
+            long_term_mem (Optional[LongTermMemoryManager]): Long-term memory used to store significant posts
+            llm_client (Optional[LLMClient]): Client for Hyperbolic, defaults to the shared one
+            stream_generation (bool): Stream the base model and stop as soon as a tweet is complete
+            local_formatting (bool): Format the base model output locally, calling the LLM formatter only as a fallback
+            scoring_mode (str): Significance scoring mode, "sampled" or "logprob"
+            scoring_top_logprobs (int): First-token alternatives requested in logprob mode
+            prompt_template (Optional[str]): Persona tweet prompt, defaults to TWEET_PROMPT_TEMPLATE
+        """
+        self.long_term_mem = long_term_mem or LongTermMemoryManager()
+        self.llm_client = llm_client or get_llm_client("hyperbolic")
+        self.stream_generation = stream_generation
+        self.local_formatting = local_formatting
+        self.significance_scorer = SignificanceScorer(
+            self.llm_client, scoring_mode=scoring_mode, top_logprobs=scoring_top_logprobs
+        )
+        self.prompt_template = prompt_template
 
     def generate_post(self, short_term_memory: str, long_term_memories: List[Dict], recent_posts: List[Dict], external_context, llm_api_key: str, query: str) -> str:
         """
@@ -31,72 +72,83 @@ class PostMaker:
             short_term_memory (str): Generated short-term memory
             long_term_memories (List[Dict]): Relevant long-term memories
             recent_posts (List[Dict]): Recent posts from the timeline
-            openrouter_api_key (str): API key for OpenRouter
-            your_site_url (str): Your site URL for OpenRouter API
-            your_app_name (str): Your app name for OpenRouter API
+            external_context: Notification context or the tweet being replied to
+            llm_api_key (str): API key for Hyperbolic
+            query (str): Generation cue appended to the prompt
 
         Returns:
             str: Generated post or reply
         """
 
-        prompt = get_tweet_prompt(external_context, short_term_memory, long_term_memories, recent_posts, query)
+        prompt = get_tweet_prompt(
+            external_context, short_term_memory, long_term_memories, recent_posts, query, self.prompt_template
+        )
 
         print(f"Generating post with prompt: {prompt}")
 
         #BASE MODEL TWEET GENERATION
-        tries = 0
+        # Transport errors are retried by the client; this loop only retries empty generations
         max_tries = 3
         base_model_output = ""
-        while tries < max_tries:
+        # Whether the model ended the generation itself; a stream stopped early may end in a partial line
+        finished = True
+        params = {
+            "model": "meta-llama/Meta-Llama-3.1-405B",
+            "api_key": llm_api_key,
+            "max_tokens": 512,
+            "temperature": 1,
+            "top_p": 0.95,
+            "top_k": 40,
+            "stop": ["<|im_end|>", "<"],
+        }
+        for tries in range(max_tries):
+            started = time.monotonic()
             try:
-                response = requests.post(
-                    url="https://api.hyperbolic.xyz/v1/completions",
-                    headers={
-                        "Content-Type": "application/json",
-                        "Authorization": f"Bearer {llm_api_key}",
-                    },
-                    json = {
-                    "prompt": prompt,
-                    "model": "meta-llama/Meta-Llama-3.1-405B",
-                    "max_tokens": 512,
-                    "temperature": 1,
-                    "top_p": 0.95,
-                    "top_k": 40,
-                    "stop":["<|im_end|>", "<"]
-                    }
-                )
+                if self.stream_generation:
+                    # Streaming stops the request once a valid tweet exists instead of paying for up to 512 tokens
+                    content, finish_reason = self.llm_client.stream_complete(
+                        prompt, should_stop=tweet_candidate_complete, **params
+                    )
+                    finished = finish_reason not in (None, "length")
+                else:
+                    content = self.llm_client.complete(prompt, **params)
+                print(f"Base model returned {len(content)} characters in {time.monotonic() - started:.1f}s")
+            except LLMError as e:
+                print(f"Error generating base model output: {str(e)}")
+                break
+            if content and content.strip():
+                print(f"Base model generated with response: {content}")
+                base_model_output = content
+                break
+
+        # TAKES BASE MODEL OUTPUT AND CLEANS IT UP AND EXTRACT THE TWEET
+        if self.local_formatting:
+            tweet = format_tweet(base_model_output, finished=finished)
+            if tweet is not None:
+                print(f"Formatted tweet locally: {tweet}")
+                return tweet
+            print("Local formatting found no valid tweet, falling back to the LLM formatter")
+        return self._llm_format(base_model_output, llm_api_key)
+
+    def _llm_format(self, base_model_output: str, llm_api_key: str) -> Optional[str]:
+        """
+        Ask the 70B model to extract and clean up a tweet from the base model output.
+
+        Args:
+            base_model_output (str): Raw base model output
+            llm_api_key (str): API key for Hyperbolic
 
-                if response.status_code == 200:
-                    content = response.json()['choices'][0]['text']
-                    if content and content.strip():
-                        print(f"Base model generated with response: {content}")
-                        base_model_output = content
-                        break
-                # print(f"Attempt {tries + 1} failed. Status code: {response.status_code}")
-                # print(f"Response: {response.text}")
-            except Exception as e:
-                print(f"Error on attempt {tries + 1}: {str(e)}")
-                tries += 1
-                time.sleep(1)  # Add a small delay between retries
-
-        time.sleep(5)
-
-        # TAKES BASE MODEL OUTPUT AND CLEANS IT UP AND EXTRACT THE TWEET 
-        tries = 0
+        Returns:
+            Optional[str]: Formatted tweet, or None if formatting failed
+        """
         max_tries = 3
-        while tries < max_tries:
+        for tries in range(max_tries):
             try:
-                response = requests.post(
-                    url="https://api.hyperbolic.xyz/v1/chat/completions",
-                    headers={
-                        "Content-Type": "application/json",
-                        "Authorization": f"Bearer {llm_api_key}",
-                    },
-                    json = {
-                    "messages": [
+                content = self.llm_client.chat(
+                    [
                         {
                             "role": "system",
-            	            "content": f"""You are a tweet formatter. Your only job is to take the input text and format it as a tweet.
+                            "content": f"""You are a tweet formatter. Your only job is to take the input text and format it as a tweet.
                                 You must ensure that the tweet is short enough to fit as a single tweet.
                                 Never mention that you formatted the tweet, only return back the formatted tweet itself.
                                 If the input already looks like a single tweet, return it exactly as is.
@@ -121,24 +173,20 @@ class PostMaker:
                             "content": base_model_output
                         }
                     ],
-                    "model": "meta-llama/Meta-Llama-3.1-70B-Instruct",
-                    "max_tokens": 250,
-                    "temperature": 1,
-                    "top_p": 0.95,
-                    "top_k": 40,
-                    "stream": False,
-                    }
+                    model="meta-llama/Meta-Llama-3.1-70B-Instruct",
+                    api_key=llm_api_key,
+                    max_tokens=250,
+                    temperature=1,
+                    top_p=0.95,
+                    top_k=40,
+                    stream=False,
                 )
-
-                if response.status_code == 200:
-                    content = response.json()['choices'][0]['message']['content']
-                    if content and content.strip():
-                        print(f"Response: {content}")
-                        return content
-            except Exception as e:
-                print(f"Error on attempt {tries + 1}: {str(e)}")
-                tries += 1
-                time.sleep(1)  # Add a small delay between retries
+            except LLMError as e:
+                print(f"Error formatting tweet: {str(e)}")
+                return None
+            if content and content.strip():
+                print(f"Response: {content}")
+                return content
 
     
     def generate_and_evaluate_post(
@@ -182,7 +230,7 @@ class PostMaker:
        ).strip('"')
        print(f"New post content: {new_post_content}")
     
-       significance_score = self.SignificanceScorer.score_significance(
+       significance_score = self.significance_scorer.score_significance(
            new_post_content,
            llm_api_key
        )
@@ -190,11 +238,11 @@ class PostMaker:
     
        # Store significant memories
        if significance_score >= min_storing_memory_significance:
-           new_post_embedding = LongTermMemoryManager.create_embedding(
+           new_post_embedding = self.long_term_mem.create_embedding(
                new_post_content,
                openai_api_key
            )
-           LongTermMemoryManager.store_memory(
+           self.long_term_mem.store_memory(
                db,
                new_post_content,
                new_post_embedding,
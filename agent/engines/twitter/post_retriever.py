@@ -5,6 +5,7 @@ from sqlalchemy.orm import Session
 from models import Post, TweetPost
 from sqlalchemy.orm import class_mapper
 from twitter.account import Account
+from engines.twitter.utils import twitter_call
 
 class PostRetriever:
     def __init__(self):
@@ -359,7 +360,7 @@ class PostRetriever:
         """
         try:
             # Get timeline with error handling
-            timeline = account.home_latest_timeline(20)
+            timeline = twitter_call(account.home_latest_timeline, 20)
             if not timeline or not isinstance(timeline, list) or len(timeline) == 0:
                 print(f"Warning: Invalid timeline response: {timeline}")
                 return []
@@ -406,7 +407,7 @@ class PostRetriever:
         context.extend(timeline)
 
         print("getting notifications")
-        notifications = account.notifications()
+        notifications = twitter_call(account.notifications)
         print(notifications)
 
         print(f"getting reply trees")
@@ -2,13 +2,16 @@ from typing import Dict, Optional
 import requests
 from models import TweetPost
 from twitter.account import Account
+from engines.rate_limiter import get_rate_limiter
+from engines.tracing import json_size, span
+from engines.twitter.utils import twitter_call, twitter_rate_limit_key
 
 class PostSender:
     def __init__(self):
         pass
 
     def reply_post(self, account: Account, content: str, tweet_id) -> str:
-        res = account.reply(content, tweet_id=tweet_id)
+        res = twitter_call(account.reply, content, tweet_id=tweet_id)
         return res
 
     def send_post_API(self, auth, content: str) -> str:
@@ -24,7 +27,11 @@ class PostSender:
             'text': content
         }
         try:
-            response = requests.post(url, json=payload, auth=auth)
+            with span("twitter.create_tweet_api", request_bytes=json_size(payload)) as trace, \
+                    get_rate_limiter().acquire(twitter_rate_limit_key()) as permit:
+                response = requests.post(url, json=payload, auth=auth)
+                permit.release(response.status_code, response.headers)
+                trace.set(status_code=response.status_code, response_bytes=len(response.content))
 
             if response.status_code == 201:  # Twitter API returns 201 for successful tweet creation
                 tweet_data = response.json()
@@ -44,7 +51,7 @@ class PostSender:
         - content: The message to tweet.
         """
 
-        res = account.tweet(content)
+        res = twitter_call(account.tweet, content)
         return res
 
 
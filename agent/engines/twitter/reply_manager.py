@@ -1,48 +1,102 @@
+import asyncio
 import json
 import random
 import re
+import threading
 import time
-from typing import List, Tuple
+from typing import List, Optional, Tuple
+from sqlalchemy.orm import Session
 
 from engines.memory.significance_scorer import SignificanceScorer
 from engines.twitter.post_maker import PostMaker
 from engines.twitter.post_sender import PostSender
+from engines.twitter.utils import twitter_call
 from models import Post
 
 
+class MinIntervalRateLimiter:
+    """Spaces events at least `interval` seconds apart across threads and coroutines."""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._next_slot = 0.0
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """Claim the next free slot and return how many seconds to wait for it."""
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+            return slot - now
+
+    def wait(self) -> None:
+        time.sleep(self.reserve())
+
+    async def wait_async(self) -> None:
+        await asyncio.sleep(self.reserve())
+
+
 class ReplyManager:
     def __init__(self, config, ai_user):
         self.config = config
         self.ai_user = ai_user
-        self.post_maker = PostMaker()
+        # Plain copies: replies may be recorded from another thread than the session ai_user belongs to
+        self.ai_user_id = ai_user.id
+        self.ai_username = ai_user.username
+        self.post_maker = PostMaker(
+            stream_generation=config.stream_post_generation,
+            local_formatting=config.local_tweet_formatting,
+            scoring_mode=config.significance_scoring_mode,
+            scoring_top_logprobs=config.significance_top_logprobs,
+            prompt_template=config.tweet_prompt_template
+        )
         self.post_sender = PostSender()
-        self.significance_scorer = SignificanceScorer()
-        pass
+        self.significance_scorer = SignificanceScorer(
+            scoring_mode=config.significance_scoring_mode, top_logprobs=config.significance_top_logprobs
+        )
+        # Posting cadence for replies, shared by the sequential and async modes
+        self.reply_rate_limiter = MinIntervalRateLimiter(config.min_reply_interval_seconds)
 
-    def _should_reply(self, content: str, user_id: str) -> bool:
-            """Determine if we should reply to a post."""
-            if user_id.lower() == self.config.bot_username:
-                return False
+    def _select_replies(self, candidates: List[Tuple[str, str, str]]) -> List[Tuple[str, str, str]]:
+        """
+        Decide which mentions to reply to. Reply worthiness of every eligible mention is scored
+        in one batched LLM request.
 
-            if random.random() > self.config.max_reply_rate:
-                return False
+        Args:
+            candidates (List[Tuple[str, str, str]]): (content, tweet_id, user_id) mentions
 
-            reply_significance_score = self.significance_scorer.score_reply_significance(
-                content,
-                self.config.llm_api_key
-            )
-            print(f"Reply significance score: {reply_significance_score}")
+        Returns:
+            List[Tuple[str, str, str]]: The mentions worth replying to
+        """
+        eligible = [
+            candidate for candidate in candidates
+            if candidate[2].lower() != self.config.bot_username and random.random() <= self.config.max_reply_rate
+        ]
+        if not eligible:
+            return []
+
+        scores = self.significance_scorer.score_reply_significance_batch(
+            [(tweet_id, content) for content, tweet_id, _ in eligible],
+            self.config.llm_api_key
+        )
+        accepted = []
+        for content, tweet_id, user_id in eligible:
+            reply_significance_score = scores.get(str(tweet_id))
+            print(f"Reply significance score for {tweet_id}: {reply_significance_score}")
+            if reply_significance_score is None:
+                continue
 
             if self.is_spam(content):
                 reply_significance_score -= 3
 
-            if reply_significance_score >=self.config.min_reply_worthiness_score:
-                return True
-            else:
-                return False
+            if reply_significance_score >= self.config.min_reply_worthiness_score:
+                accepted.append((content, tweet_id, user_id))
+        return accepted
 
-    def _handle_replies(self, external_context: List[Tuple[str, str]]) -> None:
-        """Handle replies to mentions and interactions."""
+    def _reply_candidates(self, external_context: List[Tuple[str, str]]) -> List[Tuple[str, str, str]]:
+        """(content, tweet_id, user_id) for every mention that is not from the bot itself."""
+        candidates = []
         for content, tweet_id in external_context:
             user_match = re.search(r'@(\w+)', content)
             if not user_match:
@@ -50,42 +104,103 @@ class ReplyManager:
             # dont reply to yourself
             if user_match.group(1) == self.config.bot_username:  # Changed comparison
                 continue
-            user_id = user_match.group(1)
-            
-            if self._should_reply(content, user_id) == False:
-                continue
+            candidates.append((content, tweet_id, user_match.group(1)))
+        return candidates
+
+    def _generate_reply(self, content: str) -> Optional[str]:
+        return self.post_maker.generate_post(
+            short_term_memory="",
+            long_term_memories=[],
+            recent_posts=[],
+            external_context=content,
+            llm_api_key=self.config.llm_api_key,
+            query="what are you thinking of replying now\n<tweet>"
+        )
+
+    def _post_reply(self, reply_content: str, tweet_id: str, user_id: str) -> dict:
+        response = twitter_call(self.config.account.reply, reply_content, tweet_id=tweet_id)
+        # Verify the post was successful
+        if self.post_sender.verify_post_success(response):
+            print(f"VERIFIED Replied to {user_id} with: {reply_content}")
+        else:
+            print("Warning: Post may not have been sent successfully")
+            print(f"Response received: {json.dumps(response, indent=2)}")
+        return response
+
+    def _record_reply(self, reply_content: str, response: dict, db: Session) -> None:
+        new_reply = Post(
+            content=reply_content,
+            user_id=self.ai_user_id,
+            username=self.ai_username,
+            type="reply",
+            tweet_id=response.get('data', {}).get('id')
+        )
+        db.add(new_reply)
+        db.commit()
+
+    def handle_replies(self, external_context: List[Tuple[str, str]], db: Optional[Session] = None) -> None:
+        """
+        Handle replies with the execution mode selected in Config.reply_mode.
+
+        Args:
+            external_context (List[Tuple[str, str]]): (content, tweet_id) pairs from the notification queue
+            db (Optional[Session]): Session to record replies with, defaults to Config.db. Callers on another
+                thread than Config.db's owner pass their own.
+        """
+        db = db or self.config.db
+        if self.config.reply_mode == "async":
+            asyncio.run(self._handle_replies_async(external_context, db))
+        else:
+            self._handle_replies(external_context, db)
+
+    def _handle_replies(self, external_context: List[Tuple[str, str]], db: Session) -> None:
+        """Handle replies to mentions and interactions, one at a time."""
+        for content, tweet_id, user_id in self._select_replies(self._reply_candidates(external_context)):
+            try:
+                reply_content = self._generate_reply(content)
+                if not reply_content:
+                    continue
+                self.reply_rate_limiter.wait()
+                response = self._post_reply(reply_content, tweet_id, user_id)
+                self._record_reply(reply_content, response, db)
+            except Exception as e:
+                print(f"Error handling reply: {e}")
+
+    async def _handle_replies_async(self, external_context: List[Tuple[str, str]], db: Session) -> None:
+        """
+        Handle replies concurrently: candidates are scored in one batched request and replies are
+        generated in parallel, at most Config.reply_concurrency LLM-bound tasks at a time. Posting
+        is spaced by the reply rate limiter, and database writes stay on the event loop thread
+        because the session is not thread-safe.
+
+        Args:
+            external_context (List[Tuple[str, str]]): (content, tweet_id) pairs from the notification queue
+            db (Session): Session to record replies with
+        """
+        candidates = self._reply_candidates(external_context)
+        if not candidates:
+            return
+        accepted = await asyncio.to_thread(self._select_replies, candidates)
+        print(f"Replying to {len(accepted)} of {len(candidates)} mentions")
+
+        semaphore = asyncio.Semaphore(self.config.reply_concurrency)
+
+        async def in_worker(func, *args):
+            async with semaphore:
+                return await asyncio.to_thread(func, *args)
+
+        async def reply(content: str, tweet_id: str, user_id: str) -> None:
             try:
-                reply_content = self.post_maker.generate_post(
-                    short_term_memory="",
-                    long_term_memories=[],
-                    recent_posts=[],
-                    external_context=content,
-                    llm_api_key=self.config.llm_api_key,
-                    query="what are you thinking of replying now\n<tweet>"
-                )
-                response = self.config.account.reply(reply_content, tweet_id=tweet_id)
-                # Verify the post was successful
-                if self.post_sender.verify_post_success(response):
-                    print(f"VERIFIED Replied to {user_id} with: {reply_content}")
-                else:
-                    print("Warning: Post may not have been sent successfully")
-                    print(f"Response received: {json.dumps(response, indent=2)}")
-
-                # print(f"Reply API call response: {response}")
-                # print(f"Replied to {user_id} with: {reply_content}")
-                new_reply = Post(
-                    content=reply_content,
-                    user_id=self.ai_user.id,
-                    username=self.ai_user.username,
-                    type="reply",
-                    tweet_id=response.get('data', {}).get('id')
-                )
-                self.config.db.add(new_reply)
-                self.config.db.commit()
+                reply_content = await in_worker(self._generate_reply, content)
+                if not reply_content:
+                    return
+                await self.reply_rate_limiter.wait_async()
+                response = await asyncio.to_thread(self._post_reply, reply_content, tweet_id, user_id)
+                self._record_reply(reply_content, response, db)
             except Exception as e:
                 print(f"Error handling reply: {e}")
 
-            time.sleep(30)
+        await asyncio.gather(*(reply(*candidate) for candidate in accepted))
 
     def is_spam(self, content: str) -> bool:
         """Check if content appears to be spam."""
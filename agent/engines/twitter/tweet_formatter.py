@@ -0,0 +1,169 @@
+# Tweet Formatter
+# Objective: Turn raw base-model output into a postable tweet without another LLM round trip. Applies the same
+# rules the 70B "tweet formatter" prompt asks for (strip "Tweet:" prefixes, emojis and hashtags, drop text that
+# cuts off, fit in one tweet, pick one tweet out of several) as deterministic text processing. When no
+# candidate survives, the caller falls back to the LLM formatter.
+
+# Inputs:
+# Base model output (possibly several tweets, possibly cut off mid-sentence)
+
+# Outputs:
+# A single tweet of at most 280 characters, or None if the heuristics cannot produce a valid one
+
+import re
+from typing import List, Optional
+
+MAX_TWEET_LENGTH = 280
+
+# Emoji blocks (skin tones included), the emoji scattered through the arrow / technical / shape blocks, plus the
+# joiners / variation selectors that glue them together. Ordinary symbols in those blocks (→, ⌘, ⬡) are kept.
+EMOJI_PATTERN = re.compile(
+    "["
+    "\U0001F000-\U0001FAFF"  # mahjong, cards, emoticons, pictographs, transport, symbols & pictographs ext.
+    "\u2600-\u27BF"          # misc symbols, dingbats
+    "\u2194-\u2199\u21A9\u21AA"  # emoji arrows (↔ ↕ ↖ ... ↩ ↪)
+    "\u231A\u231B\u2328\u23CF\u23E9-\u23F3\u23F8-\u23FA"  # watch, hourglass, keyboard, media controls
+    "\u2B05-\u2B07\u2B1B\u2B1C\u2B50\u2B55"  # ⬅ ⬆ ⬇, large squares, star, circle
+    "\u3030\u303D\u3297\u3299"
+    "\u200D\uFE0E\uFE0F\u20E3"  # zero-width joiner, variation selectors, keycap
+    "\U000E0020-\U000E007F"  # tag characters (flag sequences)
+    "]+"
+)
+
+# "1.", "2)", "-", "*" list markers in front of multiple candidates
+LIST_MARKER_PATTERN = re.compile(r"^\s*(?:\d+[.)]|[-*\u2022])\s+")
+# "Tweet:", "Tweet 2:", "Here's a tweet:", "Formatted tweet -", "Post:" ...
+PREFIX_PATTERN = re.compile(
+    r"^\s*(?:(?:here(?:'s| is)\s+(?:a|the|my)\s+)?(?:new\s+|formatted\s+)?(?:tweet|post|reply|response)(?:\s*#?\d+)?\s*[:\-]\s*)+",
+    re.IGNORECASE
+)
+TRAILING_HASHTAGS_PATTERN = re.compile(r"(?:\s*#\w+)+\s*$")
+INLINE_HASHTAG_PATTERN = re.compile(r"#(\w+)")
+SENTENCE_END_PATTERN = re.compile(r"[.!?…]+[\"')\]]*(?=\s|$)")
+
+# Candidates that are commentary about the task rather than a tweet
+META_PHRASES = (
+    "no tweet found",
+    "analyzing a post",
+    "analyzing the post",
+    "as an ai",
+    "here's a tweet",
+    "here is a tweet",
+    "formatted tweet",
+    "<tweet",
+    "</",
+)
+
+
+def strip_emojis(text: str) -> str:
+    """Remove emojis and emoji modifiers."""
+    return EMOJI_PATTERN.sub("", text)
+
+
+def strip_hashtags(text: str) -> str:
+    """Drop trailing hashtag runs and turn inline hashtags into plain words."""
+    text = TRAILING_HASHTAGS_PATTERN.sub("", text)
+    return INLINE_HASHTAG_PATTERN.sub(r"\1", text)
+
+
+def strip_prefix(text: str) -> str:
+    """Remove list markers and labels such as "Tweet:" or "Here's a tweet:" from the start of a line."""
+    return PREFIX_PATTERN.sub("", LIST_MARKER_PATTERN.sub("", text, count=1), count=1)
+
+
+def strip_quotes(text: str) -> str:
+    """Remove quotes wrapping the whole text."""
+    text = text.strip()
+    while len(text) >= 2 and text[0] == text[-1] and text[0] in "\"'“”":
+        text = text[1:-1].strip()
+    if len(text) >= 2 and text[0] == "“" and text[-1] == "”":
+        text = text[1:-1].strip()
+    return text
+
+
+def truncate_to_sentence(text: str, max_length: int = MAX_TWEET_LENGTH) -> Optional[str]:
+    """
+    Fit text into max_length characters by cutting at the last sentence boundary that fits.
+
+    Args:
+        text (str): Tweet text
+        max_length (int): Maximum length in characters
+
+    Returns:
+        Optional[str]: The text, shortened to whole sentences if needed; None if the first sentence alone is too long
+    """
+    if len(text) <= max_length:
+        return text
+    cut = None
+    for match in SENTENCE_END_PATTERN.finditer(text):
+        if match.end() > max_length:
+            break
+        cut = match.end()
+    return text[:cut].rstrip() if cut else None
+
+
+def clean_candidate(text: str, max_length: int = MAX_TWEET_LENGTH) -> Optional[str]:
+    """
+    Apply every formatting rule to one candidate tweet.
+
+    Args:
+        text (str): One line of base model output
+        max_length (int): Maximum tweet length
+
+    Returns:
+        Optional[str]: Cleaned tweet, or None if the candidate is not usable
+    """
+    text = strip_quotes(strip_prefix(text))
+    text = strip_hashtags(strip_emojis(text))
+    text = re.sub(r"[ \t]{2,}", " ", text).strip()
+    text = re.sub(r"\s+([,.!?;:])", r"\1", text)
+    text = strip_quotes(text)
+    if not text or not re.search(r"\w", text):
+        return None
+    lowered = text.lower()
+    if any(phrase in lowered for phrase in META_PHRASES):
+        return None
+    return truncate_to_sentence(text, max_length)
+
+
+def split_candidates(output: str, finished: bool = True) -> List[str]:
+    """
+    Split base model output into candidate tweets, one per non-empty line.
+
+    Args:
+        output (str): Raw base model output
+        finished (bool): False when generation was stopped early, so a last line without a newline may be partial
+
+    Returns:
+        List[str]: Candidate lines in generation order
+    """
+    lines = output.split("\n")
+    # A streamed generation stopped after the first finished line may carry the start of the next one
+    if not finished and len(lines) > 1 and lines[-1].strip():
+        lines = lines[:-1]
+    return [line for line in lines if line.strip()]
+
+
+def format_tweet(output: str, finished: bool = True, max_length: int = MAX_TWEET_LENGTH) -> Optional[str]:
+    """
+    Extract one postable tweet from base model output.
+
+    Every candidate line is cleaned; the first valid one wins since it is the direct continuation of the prompt,
+    and later ones are only used when it is unusable. A line cut off by the length limit is shortened to its
+    last whole sentence by truncate_to_sentence.
+
+    Args:
+        output (str): Raw base model output
+        finished (bool): Whether the model finished on its own (stop sequence / end of text)
+        max_length (int): Maximum tweet length
+
+    Returns:
+        Optional[str]: The tweet, or None if no candidate is valid
+    """
+    if not output or not output.strip():
+        return None
+    for candidate in split_candidates(output, finished):
+        tweet = clean_candidate(candidate, max_length)
+        if tweet is not None:
+            return tweet
+    return None
@@ -1,6 +1,80 @@
+import contextvars
 import json
+from contextlib import contextmanager
 from datetime import datetime
-from typing import Dict, Any
+from typing import Dict, Any, Callable, Iterator, Optional
+
+from engines.rate_limiter import get_rate_limiter
+from engines.tracing import json_size, span
+
+# Error code X returns when an account exceeds a rate limit
+TWITTER_RATE_LIMIT_ERROR_CODE = 88
+
+# X limits are per account, so calls are charged to the account of the agent whose cycle makes them
+_twitter_account: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("twitter_account", default=None)
+
+
+@contextmanager
+def twitter_account(username: Optional[str]) -> Iterator[None]:
+    """Charge the Twitter calls made in this block (and in threads it starts with copied context) to username."""
+    token = _twitter_account.set(username)
+    try:
+        yield
+    finally:
+        _twitter_account.reset(token)
+
+
+def twitter_rate_limit_key() -> str:
+    """Rate limiter key of the current account: "twitter/<username>", or "twitter" outside twitter_account."""
+    username = _twitter_account.get()
+    return f"twitter/{username}" if username else "twitter"
+
+
+def is_rate_limited(response: Any) -> bool:
+    """
+    Check a twitter-api-client response for a rate-limit error.
+
+    Args:
+        response (Any): Response dict, or list of response dicts
+
+    Returns:
+        bool: True if any response carries error code 88 or a "rate limit" message
+    """
+    responses = response if isinstance(response, list) else [response]
+    for item in responses:
+        if not isinstance(item, dict):
+            continue
+        for error in item.get('errors') or []:
+            if not isinstance(error, dict):
+                continue
+            if error.get('code') == TWITTER_RATE_LIMIT_ERROR_CODE or 'rate limit' in str(error.get('message', '')).lower():
+                return True
+    return False
+
+
+def twitter_call(fn: Callable, *args, **kwargs) -> Any:
+    """
+    Run a Twitter call under the current account's rate limits, traced as "twitter.<method>". A rate-limit
+    error in the response pauses that account's Twitter calls and shrinks its concurrency; other accounts
+    hosted in the process are not affected.
+
+    Args:
+        fn (Callable): Account / Scraper method to call
+        *args, **kwargs: Arguments for fn
+
+    Returns:
+        Any: fn's return value
+    """
+    name = getattr(fn, "__name__", "call")
+    with span(f"twitter.{name}", request_bytes=json_size([args, kwargs])) as trace, \
+            get_rate_limiter().acquire(twitter_rate_limit_key()) as permit:
+        response = fn(*args, **kwargs)
+        trace.set(response_bytes=json_size(response))
+        if is_rate_limited(response):
+            print("Twitter rate limit hit, pausing Twitter calls")
+            trace.set(throttled=True)
+            permit.release(throttled=True)
+        return response
 
 def parse_twitter_data(data: Dict[str, Any]) -> Dict[str, Any]:
     """
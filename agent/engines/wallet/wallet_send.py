@@ -2,21 +2,34 @@
 import os
 import re
 import json
-from typing import List, Tuple
-import requests
+from typing import List, Mapping, Optional, Tuple
 from web3 import Web3
 from ens import ENS
 from eth_keys import keys
 import secrets
 import hashlib
+from engines.llm.llm_client import LLMClient, LLMError, get_llm_client
 from engines.prompts.prompts import get_wallet_decision_prompt
+from engines.tracing import json_size, span
+
+class TracedHTTPProvider(Web3.HTTPProvider):
+    """HTTPProvider that traces every JSON-RPC call as "web3.<method>"."""
+
+    def make_request(self, method, params):
+        with span(f"web3.{method}", request_bytes=json_size(params)) as trace:
+            response = super().make_request(method, params)
+            trace.set(response_bytes=json_size(response))
+            if isinstance(response, dict) and response.get("error"):
+                trace.set(rpc_error=str(response["error"])[:200])
+            return response
+
 
 class WalletManager:
-    def __init__(self):
-        pass
+    def __init__(self, llm_client: Optional[LLMClient] = None):
+        self.llm_client = llm_client or get_llm_client("hyperbolic")
 
     def get_wallet_balance(self, private_key, eth_mainnet_rpc_url):
-        w3 = Web3(Web3.HTTPProvider(eth_mainnet_rpc_url))
+        w3 = Web3(TracedHTTPProvider(eth_mainnet_rpc_url))
         public_address = w3.eth.account.from_key(private_key).address
 
         # Retrieve and print the balance of the account in Ether
@@ -40,7 +53,7 @@ class WalletManager:
         - str: "Transaction failed" or an error message if the transaction was not successful or an error occurred.
         """
         try:
-            w3 = Web3(Web3.HTTPProvider(eth_mainnet_rpc_url))
+            w3 = Web3(TracedHTTPProvider(eth_mainnet_rpc_url))
 
             # Check if connected to blockchain
             if not w3.is_connected():
@@ -125,36 +138,27 @@ class WalletManager:
         wallet_balance = self.get_wallet_balance(private_key, eth_mainnet_rpc_url)
         prompt = get_wallet_decision_prompt(posts, matches, wallet_balance)
 
-        response = requests.post(
-            url="https://api.hyperbolic.xyz/v1/chat/completions",
-            headers={
-                "Content-Type": "application/json",
-                "Authorization": f"Bearer {llm_api_key}",
-            },
-            json={
-                "messages": [
-                    {
-                        "role": "system",
-            	        "content": prompt
-                    },
-                    {
-                        "role": "user",
-                        "content": "Respond only with the wallet address(es) and amount(s) you would like to send to."
-                    }
-                ],
-                "model": "meta-llama/Meta-Llama-3.1-70B-Instruct",
-                "presence_penalty": 0,
-                "temperature": 1,
-                "top_p": 0.95,
-                "top_k": 40,
-            }
+        # Raises LLMError on failure. Never cached: replaying a decision would repeat a transfer.
+        content = self.llm_client.chat(
+            [
+                {
+                    "role": "system",
+                    "content": prompt
+                },
+                {
+                    "role": "user",
+                    "content": "Respond only with the wallet address(es) and amount(s) you would like to send to."
+                }
+            ],
+            model="meta-llama/Meta-Llama-3.1-70B-Instruct",
+            api_key=llm_api_key,
+            presence_penalty=0,
+            temperature=1,
+            top_p=0.95,
+            top_k=40,
         )
-
-        if response.status_code == 200:
-            print(f"ETH Addresses and amounts chosen from Posts: {response.json()}")
-            return response.json()['choices'][0]['message']['content']
-        else:
-            raise Exception(f"Error generating short-term memory: {response.text}")
+        print(f"ETH Addresses and amounts chosen from Posts: {content}")
+        return content
 
 
     def _handle_wallet_transactions(self, notif_context: List[str], config) -> None:
@@ -187,7 +191,7 @@ class WalletManager:
                         wallet["amount"]
                     )
                 break
-            except (json.JSONDecodeError, KeyError) as e:
+            except (json.JSONDecodeError, KeyError, LLMError) as e:
                 print(f"Error processing wallet data: {e}")
                 continue
     
@@ -200,8 +204,9 @@ class WalletManager:
         eth_address = private_key.public_key.to_checksum_address()
         return private_key_hex, eth_address
     
-    def get_wallet_information(self) -> Tuple[str, str]:
-        """Retrieve wallet information from environment variables."""
-        private_key_hex = os.getenv("AGENT_WALLET_PRIVATE_KEY")
-        eth_address = os.getenv("AGENT_WALLET_ADDRESS")
+    def get_wallet_information(self, env: Optional[Mapping[str, str]] = None) -> Tuple[str, str]:
+        """Retrieve wallet information from environment variables (or from env, e.g. one agent's .env file)."""
+        env = os.environ if env is None else env
+        private_key_hex = env.get("AGENT_WALLET_PRIVATE_KEY")
+        eth_address = env.get("AGENT_WALLET_ADDRESS")
         return private_key_hex, eth_address
@@ -0,0 +1,326 @@
+import argparse
+import json
+import os
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field, fields
+from datetime import datetime
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+from dotenv import dotenv_values, load_dotenv
+from sqlalchemy.orm import Session
+from behavior import HumanBehaviorSimulator
+from config import Config, ConfigMaker
+from db.db_setup import create_database, create_missing_indexes, create_session_factory
+from engines.wallet.wallet_send import WalletManager
+from pipeline import PostingPipeline, configure_shared_services
+
+# Config fields behind process-wide services (LLM clients, rate limiter, tracer). They apply to every agent,
+# so they may only be set in the host file's "defaults".
+SHARED_CONFIG_FIELDS = (
+    "llm_base_url",
+    "rate_limits",
+    "llm_call_deadline_seconds",
+    "llm_hedge_requests",
+    "trace_path",
+    "trace_max_bytes",
+    "trace_backups",
+    "metrics_path",
+)
+
+# Config fields filled from each agent's own credentials and database, never from the host file
+CREDENTIAL_FIELDS = (
+    "db",
+    "account",
+    "auth",
+    "private_key_hex",
+    "eth_mainnet_rpc_url",
+    "llm_api_key",
+    "openrouter_api_key",
+    "openai_api_key",
+)
+
+# Environment variables holding an agent's credentials. They are read from the agent's env_file only, never
+# inherited from the host process, so one agent can not silently act with another account's keys.
+REQUIRED_CREDENTIAL_VARIABLES = (
+    "X_CONSUMER_KEY",
+    "X_CONSUMER_SECRET",
+    "X_ACCESS_TOKEN",
+    "X_ACCESS_TOKEN_SECRET",
+    "X_AUTH_TOKENS",
+    "AGENT_WALLET_PRIVATE_KEY",
+    "HYPERBOLIC_API_KEY",
+    "OPENAI_API_KEY",
+)
+OPTIONAL_CREDENTIAL_VARIABLES = (
+    "AGENT_WALLET_ADDRESS",
+    "OPENROUTER_API_KEY",
+    "ETH_MAINNET_RPC_URL",
+)
+
+# Credentials two agents may never share
+DISTINCT_CREDENTIAL_VARIABLES = ("X_AUTH_TOKENS", "AGENT_WALLET_PRIVATE_KEY")
+
+
+@dataclass
+class AgentSpec:
+    """One agent (persona) in the host file."""
+    name: str
+    env_file: Optional[str] = None  # .env with all of this agent's credentials (REQUIRED_CREDENTIAL_VARIABLES)
+    db_path: Optional[str] = None  # defaults to ./data/agents/<name>/agents.db
+    config: Dict[str, Any] = field(default_factory=dict)  # Config overrides for this agent only
+
+
+@dataclass
+class HostSettings:
+    max_concurrent_cycles: int = 4  # pipeline cycles running at once across all agents
+    defaults: Dict[str, Any] = field(default_factory=dict)  # Config overrides for every agent, incl. shared fields
+
+
+def load_host_file(path: str) -> Tuple[HostSettings, List[AgentSpec]]:
+    """
+    Read a host file:
+
+        {
+            "max_concurrent_cycles": 4,
+            "defaults": {"reply_mode": "async", "llm_call_deadline_seconds": 120},
+            "agents": [
+                {"name": "tee_hee_he", "env_file": "agents/tee_hee_he.env"},
+                {"name": "other_persona", "env_file": "agents/other.env", "config": {"max_reply_rate": 0.5}}
+            ]
+        }
+
+    Args:
+        path (str): JSON file
+
+    Returns:
+        Tuple[HostSettings, List[AgentSpec]]: Host settings and the agents in file order
+    """
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    settings = HostSettings(
+        max_concurrent_cycles=int(data.get("max_concurrent_cycles", HostSettings.max_concurrent_cycles)),
+        defaults=dict(data.get("defaults", {}))
+    )
+    specs = [AgentSpec(**agent) for agent in data.get("agents", [])]
+    names = [spec.name for spec in specs]
+    if not specs:
+        raise ValueError(f"No agents in {path}")
+    if len(set(names)) != len(names):
+        raise ValueError(f"Agent names must be unique: {names}")
+    config_fields = {f.name for f in fields(Config)}
+    for where, overrides in [("defaults", settings.defaults)] + [(spec.name, spec.config) for spec in specs]:
+        unknown = set(overrides) - config_fields
+        if unknown:
+            raise ValueError(f"Unknown Config fields in {where}: {sorted(unknown)}")
+        credentials = set(overrides) & set(CREDENTIAL_FIELDS)
+        if credentials:
+            raise ValueError(f"{where} sets {sorted(credentials)}; credentials come from the agent's env_file")
+    for spec in specs:
+        shared = set(spec.config) & set(SHARED_CONFIG_FIELDS)
+        if shared:
+            raise ValueError(f"Agent {spec.name} sets process-wide fields {sorted(shared)}; move them to defaults")
+    return settings, specs
+
+
+class AgentRuntime:
+    """One hosted agent: its pipeline and database session plus the behavior schedule of run_pipeline.PipelineRunner."""
+
+    def __init__(self, name: str, config: Config):
+        self.name = name
+        self.config = config
+        self.pipeline: Optional[PostingPipeline] = None
+        self.behavior_simulator = HumanBehaviorSimulator()
+        self.future: Optional[Future] = None
+        self.next_run: Optional[datetime] = datetime.now()  # the initial run happens right away
+        self.activation_time: Optional[datetime] = None
+        self.deactivation_time: Optional[datetime] = None
+        self.cycles = 0
+        self.errors = 0
+
+    def _plan_window(self) -> None:
+        self.activation_time, active_duration = self.behavior_simulator.get_timing_parameters()
+        self.deactivation_time = self.activation_time + active_duration
+        self.next_run = None
+        print(
+            f"[{self.name}] next active window {self.activation_time.strftime('%H:%M:%S')}"
+            f"-{self.deactivation_time.strftime('%H:%M:%S')}"
+        )
+
+    def due(self, now: datetime) -> bool:
+        """Advance the schedule to now; True if a cycle should start."""
+        if self.next_run is not None and self.deactivation_time is None:
+            # Initial run
+            return now >= self.next_run
+        if self.deactivation_time is None or now >= self.deactivation_time:
+            self._plan_window()
+        if now < self.activation_time:
+            return False
+        if self.next_run is None:
+            self.next_run = self.behavior_simulator.get_next_run_time()
+        if now < self.next_run:
+            return False
+        self.next_run = self.behavior_simulator.get_next_run_time()
+        if not self.behavior_simulator.should_post():
+            print(f"[{self.name}] skipping post based on behavior pattern...")
+            return False
+        return True
+
+    def wake_time(self) -> Optional[datetime]:
+        """Earliest time due() could return True."""
+        if self.deactivation_time is not None and self.next_run is None:
+            return self.activation_time
+        return self.next_run
+
+    def run_cycle(self) -> None:
+        print(f"[{self.name}] running pipeline at: {datetime.now().strftime('%H:%M:%S')}")
+        try:
+            self.pipeline.run()
+        except Exception as e:
+            self.errors += 1
+            print(f"[{self.name}] error running pipeline: {e}")
+        finally:
+            self.cycles += 1
+            if self.deactivation_time is None:
+                # The initial run is done; regular windows start now
+                self._plan_window()
+
+
+class MultiAgentHost:
+    """
+    Runs several agents in one process. Every agent keeps its own database, Twitter account, wallet and API keys,
+    while the LLM / embedding clients, their HTTP connection pools, the response and embedding caches, the rate
+    limiter and the tracer are shared. Twitter limits stay per account: each agent's calls are charged to its
+    own "twitter/<name>" rate limiter key. One scheduler thread keeps each agent's behavior schedule and hands due
+    cycles to a bounded pool, so at most max_concurrent_cycles pipelines run at once and an agent never runs two
+    cycles concurrently.
+    """
+
+    def __init__(self, settings: HostSettings, specs: List[AgentSpec]):
+        self.settings = settings
+        self.config_maker = ConfigMaker()
+        self.wallet_manager = WalletManager()
+        self.sessions: List[Session] = []
+        envs = {spec.name: self._agent_env(spec) for spec in specs}
+        self._check_distinct_accounts(envs)
+        self.agents = [AgentRuntime(spec.name, self._build_config(spec, envs[spec.name])) for spec in specs]
+        configure_shared_services(self.agents[0].config)
+        for agent in self.agents:
+            agent.pipeline = PostingPipeline(agent.config, configure_shared=False)
+        self.pool = ThreadPoolExecutor(max_workers=settings.max_concurrent_cycles, thread_name_prefix="agent-cycle")
+
+    def _agent_env(self, spec: AgentSpec) -> Mapping[str, str]:
+        """
+        The agent's env_file on top of the process environment minus every credential variable, so settings
+        every agent shares may come from the process while credentials come from the env_file alone.
+
+        Raises:
+            ValueError: If the env_file lacks a required credential
+        """
+        file_env = {}
+        if spec.env_file:
+            file_env = {key: value for key, value in dotenv_values(spec.env_file).items() if value}
+        missing = [name for name in REQUIRED_CREDENTIAL_VARIABLES if name not in file_env]
+        if missing:
+            raise ValueError(f"Agent {spec.name}: env_file {spec.env_file} does not set {missing}")
+        credentials = REQUIRED_CREDENTIAL_VARIABLES + OPTIONAL_CREDENTIAL_VARIABLES
+        env = {key: value for key, value in os.environ.items() if key not in credentials}
+        env.update(file_env)
+        return env
+
+    def _open_database(self, spec: AgentSpec) -> Session:
+        db_path = spec.db_path or os.path.join("./data/agents", spec.name, "agents.db")
+        new_database = not os.path.exists(db_path)
+        db = create_session_factory(db_path)()
+        if new_database:
+            print(f"[{spec.name}] creating database at {db_path}")
+            create_database(db.get_bind())
+        else:
+            create_missing_indexes(db.get_bind())
+        self.sessions.append(db)
+        return db
+
+    def _build_config(self, spec: AgentSpec, env: Mapping[str, str]) -> Config:
+        twitter_auth, twitter_account = self.config_maker.get_twitter_config(env)
+        private_key_hex, _ = self.wallet_manager.get_wallet_information(env)
+        overrides = {
+            "bot_username": spec.name,
+            "bot_email": f"{spec.name}@example.com",
+            "llm_base_url": os.getenv("LLM_BASE_URL"),
+            "embedding_backend": env.get("EMBEDDING_BACKEND", "openai"),
+            "tweet_prompt_template": env.get("TWEET_PROMPT_TEMPLATE"),
+            **self.settings.defaults,
+            **spec.config,
+        }
+        return Config(
+            db=self._open_database(spec),
+            account=twitter_account,
+            auth=twitter_auth,
+            private_key_hex=private_key_hex,
+            eth_mainnet_rpc_url=env.get("ETH_MAINNET_RPC_URL"),
+            **self.config_maker.get_api_keys(env),
+            **overrides
+        )
+
+    @staticmethod
+    def _check_distinct_accounts(envs: Mapping[str, Mapping[str, str]]) -> None:
+        """Two personas on one Twitter login would post over each other, and on one wallet spend each other's funds."""
+        for variable in DISTINCT_CREDENTIAL_VARIABLES:
+            seen: Dict[str, str] = {}
+            for name, env in envs.items():
+                value = env[variable]
+                if value in seen:
+                    raise ValueError(f"Agents {seen[value]} and {name} use the same {variable}")
+                seen[value] = name
+
+    def run(self, once: bool = False) -> None:
+        """
+        Schedule agent cycles until interrupted.
+
+        Args:
+            once (bool): Run every agent's initial cycle and return
+        """
+        print(f"Hosting {len(self.agents)} agents, {self.settings.max_concurrent_cycles} cycles at a time")
+        try:
+            while True:
+                now = datetime.now()
+                for agent in self.agents:
+                    if agent.future is not None:
+                        if not agent.future.done():
+                            continue
+                        agent.future = None
+                    if once and agent.cycles:
+                        continue
+                    if agent.due(now):
+                        agent.future = self.pool.submit(agent.run_cycle)
+                if once and all(agent.cycles and agent.future is None for agent in self.agents):
+                    break
+                wake_times = [agent.wake_time() for agent in self.agents if agent.future is None]
+                wake_times = [wake for wake in wake_times if wake is not None]
+                delay = min([(wake - datetime.now()).total_seconds() for wake in wake_times] + [1.0])
+                time.sleep(max(0.05, delay))
+        finally:
+            self.pool.shutdown(wait=True, cancel_futures=True)
+            for agent in self.agents:
+                agent.pipeline.close()
+            for db in self.sessions:
+                db.close()
+            for agent in self.agents:
+                print(f"[{agent.name}] {agent.cycles} cycles, {agent.errors} failed")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run several agents in one process with shared LLM clients and caches.")
+    parser.add_argument("host_file", help="JSON file listing the agents (see load_host_file)")
+    parser.add_argument("--once", action="store_true", help="run one cycle per agent and exit")
+    args = parser.parse_args()
+
+    load_dotenv()
+    settings, specs = load_host_file(args.host_file)
+    try:
+        MultiAgentHost(settings, specs).run(once=args.once)
+    except KeyboardInterrupt:
+        print("\nProcess terminated by user")
+
+
+if __name__ == "__main__":
+    main()
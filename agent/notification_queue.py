@@ -1,6 +1,16 @@
 from collections import deque
+from datetime import datetime, timedelta, timezone
 from typing import List, Tuple
 from dataclasses import dataclass, field
+from sqlalchemy import case, func, select, update, delete
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+from models import QueuedNotification
+
+# Queue row statuses besides "done" and "failed". The "_reply" variants are notifications whose wallet and
+# follow actions already ran; they are only handed out again to be replied to.
+AVAILABLE_STATUSES = ("pending", "pending_reply")
+CLAIMED_STATUSES = ("in_flight", "in_flight_reply")
 
 
 @dataclass
@@ -9,6 +19,7 @@ class NotificationQueue:
     min_queue_size: int = 10
     items: deque = field(default_factory=lambda: deque(maxlen=100))  # Store up to 50 items
     processed_ids: set = field(default_factory=set)
+    reply_only_ids: set = field(default_factory=set)  # tweet ids that only still need a reply
     
     def add(self, filtered_notifications: list) -> None:
         """
@@ -19,6 +30,8 @@ class NotificationQueue:
         """
         for notif, tweet_id in filtered_notifications:
             if tweet_id not in self.processed_ids:
+                if len(self.items) == self.items.maxlen:
+                    print(f"Queue full, dropping oldest notification (Tweet ID: {self.items[0][1]})")
                 self.items.append((notif, tweet_id))
                 self.processed_ids.add(tweet_id)
                 print(f"Added to queue: {notif[:100]}... (Tweet ID: {tweet_id})")
@@ -56,6 +69,200 @@ class NotificationQueue:
         """Clear the queue."""
         self.items.clear()
         self.processed_ids.clear()
+        self.reply_only_ids.clear()
+
+    def release(self) -> None:
+        """Processing failed; the items stay queued for the next cycle."""
+
+    def requeue_for_replies(self) -> None:
+        """Replying failed after the wallet / follow actions ran; the items stay queued for replies only."""
+        self.reply_only_ids.update(tweet_id for _, tweet_id in self.items)
     
     def __len__(self) -> int:
-        return len(self.items)
\ No newline at end of file
+        return len(self.items)
+
+
+@dataclass
+class SQLiteNotificationQueue:
+    """
+    NotificationQueue kept in the agent's database, so queued notifications survive restarts and nothing is
+    dropped on overflow. Same add / is_ready / process_queue / clear interface.
+
+    Delivery is at least once: process_queue claims up to batch_size notifications for a lease, clear()
+    acknowledges them and release() hands them back. requeue_for_replies() hands them back for replies only,
+    when the wallet and follow actions already ran on them and must not run twice. Claimed notifications that
+    are neither acknowledged nor handed back (the process died mid-cycle) are handed out again once their lease
+    expires. A notification handed out max_attempts times without an acknowledgement is parked as "failed"
+    instead of being retried forever. Acknowledged and failed rows are kept for retention_days (from the ack or
+    the parking) so a notification fetched again is not queued twice, then pruned.
+
+    Only pending rows are available, so the size check and the dequeue are (status, id) index lookups;
+    expired leases and exhausted notifications change status when they are handed back, not at read time.
+    Timestamps are stored in UTC.
+    """
+    db: Session
+    min_queue_size: int = 10
+    batch_size: int = 100  # notifications per process_queue; the rest wait for the next cycle
+    lease_seconds: float = 1800.0  # claimed notifications are redelivered after this without an ack
+    max_attempts: int = 3
+    retention_days: float = 7.0
+    claimed_ids: List[int] = field(default_factory=list, init=False, repr=False)  # ids of the current batch
+    reply_only_ids: set = field(default_factory=set, init=False, repr=False)  # tweet ids of the batch to only reply to
+
+    def __post_init__(self):
+        QueuedNotification.__table__.create(bind=self.db.get_bind(), checkfirst=True)
+
+    def _hand_back(self, condition, reply_only: bool = False) -> None:
+        """
+        Return claimed notifications matching condition to the queue, or park them as failed if exhausted.
+        Reply-only notifications stay reply-only, and with reply_only every matching notification becomes one.
+        """
+        claimed = QueuedNotification.status.in_(CLAIMED_STATUSES)
+        exhausted = self.db.execute(
+            select(QueuedNotification.tweet_id)
+            .where(condition, claimed, QueuedNotification.attempts >= self.max_attempts)
+        ).scalars().all()
+        for tweet_id in exhausted:
+            print(f"Notification {tweet_id} was not processed after {self.max_attempts} attempts, marking it failed")
+        self.db.execute(
+            update(QueuedNotification)
+            .where(condition, claimed)
+            .values(
+                status=case(
+                    (QueuedNotification.attempts >= self.max_attempts, "failed"),
+                    (QueuedNotification.status == "in_flight_reply", "pending_reply"),
+                    else_="pending_reply" if reply_only else "pending"
+                ),
+                claimed_at=None,
+                acked_at=case(
+                    (QueuedNotification.attempts >= self.max_attempts, datetime.now(timezone.utc)),
+                    else_=None
+                )
+            )
+        )
+
+    def _reclaim_expired_leases(self) -> None:
+        """Hand back notifications whose claim expired without an ack (the claiming process died)."""
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=self.lease_seconds)
+        self._hand_back(QueuedNotification.claimed_at < cutoff)
+        self.db.commit()
+
+    def add(self, filtered_notifications: list) -> None:
+        """
+        Add filtered notifications to the queue. Notifications already queued (or processed within the
+        retention period) are ignored.
+
+        Args:
+            filtered_notifications: List of tuples containing (notification_content, tweet_id)
+        """
+        if not filtered_notifications:
+            return
+        now = datetime.now(timezone.utc)
+        for notif, tweet_id in filtered_notifications:
+            result = self.db.execute(
+                insert(QueuedNotification)
+                .values(tweet_id=str(tweet_id), content=notif, status="pending", attempts=0, enqueued_at=now)
+                .on_conflict_do_nothing(index_elements=["tweet_id"])
+            )
+            if result.rowcount:
+                print(f"Added to queue: {notif[:100]}... (Tweet ID: {tweet_id})")
+        self.db.commit()
+
+    def is_ready(self) -> bool:
+        """Check if queue has enough items to start processing."""
+        self._reclaim_expired_leases()
+        return len(self) >= self.min_queue_size
+
+    def get_all(self) -> List[Tuple[str, str]]:
+        """
+        Claim the oldest available notifications, up to batch_size, for one lease. The tweet ids of those that
+        only still need a reply are left in reply_only_ids.
+
+        Returns:
+            List[Tuple[str, str]]: (content, tweet_id) in enqueue order
+        """
+        self._reclaim_expired_leases()
+        now = datetime.now(timezone.utc)
+        rows = self.db.execute(
+            select(QueuedNotification.id, QueuedNotification.content, QueuedNotification.tweet_id, QueuedNotification.status)
+            .where(QueuedNotification.status.in_(AVAILABLE_STATUSES))
+            .order_by(QueuedNotification.id)
+            .limit(self.batch_size)
+        ).all()
+        self.claimed_ids = [row.id for row in rows]
+        self.reply_only_ids = {row.tweet_id for row in rows if row.status == "pending_reply"}
+        if self.claimed_ids:
+            self.db.execute(
+                update(QueuedNotification)
+                .where(QueuedNotification.id.in_(self.claimed_ids))
+                .values(
+                    status=case((QueuedNotification.status == "pending_reply", "in_flight_reply"), else_="in_flight"),
+                    claimed_at=now,
+                    attempts=QueuedNotification.attempts + 1
+                )
+            )
+        self.db.commit()
+        return [(row.content, row.tweet_id) for row in rows]
+
+    def process_queue(self) -> tuple[List[Tuple[str, str]], List[str]]:
+        """
+        Claim notifications from the queue and prepare them for processing.
+
+        Returns:
+            tuple: (filtered_notifs_from_queue, notif_context)
+                - filtered_notifs_from_queue: List of (content, tweet_id) tuples
+                - notif_context: List of notification contents only
+        """
+        print("Queue ready for processing!")
+        filtered_notifs_from_queue = self.get_all()
+        notif_context = [context[0] for context in filtered_notifs_from_queue]
+
+        print("New Notifications:")
+        for content, tweet_id in filtered_notifs_from_queue:
+            print(f"- {content}, tweet at https://x.com/user/status/{tweet_id}\n")
+
+        return filtered_notifs_from_queue, notif_context
+
+    def ack(self) -> None:
+        """Acknowledge the notifications claimed by the last process_queue and prune expired done / failed rows."""
+        now = datetime.now(timezone.utc)
+        if self.claimed_ids:
+            self.db.execute(
+                update(QueuedNotification)
+                .where(QueuedNotification.id.in_(self.claimed_ids), QueuedNotification.status.in_(CLAIMED_STATUSES))
+                .values(status="done", acked_at=now)
+            )
+        self.claimed_ids = []
+        self.db.execute(
+            delete(QueuedNotification).where(
+                QueuedNotification.status.in_(("done", "failed")),
+                QueuedNotification.acked_at < now - timedelta(days=self.retention_days)
+            )
+        )
+        self.db.commit()
+
+    def clear(self) -> None:
+        """Processing succeeded: acknowledge the claimed notifications."""
+        self.ack()
+
+    def release(self) -> None:
+        """Processing failed: hand the claimed notifications back for the next cycle."""
+        if self.claimed_ids:
+            self._hand_back(QueuedNotification.id.in_(self.claimed_ids))
+            self.db.commit()
+        self.claimed_ids = []
+
+    def requeue_for_replies(self) -> None:
+        """Replying failed after the wallet / follow actions ran: hand the claimed notifications back for replies only."""
+        if self.claimed_ids:
+            self._hand_back(QueuedNotification.id.in_(self.claimed_ids), reply_only=True)
+            self.db.commit()
+        self.claimed_ids = []
+
+    def __len__(self) -> int:
+        """Available notifications (an index-only count)."""
+        return self.db.execute(
+            select(func.count())
+            .select_from(QueuedNotification)
+            .where(QueuedNotification.status.in_(AVAILABLE_STATUSES))
+        ).scalar_one()
\ No newline at end of file
@@ -4,8 +4,9 @@ import json
 import os
 import time
 import re
+from datetime import datetime, timedelta, timezone
 from random import random
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, sessionmaker
 
 from db.db_setup import get_db
 from models import Post, User, TweetPost
@@ -14,50 +15,184 @@ from twitter.account import Account
 from engines.twitter.post_retriever import PostRetriever
 from engines.memory.short_term_mem import ShortTermMemoryManager
 from engines.memory.long_term_mem import LongTermMemoryManager, LongTermMemory
+from engines.memory.embedding_cache import get_embedding_cache
+from engines.llm.llm_client import set_llm_base_url, set_llm_client_options, set_llm_failover_keys
+from engines.llm.resilience import circuit_states, get_latency_tracker
+from engines.llm.response_cache import get_response_cache
+from engines.memory.embedding_backends import set_openai_base_url
+from engines.rate_limiter import get_rate_limiter
+from engines.tracing import get_tracer, instrument_sqlalchemy, span
+from engines.memory.memory_compactor import MemoryCompactor
 from engines.twitter.post_maker import PostMaker
 from engines.memory.significance_scorer import SignificanceScorer
 from engines.twitter.post_sender import PostSender
 from engines.wallet.wallet_send import WalletManager
 from engines.twitter.follow_user import FollowManager
 from engines.twitter.reply_manager import ReplyManager
+from engines.twitter.utils import twitter_account
 from engines.twitter.create_user import UserManager
-from notification_queue import NotificationQueue
+from notification_queue import NotificationQueue, SQLiteNotificationQueue
+from stage_graph import Stage, StageGraph
 from config import Config
 
+def configure_shared_services(config: Config) -> None:
+    """
+    Apply the process-wide settings in config: LLM / embedding base URL, rate limits, LLM client options and
+    tracing. Must happen before any engine creates its clients. A process hosting several agents calls this
+    once and builds every pipeline with configure_shared=False.
+    """
+    if config.llm_base_url:
+        print(f"Routing LLM and embedding calls to {config.llm_base_url}")
+        set_llm_base_url(config.llm_base_url)
+        set_openai_base_url(config.llm_base_url)
+    get_tracer().configure(config.trace_path, config.trace_max_bytes, config.trace_backups)
+    for key, settings in (config.rate_limits or {}).items():
+        get_rate_limiter().configure(key, **settings)
+    set_llm_client_options(deadline=config.llm_call_deadline_seconds, hedge=config.llm_hedge_requests)
+
+
 class PostingPipeline:
-    def __init__(self, config: Config):
+    def __init__(self, config: Config, configure_shared: bool = True):
         self.config = config
+        if configure_shared:
+            configure_shared_services(self.config)
+        instrument_sqlalchemy(self.config.db.get_bind())
+        if self.config.llm_failover:
+            set_llm_failover_keys({"hyperbolic": self.config.llm_api_key, "openrouter": self.config.openrouter_api_key})
         self.post_retriever = PostRetriever()
         self.short_term_mem = ShortTermMemoryManager()
-        self.long_term_mem = LongTermMemoryManager()
-        self.post_maker = PostMaker()
-        self.significance_scorer = SignificanceScorer()
+        self.long_term_mem = LongTermMemoryManager(
+            index_nprobe=self.config.memory_index_nprobe,
+            index_min_memories=self.config.memory_index_min_memories,
+            index_save_every=self.config.memory_index_save_every,
+            embedding_backend=self.config.embedding_backend
+        )
+        self.long_term_mem.load_memory_matrix(self.config.db)
+        self.post_maker = PostMaker(
+            self.long_term_mem,
+            stream_generation=self.config.stream_post_generation,
+            local_formatting=self.config.local_tweet_formatting,
+            scoring_mode=self.config.significance_scoring_mode,
+            scoring_top_logprobs=self.config.significance_top_logprobs,
+            prompt_template=self.config.tweet_prompt_template
+        )
+        self.significance_scorer = SignificanceScorer(
+            scoring_mode=self.config.significance_scoring_mode, top_logprobs=self.config.significance_top_logprobs
+        )
         self.post_sender = PostSender()
         self.wallet_manager = WalletManager()
         self.follow_manager = FollowManager(self.config)
-        self.notification_queue = NotificationQueue()
+        if self.config.notification_queue_backend == "memory":
+            self.notification_queue = NotificationQueue()
+        else:
+            self.notification_queue = SQLiteNotificationQueue(self.config.db)
         self.user_manager = UserManager()
         self.ai_user = self.user_manager._get_or_create_ai_user(self.config.db, 
                                                                 self.config.bot_username, 
                                                                 self.config.bot_email)
+        self.ai_user_id = self.ai_user.id
+        self.ai_username = self.ai_user.username
         self.reply_manager = ReplyManager(self.config, self.ai_user)
+        self.memory_compactor = MemoryCompactor(
+            duplicate_threshold=self.config.memory_duplicate_threshold,
+            half_life_days=self.config.memory_decay_half_life_days,
+            min_decayed_significance=self.config.memory_min_decayed_significance,
+            max_memories=self.config.max_long_term_memories
+        )
+        self.last_memory_compaction = datetime.now()
+
+    def _maybe_compact_memories(self) -> None:
+        """Periodically merge duplicate and overflowing long-term memories, if compaction is configured."""
+        if self.config.memory_compaction_interval_hours is None:
+            return
+        interval = timedelta(hours=self.config.memory_compaction_interval_hours)
+        if datetime.now() - self.last_memory_compaction < interval:
+            return
+        self.last_memory_compaction = datetime.now()
+        report = self.memory_compactor.compact(self.config.db)
+        print(f"Memory compaction removed {report.removed} of {report.total_before} memories")
+        if report.removed:
+            self.long_term_mem.load_memory_matrix(self.config.db)
+
+    def _generate_short_term_memory(self, recent_posts: List[Post], notif_context: List[str]) -> str:
+        short_term_memory = self.short_term_mem.generate_short_term_memory(
+            recent_posts,
+            notif_context,
+            self.config.llm_api_key
+        )
+        print(f"Short-term memory: {short_term_memory}")
+        return short_term_memory
+
+    def _retrieve_long_term_memories(self, short_term_memory: str, db: Session) -> List[str]:
+        window_days = self.config.memory_retrieval_window_days
+        if self.config.memory_retrieval_mode == "hybrid":
+            retrieve_memories = self.long_term_mem.retrieve_hybrid_memories
+        else:
+            retrieve_memories = self.long_term_mem.retrieve_relevant_memories
+        long_term_memories = retrieve_memories(
+            db=db,
+            query=short_term_memory,
+            openai_api_key=self.config.openai_api_key,
+            min_significance=self.config.memory_retrieval_min_significance,
+            created_after=datetime.now(timezone.utc) - timedelta(days=window_days) if window_days else None
+        )
+        print(f"Long-term memories: {long_term_memories}")
+        print(f"Embedding cache: {get_embedding_cache().stats()}")
+        return long_term_memories
+
+    def _publish_post(self, post: Tuple[str, float], db: Session) -> None:
+        """Post if significant enough."""
+        new_post_content, significance_score = post
+        if significance_score >= self.config.min_posting_significance_score:
+            tweet_id = self.post_maker._post_content(new_post_content)
+            if tweet_id:
+                new_post = Post(
+                    content=new_post_content,
+                    user_id=self.ai_user_id,
+                    username=self.ai_username,
+                    type="text",
+                    tweet_id=tweet_id
+                )
+                db.add(new_post)
+                db.commit()
+                print(f"Posted with tweet_id: {tweet_id}")
+
+    def close(self) -> None:
+        """Persist what is only kept in memory between cycles (index inserts since the last save)."""
+        try:
+            self.long_term_mem.save_memory_index(self.config.db)
+        except OSError as e:
+            print(f"Error saving memory index: {e}")
 
     def run(self) -> None:
-        """Execute the main pipeline."""
+        """Execute the main pipeline as one trace, then export the metrics snapshot."""
+        try:
+            with span("pipeline.run", bot=self.config.bot_username), twitter_account(self.config.bot_username):
+                self._run_cycle()
+        finally:
+            print(f"Trace spans: {get_tracer().stats()}")
+            if self.config.metrics_path:
+                try:
+                    get_tracer().write_prometheus(self.config.metrics_path)
+                except OSError as e:
+                    print(f"Error writing metrics snapshot: {e}")
+
+    def _run_cycle(self) -> None:
         # Retrieve and format recent posts
-        recent_posts = self.post_retriever.retrieve_recent_posts(self.config.db)
-        formatted_posts = self.post_retriever.format_post_list(recent_posts)
+        with span("stage.recent_posts"):
+            recent_posts = self.post_retriever.retrieve_recent_posts(self.config.db)
+            formatted_posts = self.post_retriever.format_post_list(recent_posts)
         print(f"Recent posts: {formatted_posts}")
 
         # Process notifications
-        notif_context_tuple = self.post_retriever.fetch_notification_context(self.config.account)
-        print(f"Notification context: {notif_context_tuple}")
+        with span("stage.notifications"):
+            notif_context_tuple = self.post_retriever.fetch_notification_context(self.config.account)
+            print(f"Notification context: {notif_context_tuple}")
 
-        existing_tweet_ids = self.post_retriever.get_existing_tweet_ids(self.config.db)
-        print(f"Existing tweet ids: {existing_tweet_ids}")
+            existing_tweet_ids = self.post_retriever.get_existing_tweet_ids(self.config.db)
+            print(f"Existing tweet ids: {existing_tweet_ids}")
 
-        filtered_notifs = self.post_retriever.filter_notifications(notif_context_tuple, existing_tweet_ids)
-        
+            filtered_notifs = self.post_retriever.filter_notifications(notif_context_tuple, existing_tweet_ids)
 
         self.notification_queue.add(filtered_notifications=filtered_notifs)
 
@@ -67,73 +202,74 @@ class PostingPipeline:
             return
 
         # Store processed tweet IDs
-        self.post_sender.store_processed_tweets(self.config.db, notif_context_tuple)
+        with span("stage.store_processed_tweets"):
+            self.post_sender.store_processed_tweets(self.config.db, notif_context_tuple)
         
         # Let agent go through tweets now
         filtered_notifs_from_queue, notif_context = self.notification_queue.process_queue()
+        # Notifications redelivered only for a reply already went through the wallet and follow actions
+        reply_only_ids = self.notification_queue.reply_only_ids
+        action_context = [content for content, tweet_id in filtered_notifs_from_queue if tweet_id not in reply_only_ids]
 
+        # Replies, wallet and follows only need the notifications; memory retrieval and posting form their own
+        # chain. Each stage gets its own session, Config.db stays with this thread.
+        stages = [
+            Stage("short_term_memory", lambda: self._generate_short_term_memory(recent_posts, notif_context)),
+            Stage("long_term_memories", self._retrieve_long_term_memories, ("short_term_memory",), needs_db=True),
+            Stage(
+                "post",
+                lambda short_term_memory, long_term_memories, db: self.post_maker.generate_and_evaluate_post(
+                    short_term_memory,
+                    long_term_memories,
+                    formatted_posts,
+                    notif_context,
+                    self.config.llm_api_key,
+                    self.config.openai_api_key,
+                    db,
+                    self.config.min_storing_memory_significance
+                ),
+                ("short_term_memory", "long_term_memories"),
+                needs_db=True
+            ),
+            Stage("publish", self._publish_post, ("post",), needs_db=True),
+        ]
         if notif_context:
-            try:
-                self.reply_manager._handle_replies(filtered_notifs_from_queue)
-                time.sleep(5)
-            except Exception as e:
-                print(f"Error handling replies: {e}")
-            
-            try:
-                self.wallet_manager._handle_wallet_transactions(notif_context, self.config)
-                time.sleep(5)
-            except Exception as e:
-                print(f"Error handling wallet transactions: {e}")
-            
-            try:
-                self.follow_manager._handle_follows(notif_context)
-                time.sleep(5)
-            except Exception as e: 
-                print(f"Error handling follows: {e}")
-    
-        # Generate and process memories
-        short_term_memory = self.short_term_mem.generate_short_term_memory(
-            recent_posts,
-            notif_context,
-            self.config.llm_api_key
+            stages.append(
+                Stage("replies", lambda db: self.reply_manager.handle_replies(filtered_notifs_from_queue, db), needs_db=True)
+            )
+        if action_context:
+            stages += [
+                Stage("wallet", lambda: self.wallet_manager._handle_wallet_transactions(action_context, self.config)),
+                Stage("follows", lambda db: self.follow_manager._handle_follows(action_context, db), needs_db=True),
+            ]
+        started = time.monotonic()
+        results = StageGraph(stages).run(
+            max_workers=self.config.pipeline_stage_workers,
+            session_factory=sessionmaker(bind=self.config.db.get_bind())
         )
-        print(f"Short-term memory: {short_term_memory}")
+        print(f"Pipeline stages:\n{StageGraph.summary(results, time.monotonic() - started)}")
 
-        
-        # Get relevant long term memories
-        long_term_memories = self.long_term_mem.retrieve_relevant_memories(
-            db=self.config.db,
-            query=short_term_memory,
-            openai_api_key=self.config.openai_api_key
-        )
-        print(f"Long-term memories: {long_term_memories}")
-
-        # Generate and evaluate new post
-        new_post_content, significance_score = self.post_maker.generate_and_evaluate_post(
-           short_term_memory,
-           long_term_memories,
-           formatted_posts,
-           notif_context,
-           self.config.llm_api_key,
-           self.config.openai_api_key,
-           self.config.db,
-           self.config.min_storing_memory_significance
-        )
+        # Remove processed tweet IDs from the queue, or hand them back if they were not answered. Wallet and
+        # follow failures do not count: redelivering would reply to the same notifications twice. A wallet or
+        # follows stage that ran (even if it failed part way) may have acted, so its notifications come back for
+        # replies only and never send ETH or follow twice.
+        acted = [name for name in ("wallet", "follows") if name in results and results[name].status != "skipped"]
+        if "replies" in results and results["replies"].status != "ok":
+            if acted:
+                print(f"Replying failed after {', '.join(acted)} ran, returning the notifications for replies only")
+                self.notification_queue.requeue_for_replies()
+            else:
+                print("Replying failed, returning the notifications to the queue")
+                self.notification_queue.release()
+        else:
+            self.notification_queue.clear()
+        print(f"LLM response cache: {get_response_cache().stats()}")
+        print(f"Rate limits: {get_rate_limiter().stats()}")
+        print(f"LLM latency: {get_latency_tracker().stats()}")
+        print(f"LLM circuits: {circuit_states()}")
 
-        # Post if significant enough
-        if significance_score >= self.config.min_posting_significance_score:
-            tweet_id = self.post_maker._post_content(new_post_content)
-            if tweet_id:
-                new_post = Post(
-                    content=new_post_content,
-                    user_id=self.ai_user.id,
-                    username=self.ai_user.username,
-                    type="text",
-                    tweet_id=tweet_id
-                )
-                self.config.db.add(new_post)
-                self.config.db.commit()
-                print(f"Posted with tweet_id: {tweet_id}")
-        
-        # Remove processed tweet IDs from the queue
-        self.notification_queue.clear()
\ No newline at end of file
+        try:
+            with span("stage.compact_memories"):
+                self._maybe_compact_memories()
+        except Exception as e:
+            print(f"Error compacting memories: {e}")
\ No newline at end of file
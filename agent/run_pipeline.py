@@ -49,6 +49,8 @@ class PipelineRunner:
             auth=twitter_auth,
             private_key_hex=private_key_hex,
             eth_mainnet_rpc_url=os.getenv("ETH_MAINNET_RPC_URL"),
+            embedding_backend=os.getenv("EMBEDDING_BACKEND", "openai"),
+            llm_base_url=os.getenv("LLM_BASE_URL"),
             **api_keys
         )
 
@@ -110,11 +112,15 @@ class PipelineRunner:
                 continue
 
 def main():
+    runner = None
     try:
         runner = PipelineRunner()
         runner.run()
     except KeyboardInterrupt:
         print("\nProcess terminated by user")
+    finally:
+        if runner is not None:
+            runner.pipeline.close()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,125 @@
+import contextvars
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from sqlalchemy.orm import Session
+
+from engines.tracing import span
+
+
+@dataclass
+class Stage:
+    """One step of a pipeline cycle."""
+    name: str
+    func: Callable[..., Any]  # called with its dependencies' results as keyword arguments named after them
+    depends_on: Tuple[str, ...] = ()
+    needs_db: bool = False  # gets its own session as db=, since sessions cannot be shared between threads
+
+
+@dataclass
+class StageResult:
+    status: str  # "ok", "failed" or "skipped" (a dependency did not succeed)
+    value: Any = None
+    seconds: float = 0.0
+    error: Optional[BaseException] = None
+
+
+class StageGraph:
+    """
+    Runs pipeline stages as a dependency graph on a thread pool. A stage starts as soon as everything it
+    depends on has succeeded, so independent branches overlap and a cycle takes about as long as its critical
+    path. A failing stage only takes down the stages that depend on it.
+    """
+
+    def __init__(self, stages: List[Stage]):
+        """
+        Args:
+            stages (List[Stage]): Stages in any order; dependencies must name other stages and form no cycle
+        """
+        self.stages = {stage.name: stage for stage in stages}
+        if len(self.stages) != len(stages):
+            raise ValueError("Stage names must be unique")
+        for stage in stages:
+            missing = [name for name in stage.depends_on if name not in self.stages]
+            if missing:
+                raise ValueError(f"Stage {stage.name!r} depends on unknown stages {missing}")
+        self.order = self._topological_order()
+
+    def _topological_order(self) -> List[str]:
+        """Stage names with every stage after its dependencies (Kahn's algorithm, ties in declaration order)."""
+        remaining = {name: set(stage.depends_on) for name, stage in self.stages.items()}
+        order = []
+        while remaining:
+            ready = [name for name, deps in remaining.items() if not deps]
+            if not ready:
+                raise ValueError(f"Stage dependencies form a cycle among {sorted(remaining)}")
+            for name in ready:
+                order.append(name)
+                del remaining[name]
+            for deps in remaining.values():
+                deps.difference_update(ready)
+        return order
+
+    def _run_stage(self, stage: Stage, inputs: Dict[str, Any], session_factory: Optional[Callable[[], Session]]) -> StageResult:
+        started = time.monotonic()
+        db = session_factory() if stage.needs_db and session_factory is not None else None
+        try:
+            kwargs = dict(inputs, db=db) if stage.needs_db else inputs
+            with span(f"stage.{stage.name}"):
+                value = stage.func(**kwargs)
+            return StageResult("ok", value, time.monotonic() - started)
+        except Exception as e:
+            print(f"Error in stage {stage.name}: {e}")
+            if db is not None:
+                db.rollback()
+            return StageResult("failed", None, time.monotonic() - started, e)
+        finally:
+            if db is not None:
+                db.close()
+
+    def run(self, max_workers: int = 4, session_factory: Optional[Callable[[], Session]] = None) -> Dict[str, StageResult]:
+        """
+        Execute every stage.
+
+        Args:
+            max_workers (int): Stages running at once; 1 runs them one after another in dependency order
+            session_factory (Optional[Callable[[], Session]]): Creates the session for each needs_db stage
+
+        Returns:
+            Dict[str, StageResult]: Result of every stage by name
+        """
+        results: Dict[str, StageResult] = {}
+        pending = list(self.order)
+        running: Dict[Future, Stage] = {}
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="pipeline-stage") as pool:
+            while pending or running:
+                for name in list(pending):
+                    stage = self.stages[name]
+                    dependencies = [results.get(dependency) for dependency in stage.depends_on]
+                    if any(result is None for result in dependencies):
+                        continue
+                    pending.remove(name)
+                    if any(result.status != "ok" for result in dependencies):
+                        print(f"Skipping stage {name}: a dependency did not succeed")
+                        results[name] = StageResult("skipped")
+                        continue
+                    inputs = {dependency: results[dependency].value for dependency in stage.depends_on}
+                    # Each stage runs in a copy of the caller's context, so its spans nest under the caller's
+                    future = pool.submit(contextvars.copy_context().run, self._run_stage, stage, inputs, session_factory)
+                    running[future] = stage
+                if not running:
+                    # Only skipped stages were resolved this pass; their dependents are ready on the next one
+                    continue
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    results[running.pop(future).name] = future.result()
+        return {name: results[name] for name in self.order}
+
+    @staticmethod
+    def summary(results: Dict[str, StageResult], wall_seconds: float) -> str:
+        """One line per stage plus total wall time against the sum of stage times."""
+        lines = [f"  {name}: {result.status} in {result.seconds:.1f}s" for name, result in results.items()]
+        total = sum(result.seconds for result in results.values())
+        lines.append(f"  wall time {wall_seconds:.1f}s, sum of stages {total:.1f}s")
+        return "\n".join(lines)